@@ -0,0 +1,130 @@
+import json
+from dataclasses import fields as dataclass_fields
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable, Iterator
+
+from falcon import Request, Response, HTTPBadRequest, HTTPNotFound
+
+from sangsangstudio.middleware import is_visible
+from sangsangstudio.services import AuthorService, ContentDto, PostDto, PostNotFound, SessionDto, UserDto
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(value: Any) -> bytes:
+    if orjson:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _datetime(value: datetime) -> str:
+    return value.isoformat()
+
+
+def _enum(value: Enum) -> str:
+    return value.name.lower()
+
+
+def _user(value: UserDto) -> dict:
+    return {"id": value.id, "username": value.username}
+
+
+def _contents(value: list[ContentDto]) -> list[dict]:
+    encode = encoder(ContentDto)
+    return [encode(c) for c in value]
+
+
+# How each field is turned into JSON; fields not listed are copied as they are.
+CONVERTERS: dict[tuple[type, str], Callable[[Any], Any]] = {
+    (PostDto, "author"): _user,
+    (PostDto, "created_on"): _datetime,
+    (PostDto, "modified_on"): _datetime,
+    (PostDto, "status"): _enum,
+    (PostDto, "contents"): _contents,
+    (ContentDto, "type"): _enum,
+}
+
+
+@lru_cache(maxsize=None)
+def encoder(dto: type, selected: frozenset[str] | None = None) -> Callable[[Any], dict]:
+    # Built once per DTO type and field selection: encoding a DTO is then a
+    # flat loop over precomputed (name, converter) pairs, with no asdict() deep copy.
+    plan = [(f.name, CONVERTERS.get((dto, f.name)))
+            for f in dataclass_fields(dto) if selected is None or f.name in selected]
+
+    def encode(value: Any) -> dict:
+        result = {}
+        for name, convert in plan:
+            field_value = getattr(value, name)
+            result[name] = convert(field_value) if convert else field_value
+        return result
+    return encode
+
+
+def parse_fields(req: Request, allowed: frozenset[str]) -> frozenset[str] | None:
+    requested = req.get_param_as_list("fields", delimiter=",")
+    if not requested:
+        return None
+    selected = frozenset(f.strip() for f in requested if f.strip())
+    unknown = selected - allowed
+    if unknown:
+        raise HTTPBadRequest(description=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return selected
+
+
+POST_FIELDS = frozenset(f.name for f in dataclass_fields(PostDto))
+# The list is built from post summaries; contents are only loaded for a single post.
+POST_LIST_FIELDS = POST_FIELDS - {"contents"}
+
+
+class PostsApiResource:
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 1000
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, post_service: AuthorService):
+        self.post_service = post_service
+
+    def on_get(self, req: Request, res: Response):
+        selected = parse_fields(req, POST_LIST_FIELDS) or POST_LIST_FIELDS
+        limit = req.get_param_as_int("limit", min_value=1, max_value=self.MAX_LIMIT, default=self.DEFAULT_LIMIT)
+        offset = req.get_param_as_int("offset", min_value=0, default=0)
+        posts = self.post_service.find_published_posts(limit=limit, offset=offset)
+        res.content_type = "application/json"
+        res.stream = self.stream(posts, encoder(PostDto, selected))
+
+    def stream(self, posts: list[PostDto], encode: Callable[[PostDto], dict]) -> Iterator[bytes]:
+        # Items are encoded as the response is written, in chunks, instead of
+        # building one large document in memory first.
+        chunk = bytearray(b"[")
+        for i, post in enumerate(posts):
+            if i:
+                chunk += b","
+            chunk += dumps(encode(post))
+            if len(chunk) >= self.CHUNK_SIZE:
+                yield bytes(chunk)
+                chunk.clear()
+        chunk += b"]"
+        yield bytes(chunk)
+
+
+class PostApiResource:
+    def __init__(self, post_service: AuthorService):
+        self.post_service = post_service
+
+    def on_get(self, req: Request, res: Response, post_id: int):
+        selected = parse_fields(req, POST_FIELDS)
+        try:
+            post = self.post_service.find_post_by_id(post_id)
+        except PostNotFound:
+            raise HTTPNotFound()
+        session: SessionDto | None = req.env.get("session", None)
+        if not is_visible(post, session):
+            raise HTTPNotFound()
+        res.content_type = "application/json"
+        res.data = dumps(encoder(PostDto, selected)(post))
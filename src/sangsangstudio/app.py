@@ -1,31 +1,56 @@
+import os
 import sys
 from abc import ABC, abstractmethod
 
 from falcon import (
+    before,
     App,
     Request,
     Response,
     HTTP_OK,
-    HTTPFound)
-from jinja2 import (
-    Environment,
-    FileSystemLoader)
-from waitress import serve
+    HTTP_CREATED,
+    HTTP_NO_CONTENT,
+    HTTP_NOT_MODIFIED,
+    HTTPFound,
+    HTTPBadRequest,
+    HTTPContentTooLarge,
+    HTTPForbidden,
+    HTTPNotFound,
+    HTTPUnauthorized,
+    HTTPUnsupportedMediaType)
 
 from sangsangstudio.factories import (
     DevelopmentAppFactory,
     AppFactory)
+from sangsangstudio.api import PostApiResource, PostsApiResource
+from sangsangstudio.autosave import AutosaveBuffer
+from sangsangstudio.counters import ViewCounter
+from sangsangstudio.feeds import FeedCache
+from sangsangstudio.fragments import FragmentRenderer
+from sangsangstudio.metrics import MetricsRegistry
+from sangsangstudio.middleware import is_visible, require_role
+from sangsangstudio.images import (
+    CONTENT_TYPES,
+    ImageService,
+    ImageTooLarge,
+    UnsupportedImage)
+from sangsangstudio.search import SearchIndex
 from sangsangstudio.services import (
     AuthorService,
     UserService,
-    LoginRequest,
     SessionDto,
     CreatePostRequest,
     AddContentRequest,
-    ContentTypeDto, UpdateContentRequest)
-from src.sangsangstudio.settings import (
+    ContentTypeDto, UpdateContentRequest,
+    ContentDto,
+    PostNotFound,
+    ContentNotFound,
+    NotPostAuthor,
+    ADMIN_ROLE)
+from sangsangstudio.settings import (
     TEMPLATES_DIR,
-    STATIC_DIR)
+    STATIC_DIR,
+    load_env)
 
 
 class TemplateView(ABC):
@@ -33,15 +58,23 @@ class TemplateView(ABC):
     def render(self, name: str, *args, **kwargs) -> str:
         pass
 
+    def warmup(self):
+        pass
+
 
 class Jinja2TemplateView(TemplateView):
     def __init__(self, path: str):
-        self.env = Environment(loader=FileSystemLoader(path))
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+        self.env = Environment(loader=FileSystemLoader(path), autoescape=select_autoescape())
 
     def render(self, name: str, *args, **kwargs) -> str:
         t = self.env.get_template(name)
         return t.render(*args, **kwargs)
 
+    def warmup(self):
+        for name in self.env.list_templates():
+            self.env.get_template(name)
+
 
 class HomeResource:
     def __init__(self, view: TemplateView):
@@ -51,57 +84,343 @@ class HomeResource:
         session: SessionDto | None = req.env.get("session", None)
         res.status = HTTP_OK
         res.content_type = "text/html"
-        res.text = self.view.render("home.html", user=session.user)
+        res.text = self.view.render("home.html", user=session.user if session else None)
 
 
 class BlogResource:
-    def __init__(self, view: TemplateView, post_service: AuthorService):
+    PAGE_SIZE = 20
+    POPULAR_SIZE = 5
+
+    def __init__(self, view: TemplateView, post_service: AuthorService, view_counter: ViewCounter,
+                 fragments: FragmentRenderer):
         self.view = view
         self.post_service = post_service
+        self.view_counter = view_counter
+        self.fragments = fragments
 
     def on_get(self, req: Request, res: Response):
-        posts = self.post_service.find_all_posts()
+        page = req.get_param_as_int("page", min_value=1, default=1)
+        # One extra row tells us whether an older page exists.
+        posts = self.post_service.find_published_posts(
+            limit=self.PAGE_SIZE + 1, offset=(page - 1) * self.PAGE_SIZE)
         session: SessionDto | None = req.env.get("session", None)
         res.content_type = "text/html"
         res.status = HTTP_OK
-        res.text = self.view.render("blog.html", posts=posts, user=session.user)
+        res.text = self.view.render(
+            "blog.html",
+            post_list=self.fragments.post_list(
+                posts[:self.PAGE_SIZE], page, len(posts) > self.PAGE_SIZE, self.page_url, PostListFragment.page_url),
+            popular=self.view_counter.popular(self.POPULAR_SIZE),
+            user=session.user if session else None)
 
+    @staticmethod
+    def page_url(page: int) -> str:
+        return f"/blog?page={page}"
 
-class UsersResource:
-    def __init__(self, view: TemplateView, user_service: UserService):
-        self.user_service = user_service
+
+class PostListFragment:
+    def __init__(self, post_service: AuthorService, fragments: FragmentRenderer):
+        self.post_service = post_service
+        self.fragments = fragments
+
+    def on_get(self, req: Request, res: Response):
+        page = req.get_param_as_int("page", min_value=1, default=1)
+        posts = self.post_service.find_published_posts(
+            limit=BlogResource.PAGE_SIZE + 1, offset=(page - 1) * BlogResource.PAGE_SIZE)
+        res.content_type = "text/html"
+        res.text = self.fragments.post_list(
+            posts[:BlogResource.PAGE_SIZE], page, len(posts) > BlogResource.PAGE_SIZE,
+            BlogResource.page_url, self.page_url)
+
+    @staticmethod
+    def page_url(page: int) -> str:
+        return f"/blog/fragments/posts?page={page}"
+
+
+class PostCardFragment:
+    def __init__(self, post_service: AuthorService, fragments: FragmentRenderer):
+        self.post_service = post_service
+        self.fragments = fragments
+
+    def on_get(self, req: Request, res: Response, post_id: int):
+        try:
+            post = self.post_service.find_post_by_id(post_id)
+        except PostNotFound:
+            raise HTTPNotFound()
+        session: SessionDto | None = req.env.get("session", None)
+        if not is_visible(post, session):
+            raise HTTPNotFound()
+        res.content_type = "text/html"
+        res.text = self.fragments.post_card(post)
+
+
+class ContentFragment:
+    def __init__(self, autosave_buffer: AutosaveBuffer, post_service: AuthorService, image_service: ImageService,
+                 fragments: FragmentRenderer):
+        self.autosave_buffer = autosave_buffer
+        self.post_service = post_service
+        self.image_service = image_service
+        self.fragments = fragments
+
+    def on_get(self, req: Request, res: Response, content_id: int):
+        # Read through the autosave buffer so an editor swap shows unsaved edits.
+        try:
+            content = self.autosave_buffer.find_content_by_id(content_id)
+            post = self.post_service.find_post_by_id(content.post_id)
+        except (ContentNotFound, PostNotFound):
+            raise HTTPNotFound()
+        if not is_visible(post, req.env.get("session", None)):
+            raise HTTPNotFound()
+        srcset = ""
+        if content.type == ContentTypeDto.IMAGE:
+            srcset = self.image_service.srcsets([content.src]).get(content.src, "")
+        res.content_type = "text/html"
+        res.text = self.fragments.content(content, srcset)
+
+
+class SearchResource:
+    PAGE_SIZE = 10
+
+    def __init__(self, view: TemplateView, search_index: SearchIndex):
         self.view = view
+        self.search_index = search_index
 
+    def on_get(self, req: Request, res: Response):
+        query = req.get_param("q", default="").strip()
+        page = req.get_param_as_int("page", min_value=1, default=1)
+        results = self.search_index.search(query, page=page, per_page=self.PAGE_SIZE) if query else None
+        session: SessionDto | None = req.env.get("session", None)
+        res.content_type = "text/html"
+        res.status = HTTP_OK
+        res.text = self.view.render(
+            "search.html", query=query, results=results, user=session.user if session else None)
 
-class AuthenticationMiddleware:
-    def __init__(self, user_service: UserService):
-        self.user_service = user_service
 
-    def process_request(self, req: Request, res: Response):
-        # Only for development
-        session = self.user_service.login(
-            LoginRequest(username="vince", password="p1a2s3s4"))
-        res.set_cookie("session", session.key)
-        req.env["session"] = session
+class PostResource:
+    def __init__(self, view: TemplateView, post_service: AuthorService, image_service: ImageService,
+                 view_counter: ViewCounter):
+        self.view = view
+        self.post_service = post_service
+        self.image_service = image_service
+        self.view_counter = view_counter
+
+    def on_get(self, req: Request, res: Response, post_id: int):
+        try:
+            post = self.post_service.find_post_by_id(post_id)
+        except PostNotFound:
+            raise HTTPNotFound()
+        session: SessionDto | None = req.env.get("session", None)
+        if not is_visible(post, session):
+            raise HTTPNotFound()
+        self.view_counter.record(post_id)
+        views = self.view_counter.views([post_id])[post_id]
+        srcsets = self.image_service.srcsets(
+            c.src for c in post.contents if c.type == ContentTypeDto.IMAGE)
+        res.content_type = "text/html"
+        res.status = HTTP_OK
+        res.text = self.view.render(
+            "post.html", post=post, srcsets=srcsets, views=views, user=session.user if session else None)
+
+
+class ImagesResource:
+    def __init__(self, image_service: ImageService):
+        self.image_service = image_service
+
+    def on_post(self, req: Request, res: Response):
+        session: SessionDto | None = req.env.get("session", None)
+        if not session:
+            raise HTTPUnauthorized()
+        post_id, text, name = None, "", None
+        try:
+            for part in req.get_media():
+                if part.name == "post_id":
+                    post_id = int(part.text)
+                elif part.name == "text":
+                    text = part.text
+                elif part.name == "image":
+                    name = self.image_service.store_image(part.stream)
+        except ValueError:
+            raise HTTPBadRequest(description="post_id must be an integer")
+        except UnsupportedImage:
+            raise HTTPUnsupportedMediaType(description="Only JPEG, PNG, GIF and WebP images are accepted")
+        except ImageTooLarge:
+            raise HTTPContentTooLarge()
+        if post_id is None or name is None:
+            raise HTTPBadRequest(description="post_id and image are required")
+        try:
+            content = self.image_service.attach_image(session.user, post_id, name, text)
+        except PostNotFound:
+            raise HTTPNotFound()
+        except NotPostAuthor:
+            raise HTTPForbidden()
+        res.status = HTTP_CREATED
+        res.media = {"id": content.id, "post_id": content.post_id, "src": content.src}
+
+
+class ImageFileResource:
+    def __init__(self, image_service: ImageService):
+        self.image_service = image_service
+
+    def on_get(self, req: Request, res: Response, name: str):
+        path = self.image_service.store.path(name)
+        if not path:
+            raise HTTPNotFound()
+        # Names are content hashes, so a URL never changes what it serves.
+        res.cache_control = ["public", "max-age=31536000", "immutable"]
+        etag = name.split(".")[0]
+        res.etag = etag
+        if req.if_none_match and etag in req.if_none_match:
+            res.status = HTTP_NOT_MODIFIED
+            return
+        res.content_type = CONTENT_TYPES[name.rsplit(".", 1)[1]]
+        res.set_stream(open(path, "rb"), os.path.getsize(path))
+
+
+class FeedResource:
+    def __init__(self, feed_cache: FeedCache, name: str):
+        self.feed_cache = feed_cache
+        self.name = name
+
+    def on_get(self, req: Request, res: Response):
+        feed = self.feed_cache.feed(self.name)
+        res.etag = feed.etag
+        res.last_modified = feed.last_modified
+        res.cache_control = ["public", f"max-age={int(self.feed_cache.max_age)}"]
+        if req.if_none_match is not None:
+            not_modified = "*" in req.if_none_match or feed.etag in req.if_none_match
+        else:
+            not_modified = req.if_modified_since is not None and feed.last_modified <= req.if_modified_since
+        if not_modified:
+            res.status = HTTP_NOT_MODIFIED
+            return
+        res.content_type = feed.content_type
+        res.data = feed.body
+
+
+class ContentResource:
+    def __init__(self, autosave_buffer: AutosaveBuffer, post_service: AuthorService):
+        self.autosave_buffer = autosave_buffer
+        self.post_service = post_service
+
+    def _update_request(self, req: Request, content_id: int) -> UpdateContentRequest:
+        session: SessionDto | None = req.env.get("session", None)
+        if not session:
+            raise HTTPUnauthorized()
+        form = req.get_media()
+        return UpdateContentRequest(
+            user=session.user, content_id=content_id, text=form.get("text", ""), src=form.get("src", ""))
+
+    @staticmethod
+    def _to_media(content: ContentDto) -> dict:
+        return {"id": content.id, "post_id": content.post_id, "text": content.text, "src": content.src}
+
+    def on_get(self, req: Request, res: Response, content_id: int):
+        try:
+            content = self.autosave_buffer.find_content_by_id(content_id)
+            post = self.post_service.find_post_by_id(content.post_id)
+        except (ContentNotFound, PostNotFound):
+            raise HTTPNotFound()
+        if not is_visible(post, req.env.get("session", None)):
+            raise HTTPNotFound()
+        res.media = self._to_media(content)
+
+    def on_patch(self, req: Request, res: Response, content_id: int):
+        # Autosave: buffered and written after the author pauses typing.
+        try:
+            self.autosave_buffer.edit(self._update_request(req, content_id))
+        except (ContentNotFound, PostNotFound):
+            raise HTTPNotFound()
+        except NotPostAuthor:
+            raise HTTPForbidden()
+        res.status = HTTP_NO_CONTENT
+
+    def on_put(self, req: Request, res: Response, content_id: int):
+        try:
+            self.autosave_buffer.edit(self._update_request(req, content_id))
+            res.media = self._to_media(self.autosave_buffer.save(content_id))
+        except (ContentNotFound, PostNotFound):
+            raise HTTPNotFound()
+        except NotPostAuthor:
+            raise HTTPForbidden()
+
+
+class AdminResource:
+    def __init__(self, view: TemplateView):
+        self.view = view
+
+    @before(require_role(ADMIN_ROLE))
+    def on_get(self, req: Request, res: Response):
+        session: SessionDto = req.env["session"]
+        res.content_type = "text/html"
+        res.status = HTTP_OK
+        res.text = self.view.render("admin.html", user=session.user, roles=sorted(session.roles))
+
+
+class MetricsResource:
+    def __init__(self, metrics: MetricsRegistry):
+        self.metrics = metrics
+
+    def on_get(self, req: Request, res: Response):
+        res.content_type = "text/plain; version=0.0.4"
+        res.text = self.metrics.render()
+
+
+class UsersResource:
+    def __init__(self, view: TemplateView, user_service: UserService):
+        self.user_service = user_service
+        self.view = view
 
 
-def create_app(factory: AppFactory):
-    app = App(middleware=[AuthenticationMiddleware(factory.user_service())])
+def create_app(factory: AppFactory, warmup: bool = False):
+    app = App(middleware=factory.middleware())
     view = Jinja2TemplateView(TEMPLATES_DIR)
+    if warmup:
+        factory.warmup(view)
     home_resource = HomeResource(view)
-    blog_resource = BlogResource(view, factory.author_service())
+    admin_resource = AdminResource(view)
+    metrics_resource = MetricsResource(factory.metrics())
+    posts_api_resource = PostsApiResource(factory.author_service())
+    post_api_resource = PostApiResource(factory.author_service())
+    fragments = FragmentRenderer(view, factory.fragment_cache())
+    blog_resource = BlogResource(view, factory.author_service(), factory.view_counter(), fragments)
+    search_resource = SearchResource(view, factory.search_index())
+    post_resource = PostResource(view, factory.author_service(), factory.image_service(), factory.view_counter())
+    images_resource = ImagesResource(factory.image_service())
+    image_file_resource = ImageFileResource(factory.image_service())
+    atom_resource = FeedResource(factory.feed_cache(), "atom")
+    rss_resource = FeedResource(factory.feed_cache(), "rss")
+    content_resource = ContentResource(factory.autosave_buffer(), factory.author_service())
+    post_list_fragment = PostListFragment(factory.author_service(), fragments)
+    post_card_fragment = PostCardFragment(factory.author_service(), fragments)
+    content_fragment = ContentFragment(factory.autosave_buffer(), factory.author_service(), factory.image_service(), fragments)
     app.add_route("/", home_resource)
+    app.add_route("/admin", admin_resource)
+    app.add_route("/metrics", metrics_resource)
+    app.add_route("/api/posts", posts_api_resource)
+    app.add_route("/api/posts/{post_id:int}", post_api_resource)
     app.add_route("/blog", blog_resource)
+    app.add_route("/blog/search", search_resource)
+    app.add_route("/blog/posts/{post_id:int}", post_resource)
+    app.add_route("/blog/feed.atom", atom_resource)
+    app.add_route("/blog/feed.rss", rss_resource)
+    app.add_route("/blog/contents/{content_id:int}", content_resource)
+    app.add_route("/blog/fragments/posts", post_list_fragment)
+    app.add_route("/blog/fragments/posts/{post_id:int}", post_card_fragment)
+    app.add_route("/blog/fragments/contents/{content_id:int}", content_fragment)
+    app.add_route("/images", images_resource)
+    app.add_route("/images/{name}", image_file_resource)
     app.add_static_route("/static", STATIC_DIR)
     return app
 
 
 def run_server(app, host: str = "localhost", port: int = 8080):
+    from waitress import serve
     print(f"Serving at http://{host}:{port}", flush=True)
     serve(app=app, host=host, port=port)
 
 
 def main(args: list[str]):
+    load_env()
     with DevelopmentAppFactory() as factory:
         app = create_app(factory)
         run_server(app)
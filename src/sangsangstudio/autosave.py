@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass, replace
+from typing import Callable
+
+from sangsangstudio.services import (
+    AuthorService, ContentDto, ContentNotFound, NotPostAuthor, PostListener, PostNotFound, UpdateContentRequest)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class PendingEdit:
+    request: UpdateContentRequest
+    first_edit: float
+    last_edit: float
+    version: int
+
+
+class AutosaveBuffer(PostListener):
+    def __init__(self, author_service: AuthorService, delay: float = 2.0, max_delay: float = 10.0,
+                 interval: float = 0.5, timer: Callable[[], float] = time.monotonic):
+        self.author_service = author_service
+        self.delay = delay
+        self.max_delay = max_delay
+        self.interval = interval
+        self.timer = timer
+        self._pending: dict[int, PendingEdit] = {}
+        self._version = 0
+        self._lock = threading.Lock()
+        # Flushes are serialized so an older edit is never written after a newer one.
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def edit(self, request: UpdateContentRequest):
+        with self._lock:
+            previous = self._pending.get(request.content_id)
+        if not previous or previous.request.user.id != request.user.id:
+            # Raises ContentNotFound or NotPostAuthor; later keystrokes by the same author skip the lookup.
+            self.author_service.find_editable_content(request.user, request.content_id)
+        now = self.timer()
+        with self._lock:
+            self._version += 1
+            previous = self._pending.get(request.content_id)
+            self._pending[request.content_id] = PendingEdit(
+                request=request,
+                first_edit=previous.first_edit if previous else now,
+                last_edit=now,
+                version=self._version)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def find_content_by_id(self, content_id: int) -> ContentDto:
+        content = self.author_service.find_content_by_id(content_id)
+        with self._lock:
+            edit = self._pending.get(content_id)
+        if edit:
+            return replace(content, text=edit.request.text, src=edit.request.src)
+        return content
+
+    def flush_due(self) -> int:
+        # Debounced: an edit is written once typing pauses for `delay`, or
+        # after `max_delay` at the latest while typing continues.
+        now = self.timer()
+        with self._lock:
+            due = [content_id for content_id, edit in self._pending.items()
+                   if now - edit.last_edit >= self.delay or now - edit.first_edit >= self.max_delay]
+        return self.flush(due) if due else 0
+
+    def flush(self, content_ids: list[int] | None = None) -> int:
+        written = 0
+        with self._flush_lock:
+            with self._lock:
+                ids = list(self._pending) if content_ids is None else content_ids
+                edits = [self._pending[i] for i in ids if i in self._pending]
+            for edit in edits:
+                try:
+                    self.author_service.update_content(edit.request)
+                    written += 1
+                except (ContentNotFound, PostNotFound, NotPostAuthor):
+                    # Can never succeed, so it is dropped instead of retried.
+                    logger.warning("Autosave of content %d is no longer possible, dropping it",
+                                   edit.request.content_id)
+                except Exception:
+                    # Kept for the next tick; the edits after it are still written.
+                    logger.exception("Autosave of content %d failed, retrying", edit.request.content_id)
+                    continue
+                self._forget(edit)
+        return written
+
+    def _forget(self, edit: PendingEdit):
+        with self._lock:
+            current = self._pending.get(edit.request.content_id)
+            if current and current.version == edit.version:
+                del self._pending[edit.request.content_id]
+
+    def save(self, content_id: int) -> ContentDto:
+        # Unlike a background flush, an explicit save reports its failure and keeps the edit.
+        with self._flush_lock:
+            with self._lock:
+                edit = self._pending.get(content_id)
+            if not edit:
+                return self.author_service.find_content_by_id(content_id)
+            content = self.author_service.update_content(edit.request)
+            self._forget(edit)
+            return content
+
+    def content_deleted(self, content_id: int):
+        with self._lock:
+            self._pending.pop(content_id, None)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush_due()
+            except Exception:
+                logger.exception("Autosave flush failed")
+
+    def start(self):
+        if self._thread:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        flushed = self.flush()
+        if flushed:
+            logger.info("Flushed %d pending autosaves", flushed)
+        lost = self.pending()
+        if lost:
+            logger.error("Shutting down with %d unsaved autosaves", lost)
@@ -0,0 +1,138 @@
+import hashlib
+import math
+import threading
+import unicodedata
+
+from sangsangstudio.repositories import Repository
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: bytes) -> list[int]:
+        # Double hashing: k positions from one 128-bit digest.
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: bytes):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def full(self) -> bool:
+        return self.count >= self.capacity
+
+    def memory_bytes(self) -> int:
+        return len(self.bits)
+
+
+def normalize_username(username: str) -> bytes:
+    # Usernames are compared the way MySQL's default collation does:
+    # case- and accent-insensitively.
+    decomposed = unicodedata.normalize("NFKD", username.casefold())
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).encode()
+
+
+class UsernameFilter:
+    REFRESH_BATCH_SIZE = 1000
+
+    def __init__(self, repository: Repository, error_rate: float = 0.01, capacity: int = 10_000):
+        self.repository = repository
+        self.error_rate = error_rate
+        self.initial_capacity = capacity
+        self._lock = threading.Lock()
+        self._refreshed = threading.Condition(self._lock)
+        self._filters: list[BloomFilter] = []
+        self._last_user_id = 0
+        self._refreshes_started = 0
+        self._refreshes_done = 0
+        self._refreshing = False
+        self._ready = False
+        self.rejections = 0
+
+    def _new_filter(self) -> BloomFilter:
+        # A scalable Bloom filter: each added stage doubles the capacity and
+        # halves the error rate, so the combined rate stays under error_rate.
+        stage = len(self._filters)
+        return BloomFilter(self.initial_capacity * 2 ** stage, self.error_rate / 2 ** (stage + 1))
+
+    def _add(self, username: str, user_id: int | None):
+        if not self._filters or self._filters[-1].full():
+            self._filters.append(self._new_filter())
+        self._filters[-1].add(normalize_username(username))
+        if user_id is not None:
+            self._last_user_id = max(self._last_user_id, user_id)
+
+    def build(self):
+        with self._lock:
+            self._filters = []
+            self._last_user_id = 0
+            for user in self.repository.iter_users():
+                self._add(user.username, user.id)
+            self._ready = True
+
+    def add(self, username: str, user_id: int | None = None):
+        with self._lock:
+            self._add(username, user_id)
+
+    def _contains(self, username: str) -> bool:
+        key = normalize_username(username)
+        return any(key in f for f in self._filters)
+
+    def refresh(self):
+        # Picks up users created by other processes, by id. A catch-up that
+        # was already running may have missed them, so callers wait for one
+        # that starts after they do; everyone waiting shares that one query.
+        with self._lock:
+            wanted = self._refreshes_started + 1
+            while self._refreshing and self._refreshes_done < wanted:
+                self._refreshed.wait()
+            if self._refreshes_done >= wanted:
+                return
+            self._refreshing = True
+            self._refreshes_started += 1
+            last_user_id = self._last_user_id
+        try:
+            while True:
+                users = self.repository.find_users_after(last_user_id, self.REFRESH_BATCH_SIZE)
+                with self._lock:
+                    for user in users:
+                        self._add(user.username, user.id)
+                if len(users) < self.REFRESH_BATCH_SIZE:
+                    break
+                last_user_id = users[-1].id
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._refreshes_done = self._refreshes_started
+                self._refreshed.notify_all()
+
+    def might_exist(self, username: str) -> bool:
+        # A miss is only trusted after catching up, so a user created by
+        # another worker is never rejected.
+        with self._lock:
+            if not self._ready or self._contains(username):
+                return True
+        self.refresh()
+        with self._lock:
+            if self._contains(username):
+                return True
+            self.rejections += 1
+            return False
+
+    def count(self) -> int:
+        return sum(f.count for f in self._filters)
+
+    def memory_bytes(self) -> int:
+        return sum(f.memory_bytes() for f in self._filters)
@@ -0,0 +1,241 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Hashable
+
+from sangsangstudio.entities import User, Post, PostStatus, Content, Admin
+from sangsangstudio.repositories import Repository, RepositoryDecorator
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    invalidations: int
+    size: int
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class LRUCache:
+    MISSING = object()
+
+    def __init__(self, max_size: int = 1024, timer: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.timer = timer
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._flights: dict[Hashable, threading.Lock] = {}
+        # Per key with a load in progress: [running loads, invalidations seen].
+        self._loading: dict[Hashable, list[int]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def _get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return self.MISSING
+        expires_at, value = entry
+        if expires_at <= self.timer():
+            del self._entries[key]
+            self._expirations += 1
+            return self.MISSING
+        self._entries.move_to_end(key)
+        return value
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._get(key)
+            if value is self.MISSING:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return value
+
+    def peek(self, key: Hashable) -> Any:
+        with self._lock:
+            return self._get(key)
+
+    def _put(self, key: Hashable, value: Any, ttl: float):
+        self._entries[key] = (self.timer() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def put(self, key: Hashable, value: Any, ttl: float):
+        with self._lock:
+            self._put(key, value, ttl)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: float) -> Any:
+        with self._lock:
+            value = self._get(key)
+            if value is not self.MISSING:
+                self._hits += 1
+                return value
+            self._misses += 1
+            flight = self._flights.setdefault(key, threading.Lock())
+        # Only one caller per key goes to the backing store, the others wait
+        # for it and pick the value up from the cache.
+        try:
+            with flight:
+                with self._lock:
+                    value = self._get(key)
+                    if value is not self.MISSING:
+                        return value
+                    loading = self._loading.setdefault(key, [0, 0])
+                    loading[0] += 1
+                    generation = (self._generation, loading[1])
+                try:
+                    value = loader()
+                    with self._lock:
+                        # A write to this key that raced with the load may have made the value stale.
+                        if value is not None and generation == (self._generation, loading[1]):
+                            self._put(key, value, ttl)
+                finally:
+                    with self._lock:
+                        loading[0] -= 1
+                        if not loading[0]:
+                            del self._loading[key]
+                return value
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._loading:
+                self._loading[key][1] += 1
+            if self._entries.pop(key, None) is not None:
+                self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                invalidations=self._invalidations,
+                size=len(self._entries))
+
+
+@dataclass(frozen=True)
+class CacheSettings:
+    max_size: int = 1024
+    user_ttl: float = 300.0
+    post_ttl: float = 60.0
+    content_ttl: float = 60.0
+    admin_ttl: float = 300.0
+
+
+class CachingRepository(RepositoryDecorator):
+    def __init__(self, repository: Repository, settings: CacheSettings = CacheSettings(),
+                 cache: LRUCache | None = None):
+        super().__init__(repository)
+        self.settings = settings
+        self.cache = cache or LRUCache(settings.max_size)
+
+    def _find(self, key: tuple[str, int], loader: Callable[[], Any], ttl: float) -> Any:
+        value = self.cache.get_or_load(key, loader, ttl)
+        # Callers mutate entities before saving them, so never hand out the cached instance.
+        return copy.deepcopy(value)
+
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
+
+    def find_user_by_id(self, user_id: int) -> User | None:
+        return self._find(
+            ("user", user_id),
+            lambda: self.repository.find_user_by_id(user_id),
+            self.settings.user_ttl)
+
+    def save_user(self, user: User):
+        self.repository.save_user(user)
+        self.cache.invalidate(("user", user.id))
+
+    def find_post_by_id(self, post_id: int) -> Post | None:
+        return self._find(
+            ("post", post_id),
+            lambda: self.repository.find_post_by_id(post_id),
+            self.settings.post_ttl)
+
+    def save_post(self, post: Post):
+        self.repository.save_post(post)
+        self.cache.invalidate(("post", post.id))
+
+    def update_post_status(self, post_id: int, status: PostStatus, modified_on: datetime):
+        self.repository.update_post_status(post_id, status, modified_on)
+        self.cache.invalidate(("post", post_id))
+
+    def find_content_by_id(self, content_id: int) -> Content | None:
+        return self._find(
+            ("content", content_id),
+            lambda: self.repository.find_content_by_id(content_id),
+            self.settings.content_ttl)
+
+    def save_content(self, content: Content):
+        self.repository.save_content(content)
+        self.cache.invalidate(("content", content.id))
+        self.cache.invalidate(("post", content.post_id))
+
+    def _find_owning_post_id(self, content_id: int) -> int | None:
+        content = self.cache.peek(("content", content_id))
+        if content is LRUCache.MISSING:
+            content = self.repository.find_content_by_id(content_id)
+        return content.post_id if content else None
+
+    def delete_content(self, content_id: int):
+        post_id = self._find_owning_post_id(content_id)
+        self.repository.delete_content(content_id)
+        self.cache.invalidate(("content", content_id))
+        if post_id is not None:
+            self.cache.invalidate(("post", post_id))
+
+    def find_admin_by_id(self, admin_id: int) -> Admin | None:
+        return self._find(
+            ("admin", admin_id),
+            lambda: self.repository.find_admin_by_id(admin_id),
+            self.settings.admin_ttl)
+
+    def save_admin(self, admin: Admin):
+        self.repository.save_admin(admin)
+        self.cache.invalidate(("admin", admin.id))
+
+    def repair_post_summaries(self, batch_size: int = 1000) -> int:
+        repaired = self.repository.repair_post_summaries(batch_size)
+        self.cache.clear()
+        return repaired
+
+    def import_users(self, users: list[User]):
+        self.repository.import_users(users)
+        self.cache.clear()
+
+    def import_posts(self, posts: list[Post]):
+        self.repository.import_posts(posts)
+        self.cache.clear()
+
+    def import_contents(self, contents: list[Content]):
+        self.repository.import_contents(contents)
+        self.cache.clear()
@@ -0,0 +1,164 @@
+import argparse
+import sys
+from contextlib import contextmanager
+from typing import Iterator, TextIO
+
+from sangsangstudio.app import Jinja2TemplateView, create_app
+from sangsangstudio.clock import SystemClock
+from sangsangstudio.factories import (
+    DevelopmentAppFactory,
+    ProductionAppFactory,
+    image_service_from_env,
+    mysql_connector_from_env)
+from sangsangstudio.jobs import JobQueue
+from sangsangstudio.loadtest import LoadTestConfig, load_report, run_load_test, save_report
+from sangsangstudio.repositories import MySQLRepository
+from sangsangstudio.services import AuthorService
+from sangsangstudio.settings import TEMPLATES_DIR, load_env
+from sangsangstudio.startup import StartupTimer, format_imports, profile_imports
+from sangsangstudio.static import StaticSiteExporter
+from sangsangstudio.transfer import export_blog, import_blog
+
+
+@contextmanager
+def open_file(path: str, mode: str) -> Iterator[TextIO]:
+    if path == "-":
+        yield sys.stdout if "w" in mode else sys.stdin
+        return
+    with open(path, mode, encoding="utf-8") as f:
+        yield f
+
+
+def create_repository() -> MySQLRepository:
+    return MySQLRepository(mysql_connector_from_env(), SystemClock())
+
+
+def export_command(args: argparse.Namespace):
+    with open_file(args.path, "w") as out:
+        counts = export_blog(create_repository(), out, args.batch_size)
+    print(f"Exported {counts}", file=sys.stderr)
+
+
+def import_command(args: argparse.Namespace):
+    repository = create_repository()
+    repository.create_tables()
+    with open_file(args.path, "r") as lines:
+        counts = import_blog(repository, lines, args.batch_size)
+    print(f"Imported {counts}", file=sys.stderr)
+
+
+def repair_summaries_command(args: argparse.Namespace):
+    repaired = create_repository().repair_post_summaries(args.batch_size)
+    print(f"Repaired {repaired} post summaries", file=sys.stderr)
+
+
+def export_static_command(args: argparse.Namespace):
+    repository = create_repository()
+    author_service = AuthorService(repository, repository.clock)
+    image_service = image_service_from_env(repository, author_service, JobQueue(repository, repository.clock))
+    exporter = StaticSiteExporter(
+        author_service, Jinja2TemplateView(TEMPLATES_DIR), args.out_dir, image_service, args.page_size)
+    report = exporter.export(full=args.full)
+    print(f"Wrote {len(report.written)} pages, removed {len(report.removed)}, "
+          f"{report.unchanged} unchanged", file=sys.stderr)
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1")
+    return number
+
+
+def load_test_command(args: argparse.Namespace):
+    config = LoadTestConfig(
+        concurrency=args.concurrency,
+        duration=args.duration,
+        users=args.users,
+        posts=args.posts,
+        mode=args.mode,
+        paths=tuple(args.path or LoadTestConfig.paths))
+    baseline = load_report(args.compare) if args.compare else None
+    with DevelopmentAppFactory() as factory:
+        report = run_load_test(factory, create_app(factory, warmup=True), config)
+    print(report.format(baseline))
+    print(f"Saved {save_report(report, args.out_dir)}", file=sys.stderr)
+
+
+def profile_startup_command(args: argparse.Namespace):
+    print(format_imports(profile_imports(args.module), args.top))
+    timer = StartupTimer()
+    with timer.phase("factory"):
+        factory = ProductionAppFactory()
+    try:
+        with timer.phase("create app"):
+            create_app(factory)
+        if args.with_database:
+            factory.prepare()
+            factory.start()
+            factory.warmup(Jinja2TemplateView(TEMPLATES_DIR))
+    finally:
+        factory.close()
+    timer.phases.extend(factory.startup_timer.phases)
+    print()
+    print(timer.report())
+
+
+def create_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="sangsangstudio.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export users, posts and contents as JSON Lines")
+    export_parser.add_argument("path", help="output file, or - for stdout")
+    export_parser.add_argument("--batch-size", type=int, default=1000)
+    export_parser.set_defaults(handler=export_command)
+
+    import_parser = commands.add_parser("import", help="Import a JSON Lines export")
+    import_parser.add_argument("path", help="input file, or - for stdin")
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.set_defaults(handler=import_command)
+
+    repair_parser = commands.add_parser("repair-summaries", help="Recompute the summary columns of every post")
+    repair_parser.add_argument("--batch-size", type=int, default=1000)
+    repair_parser.set_defaults(handler=repair_summaries_command)
+
+    static_parser = commands.add_parser(
+        "export-static", help="Render published posts to static HTML, rebuilding only changed pages")
+    static_parser.add_argument("out_dir")
+    static_parser.add_argument("--page-size", type=int, default=StaticSiteExporter.PAGE_SIZE)
+    static_parser.add_argument("--full", action="store_true", help="rebuild every page")
+    static_parser.set_defaults(handler=export_static_command)
+
+    defaults = LoadTestConfig()
+    load_parser = commands.add_parser(
+        "load-test", help="Seed the development database and measure routes under concurrent load")
+    load_parser.add_argument("--concurrency", type=int, default=defaults.concurrency)
+    load_parser.add_argument("--duration", type=float, default=defaults.duration, help="seconds")
+    load_parser.add_argument("--users", type=positive_int, default=defaults.users)
+    load_parser.add_argument("--posts", type=int, default=defaults.posts)
+    load_parser.add_argument("--mode", choices=("inprocess", "socket"), default=defaults.mode,
+                             help="call the app directly, or over a local waitress socket")
+    load_parser.add_argument(
+        "--path", action="append", help=f"route to load, repeatable (default: {' '.join(defaults.paths)})")
+    load_parser.add_argument("--out-dir", default="loadtest-results")
+    load_parser.add_argument("--compare", help="an earlier result file to compare against")
+    load_parser.set_defaults(handler=load_test_command)
+
+    profile_parser = commands.add_parser(
+        "profile-startup", help="Report import time per module and initialization time per factory phase")
+    profile_parser.add_argument("--module", default="sangsangstudio.app", help="module to import in a fresh interpreter")
+    profile_parser.add_argument("--top", type=positive_int, default=20, help="slowest modules to list")
+    profile_parser.add_argument("--with-database", action="store_true",
+                                help="also run schema, background task and warmup phases against the database")
+    profile_parser.set_defaults(handler=profile_startup_command)
+    return parser
+
+
+def main(args: list[str]):
+    load_env()
+    parsed = create_parser().parse_args(args)
+    parsed.handler(parsed)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
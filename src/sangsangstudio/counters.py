@@ -0,0 +1,122 @@
+import itertools
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Callable
+
+from sangsangstudio.caching import LRUCache
+from sangsangstudio.entities import Post
+from sangsangstudio.repositories import Repository
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self, repository: Repository, shards: int = 16, interval: float = 5.0,
+                 popular_ttl: float = 60.0, views_ttl: float = 60.0, views_cache_size: int = 4096,
+                 timer: Callable[[], float] = time.monotonic):
+        self.repository = repository
+        self.interval = interval
+        self.popular_ttl = popular_ttl
+        self.views_ttl = views_ttl
+        self.timer = timer
+        # Request threads are spread over the shards, so recording a view
+        # rarely waits on a lock held by another thread.
+        self._shards = [(threading.Lock(), Counter()) for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+        self._stored = LRUCache(max_size=views_cache_size, timer=timer)
+        self._flush_lock = threading.Lock()
+        self._popular: tuple[float, int, list[tuple[Post, int]]] | None = None
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _shard(self) -> tuple[threading.Lock, Counter]:
+        # Thread idents are aligned addresses, so they cannot pick a shard;
+        # each thread is handed the next shard in turn instead.
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._next_shard) % len(self._shards)]
+        return shard
+
+    def record(self, post_id: int):
+        lock, counts = self._shard()
+        with lock:
+            counts[post_id] += 1
+
+    def pending(self) -> Counter:
+        total = Counter()
+        for lock, counts in self._shards:
+            with lock:
+                total.update(counts)
+        return total
+
+    def _drain(self) -> Counter:
+        total = Counter()
+        for lock, counts in self._shards:
+            with lock:
+                total.update(counts)
+                counts.clear()
+        return total
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            counts = self._drain()
+            if not counts:
+                return 0
+            try:
+                self.repository.add_post_views(dict(counts))
+            except Exception:
+                # Keep the views for the next flush rather than losing them.
+                lock, shard = self._shards[0]
+                with lock:
+                    shard.update(counts)
+                raise
+            for post_id in counts:
+                self._stored.invalidate(post_id)
+            return sum(counts.values())
+
+    def views(self, post_ids: list[int]) -> dict[int, int]:
+        # Stored totals are cached, so a page view costs no query. A flush
+        # drops the totals it changed; views_ttl bounds how long views
+        # flushed by other workers take to show up.
+        pending = self.pending()
+        return {post_id: self._stored_views(post_id) + pending[post_id] for post_id in post_ids}
+
+    def _stored_views(self, post_id: int) -> int:
+        return self._stored.get_or_load(
+            post_id, lambda: self.repository.find_post_views([post_id]).get(post_id, 0), self.views_ttl)
+
+    def popular(self, limit: int = 10) -> list[tuple[Post, int]]:
+        # The ranking changes slowly, so it is read from MySQL at most once per TTL.
+        cached = self._popular
+        if cached and cached[1] >= limit and self.timer() - cached[0] < self.popular_ttl:
+            return cached[2][:limit]
+        posts = self.repository.find_most_viewed_posts(limit)
+        self._popular = (self.timer(), limit, posts)
+        return posts
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Flushing view counts failed")
+
+    def start(self):
+        if self._thread:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="view-counter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing view counts on shutdown failed")
@@ -48,6 +48,10 @@ class Post(Entity):
     title: str = ""
     status: PostStatus = PostStatus.DRAFT
     contents: list[Content] = field(default_factory=list)
+    excerpt: str = ""
+    image_src: str = ""
+    content_count: int = 0
+    modified_on: datetime | None = None
 
     def add_paragraph(self, text: str):
         self.contents.append(
@@ -68,3 +72,34 @@ class Admin(Entity):
     user: User | None = None
     first_name: str = ""
     family_name: str = ""
+
+
+@dataclass
+class ImageVariant(Entity):
+    image_key: str = ""
+    width: int = 0
+    format: str = ""
+    src: str = ""
+
+
+class JobStatus(Enum):
+    QUEUED = 0
+    RUNNING = 1
+    DONE = 2
+    FAILED = 3
+
+
+@dataclass
+class Job(Entity):
+    kind: str = ""
+    payload: str = "{}"
+    priority: int = 0
+    status: JobStatus = JobStatus.QUEUED
+    attempts: int = 0
+    max_attempts: int = 5
+    idempotency_key: str | None = None
+    run_at: datetime = field(default_factory=datetime.now)
+    created_on: datetime = field(default_factory=datetime.now)
+    started_on: datetime | None = None
+    finished_on: datetime | None = None
+    last_error: str = ""
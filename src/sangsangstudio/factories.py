@@ -1,9 +1,47 @@
+from __future__ import annotations
+
+import logging
 import os
+import threading
 from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable
 
+from sangsangstudio.autosave import AutosaveBuffer
+from sangsangstudio.bloom import UsernameFilter
+from sangsangstudio.caching import CacheSettings, CachingRepository, LRUCache
 from sangsangstudio.clock import SystemClock
-from sangsangstudio.repositories import MySQLConnector, MySQLRepository
-from sangsangstudio.services import AuthorService, UserService, BcryptPasswordHasher, CreateUserRequest
+from sangsangstudio.counters import ViewCounter
+from sangsangstudio.feeds import FeedCache
+from sangsangstudio.images import ImageService, ImageStore, create_image_resizer
+from sangsangstudio.jobs import JobQueue, JobWorkerPool
+from sangsangstudio.metrics import MetricsRegistry
+from sangsangstudio.entities import PostStatus
+from sangsangstudio.middleware import (
+    DevelopmentLoginMiddleware,
+    IdentityMapMiddleware,
+    QueryBudgetMiddleware,
+    ReadYourWritesMiddleware,
+    SessionCookieMiddleware)
+from sangsangstudio.repositories import MySQLConnector, MySQLRepository, Repository, ReplicatedConnector
+from sangsangstudio.search import SearchIndex, InMemorySearchIndex, MySQLSearchIndex
+from sangsangstudio.services import (
+    AdminService,
+    AuthorService,
+    RoleService,
+    UserService,
+    BcryptPasswordHasher,
+    CreateUserRequest,
+    PasswordHasher)
+from sangsangstudio.sessions import WriteBehindSessionRepository
+from sangsangstudio.settings import MEDIA_DIR, load_env
+from sangsangstudio.startup import StartupTimer
+from sangsangstudio.sweeper import SessionSweeper
+
+if TYPE_CHECKING:
+    from sangsangstudio.app import TemplateView
+
+logger = logging.getLogger(__name__)
 
 
 class AppFactory(ABC):
@@ -15,41 +53,510 @@ class AppFactory(ABC):
     def user_service(self) -> UserService:
         pass
 
+    @abstractmethod
+    def search_index(self) -> SearchIndex:
+        pass
+
+    @abstractmethod
+    def role_service(self) -> RoleService:
+        pass
+
+    @abstractmethod
+    def metrics(self) -> MetricsRegistry:
+        pass
+
+    @abstractmethod
+    def admin_service(self) -> AdminService:
+        pass
+
+    @abstractmethod
+    def image_service(self) -> ImageService:
+        pass
+
+    @abstractmethod
+    def feed_cache(self) -> FeedCache:
+        pass
+
+    @abstractmethod
+    def autosave_buffer(self) -> AutosaveBuffer:
+        pass
+
+    @abstractmethod
+    def view_counter(self) -> ViewCounter:
+        pass
+
+    @abstractmethod
+    def job_queue(self) -> JobQueue:
+        pass
+
+    def prepare(self):
+        pass
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def warmup(self, view: TemplateView):
+        view.warmup()
+
+    def middleware(self) -> list:
+        return []
+
+    def fragment_cache(self) -> LRUCache:
+        return LRUCache(max_size=int(os.getenv("FRAGMENT_CACHE_SIZE", 2048)))
+
+    def __enter__(self):
+        self.prepare()
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def cache_settings_from_env() -> CacheSettings | None:
+    if os.getenv("REPOSITORY_CACHE", "").lower() not in ("1", "true", "yes"):
+        return None
+    defaults = CacheSettings()
+    return CacheSettings(
+        max_size=int(os.getenv("REPOSITORY_CACHE_SIZE", defaults.max_size)),
+        user_ttl=float(os.getenv("REPOSITORY_CACHE_USER_TTL", defaults.user_ttl)),
+        post_ttl=float(os.getenv("REPOSITORY_CACHE_POST_TTL", defaults.post_ttl)),
+        content_ttl=float(os.getenv("REPOSITORY_CACHE_CONTENT_TTL", defaults.content_ttl)),
+        admin_ttl=float(os.getenv("REPOSITORY_CACHE_ADMIN_TTL", defaults.admin_ttl)))
+
+
+def mysql_connector_from_env(pool_size: int | None = None) -> MySQLConnector | ReplicatedConnector:
+    pool_size = pool_size if pool_size is not None else int(os.getenv("MYSQL_POOL_SIZE", 0))
+    primary = MySQLConnector(
+        user=os.getenv("MYSQL_USER"),
+        password=os.getenv("MYSQL_PASSWORD"),
+        host=os.getenv("MYSQL_HOST"),
+        database=os.getenv("MYSQL_DATABASE"),
+        port=os.getenv("MYSQL_PORT", 3306),
+        pool_size=pool_size)
+    replicas = parse_replicas(os.getenv("MYSQL_REPLICAS", ""), primary)
+    if not replicas:
+        return primary
+    return ReplicatedConnector(
+        primary, replicas, ejection_period=float(os.getenv("MYSQL_REPLICA_EJECTION_PERIOD", 30)))
+
+
+def parse_replicas(spec: str, primary: MySQLConnector) -> list[tuple[MySQLConnector, int]]:
+    # MYSQL_REPLICAS="host:port:weight,host:port:weight"; credentials match the primary.
+    replicas = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        host, port, weight = (entry.split(":") + ["3306", "1"])[:3]
+        replicas.append((MySQLConnector(
+            user=primary.user,
+            password=primary.password,
+            host=host,
+            database=primary.database,
+            port=int(port),
+            pool_size=primary.pool_size), int(weight)))
+    return replicas
+
+
+def consistency_middleware(connector: MySQLConnector | ReplicatedConnector) -> list:
+    if isinstance(connector, ReplicatedConnector):
+        return [ReadYourWritesMiddleware(connector)]
+    return []
+
+
+def query_budget_middleware_from_env() -> QueryBudgetMiddleware:
+    return QueryBudgetMiddleware(
+        repeat_threshold=int(os.getenv("QUERY_REPEAT_THRESHOLD", 5)),
+        budget=int(os.getenv("QUERY_BUDGET", 0)))
+
+
+def role_service_from_env(repository: Repository) -> RoleService:
+    return RoleService(repository, ttl=float(os.getenv("ROLE_CACHE_TTL", 300)))
+
+
+def username_filter_from_env(repository: Repository, metrics: MetricsRegistry) -> UsernameFilter | None:
+    if os.getenv("USERNAME_FILTER", "true").lower() not in ("1", "true", "yes"):
+        return None
+    username_filter = UsernameFilter(
+        repository,
+        error_rate=float(os.getenv("USERNAME_FILTER_ERROR_RATE", 0.01)),
+        capacity=int(os.getenv("USERNAME_FILTER_CAPACITY", 10_000)))
+    metrics.gauge("username_filter_memory_bytes", "Memory used by the username Bloom filter",
+                  username_filter.memory_bytes)
+    metrics.gauge("username_filter_usernames", "Usernames in the username Bloom filter", username_filter.count)
+    metrics.counter("username_filter_rejections_total", "Logins rejected without a username lookup",
+                    lambda: username_filter.rejections)
+    return username_filter
+
+
+def session_ttl_from_env() -> timedelta:
+    return timedelta(seconds=float(os.getenv(
+        "SESSION_TTL_SECONDS", UserService.DEFAULT_SESSION_TTL.total_seconds())))
+
+
+def session_writer_from_env(repository: Repository, metrics: MetricsRegistry) -> WriteBehindSessionRepository | None:
+    if os.getenv("SESSION_WRITE_BEHIND", "").lower() not in ("1", "true", "yes"):
+        return None
+    session_writer = WriteBehindSessionRepository(
+        repository,
+        interval=float(os.getenv("SESSION_FLUSH_INTERVAL", 0.005)),
+        batch_size=int(os.getenv("SESSION_FLUSH_BATCH_SIZE", 500)),
+        max_pending=int(os.getenv("SESSION_MAX_PENDING", 10_000)))
+    metrics.gauge("sessions_pending_writes", "Sessions created but not yet written to MySQL",
+                  session_writer.pending)
+    metrics.counter("sessions_flushed_total", "Sessions written by the write-behind flusher",
+                    lambda: session_writer.flushed)
+    return session_writer
+
+
+def session_sweeper_from_env(repository: Repository, clock: SystemClock, session_ttl: timedelta) -> SessionSweeper:
+    return SessionSweeper(
+        repository=repository,
+        clock=clock,
+        session_ttl=session_ttl,
+        interval=float(os.getenv("SESSION_SWEEP_INTERVAL", 300)),
+        batch_size=int(os.getenv("SESSION_SWEEP_BATCH_SIZE", 500)))
+
+
+def search_index_from_env(repository: Repository) -> SearchIndex:
+    if os.getenv("SEARCH_BACKEND", "mysql") == "memory":
+        return InMemorySearchIndex()
+    return MySQLSearchIndex(repository)
+
+
+def image_service_from_env(repository: Repository, author_service: AuthorService, job_queue: JobQueue) -> ImageService:
+    return ImageService(
+        repository=repository,
+        author_service=author_service,
+        store=ImageStore(os.getenv("MEDIA_DIR", MEDIA_DIR)),
+        resizer=create_image_resizer(),
+        job_queue=job_queue)
+
+
+def job_workers_from_env(job_queue: JobQueue, image_service: ImageService, metrics: MetricsRegistry) -> JobWorkerPool:
+    # JOB_WORKERS=0 leaves the queue to workers in other processes.
+    job_workers = JobWorkerPool(
+        job_queue,
+        workers=int(os.getenv("JOB_WORKERS", 2)),
+        poll_interval=float(os.getenv("JOB_POLL_INTERVAL", 1)),
+        backoff=float(os.getenv("JOB_RETRY_BACKOFF", 5)),
+        max_backoff=float(os.getenv("JOB_RETRY_MAX_BACKOFF", 600)),
+        lease=timedelta(seconds=float(os.getenv("JOB_LEASE_SECONDS", 600))))
+    job_workers.register(ImageService.VARIANTS_JOB, image_service.run_variants_job)
+    job_workers.register_metrics(metrics)
+    return job_workers
+
+
+def feed_cache_from_env(author_service: AuthorService) -> FeedCache:
+    feed_cache = FeedCache(
+        author_service,
+        site_url=os.getenv("SITE_URL", "http://localhost:8080"),
+        size=int(os.getenv("FEED_SIZE", 20)),
+        max_age=float(os.getenv("FEED_MAX_AGE", 60)))
+    author_service.add_listener(feed_cache)
+    return feed_cache
+
+
+def autosave_buffer_from_env(author_service: AuthorService) -> AutosaveBuffer:
+    autosave_buffer = AutosaveBuffer(
+        author_service,
+        delay=float(os.getenv("AUTOSAVE_DELAY", 2)),
+        max_delay=float(os.getenv("AUTOSAVE_MAX_DELAY", 10)))
+    author_service.add_listener(autosave_buffer)
+    return autosave_buffer
+
+
+def view_counter_from_env(repository: Repository) -> ViewCounter:
+    return ViewCounter(
+        repository,
+        interval=float(os.getenv("VIEW_FLUSH_INTERVAL", 5)),
+        popular_ttl=float(os.getenv("VIEW_POPULAR_TTL", 60)),
+        views_ttl=float(os.getenv("VIEW_COUNT_TTL", 60)))
+
 
 class DevelopmentAppFactory(AppFactory):
-    def __init__(self):
-        self.mysql_connector = MySQLConnector(
-            user=os.getenv("MYSQL_USER"),
-            password=os.getenv("MYSQL_PASSWORD"),
-            host=os.getenv("MYSQL_HOST"),
-            database=os.getenv("MYSQL_DATABASE"),
-            port=os.getenv("MYSQL_PORT", 3306))
+    def __init__(self, cache_settings: CacheSettings | None = None, pool_size: int | None = None):
+        load_env()
+        self.mysql_connector = mysql_connector_from_env(pool_size)
         self._clock = SystemClock()
         self._repository = MySQLRepository(self.mysql_connector, self._clock)
+        cache_settings = cache_settings or cache_settings_from_env()
+        if cache_settings:
+            self._repository = CachingRepository(self._repository, cache_settings)
         self._password_hasher = BcryptPasswordHasher()
+        session_ttl = session_ttl_from_env()
+        self._metrics = MetricsRegistry()
+        self._role_service = role_service_from_env(self._repository)
+        self._username_filter = username_filter_from_env(self._repository, self._metrics)
+        self._session_writer = session_writer_from_env(self._repository, self._metrics)
         self._user_service = UserService(
-            repository=self._repository,
+            repository=self._session_writer or self._repository,
             clock=self._clock,
-            password_hasher=self._password_hasher)
+            password_hasher=self._password_hasher,
+            session_ttl=session_ttl,
+            role_service=self._role_service,
+            username_filter=self._username_filter)
+        self._admin_service = AdminService(self._repository, self._clock, self._role_service)
+        self._session_sweeper = session_sweeper_from_env(self._repository, self._clock, session_ttl)
+        self._search_index = search_index_from_env(self._repository)
         self._author_service = AuthorService(
             repository=self._repository,
-            clock=self._clock)
+            clock=self._clock,
+            listeners=[self._search_index])
+        self._job_queue = JobQueue(self._repository, self._clock)
+        self._image_service = image_service_from_env(self._repository, self._author_service, self._job_queue)
+        self._job_workers = job_workers_from_env(self._job_queue, self._image_service, self._metrics)
+        self._feed_cache = feed_cache_from_env(self._author_service)
+        self._autosave_buffer = autosave_buffer_from_env(self._author_service)
+        self._view_counter = view_counter_from_env(self._repository)
 
     def author_service(self) -> AuthorService:
         return self._author_service
 
+    def feed_cache(self) -> FeedCache:
+        return self._feed_cache
+
+    def autosave_buffer(self) -> AutosaveBuffer:
+        return self._autosave_buffer
+
+    def view_counter(self) -> ViewCounter:
+        return self._view_counter
+
+    def job_queue(self) -> JobQueue:
+        return self._job_queue
+
+    def image_service(self) -> ImageService:
+        return self._image_service
+
     def user_service(self) -> UserService:
         return self._user_service
 
+    def role_service(self) -> RoleService:
+        return self._role_service
+
+    def metrics(self) -> MetricsRegistry:
+        return self._metrics
+
+    def admin_service(self) -> AdminService:
+        return self._admin_service
+
+    def search_index(self) -> SearchIndex:
+        return self._search_index
+
+    def middleware(self) -> list:
+        return [query_budget_middleware_from_env(), IdentityMapMiddleware(),
+                *consistency_middleware(self.mysql_connector), DevelopmentLoginMiddleware(self._user_service)]
+
     def _load_sample_data(self):
         self._user_service.create_user(CreateUserRequest(username="vince", password="p1a2s3s4"))
 
-    def __enter__(self):
+    def prepare(self):
         self._repository.drop_tables()
         self._repository.create_tables()
         self._load_sample_data()
-        return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+    def start(self):
+        self._search_index.rebuild(self._repository)
+        if self._username_filter:
+            self._username_filter.build()
+        if self._session_writer:
+            self._session_writer.start()
+        self._session_sweeper.start()
+        self._autosave_buffer.start()
+        self._view_counter.start()
+        if self._job_workers.workers:
+            self._job_workers.start()
+
+    def close(self):
+        self._job_workers.stop()
+        if self._session_writer:
+            self._session_writer.stop()
+        self._session_sweeper.stop()
+        self._autosave_buffer.stop()
+        self._view_counter.stop()
+        self.mysql_connector.close()
+
+
+class ProductionAppFactory(AppFactory):
+    WARMUP_POSTS = 20
+
+    def __init__(self, cache_settings: CacheSettings | None = None, pool_size: int | None = None):
+        load_env()
+        self.mysql_connector = mysql_connector_from_env(pool_size)
+        self.cache_settings = cache_settings or cache_settings_from_env()
+        self.session_ttl = session_ttl_from_env()
+        self.startup_timer = StartupTimer()
+        self._clock = SystemClock()
+        self._lock = threading.RLock()
+        self._repository: Repository | None = None
+        self._password_hasher: PasswordHasher | None = None
+        self._user_service: UserService | None = None
+        self._role_service: RoleService | None = None
+        self._metrics: MetricsRegistry | None = None
+        self._username_filter: UsernameFilter | None = None
+        self._username_filter_built = False
+        self._session_writer: WriteBehindSessionRepository | None = None
+        self._session_writer_built = False
+        self._admin_service: AdminService | None = None
+        self._author_service: AuthorService | None = None
+        self._search_index: SearchIndex | None = None
+        self._session_sweeper: SessionSweeper | None = None
+        self._image_service: ImageService | None = None
+        self._feed_cache: FeedCache | None = None
+        self._autosave_buffer: AutosaveBuffer | None = None
+        self._view_counter: ViewCounter | None = None
+        self._job_queue: JobQueue | None = None
+        self._job_workers: JobWorkerPool | None = None
+
+    def _lazy(self, name: str, build: Callable[[], Any]) -> Any:
+        value = getattr(self, name)
+        if value is None:
+            with self._lock:
+                value = getattr(self, name)
+                if value is None:
+                    value = build()
+                    setattr(self, name, value)
+        return value
+
+    def _build_repository(self) -> Repository:
+        repository = MySQLRepository(self.mysql_connector, self._clock)
+        if self.cache_settings:
+            return CachingRepository(repository, self.cache_settings)
+        return repository
+
+    def repository(self) -> Repository:
+        return self._lazy("_repository", self._build_repository)
+
+    def password_hasher(self) -> PasswordHasher:
+        return self._lazy("_password_hasher", BcryptPasswordHasher)
+
+    def user_service(self) -> UserService:
+        return self._lazy("_user_service", lambda: UserService(
+            repository=self.session_writer() or self.repository(),
+            clock=self._clock,
+            password_hasher=self.password_hasher(),
+            session_ttl=self.session_ttl,
+            role_service=self.role_service(),
+            username_filter=self.username_filter()))
+
+    def metrics(self) -> MetricsRegistry:
+        return self._lazy("_metrics", MetricsRegistry)
+
+    def username_filter(self) -> UsernameFilter | None:
+        if not self._username_filter_built:
+            with self._lock:
+                if not self._username_filter_built:
+                    self._username_filter = username_filter_from_env(self.repository(), self.metrics())
+                    self._username_filter_built = True
+        return self._username_filter
+
+    def session_writer(self) -> WriteBehindSessionRepository | None:
+        if not self._session_writer_built:
+            with self._lock:
+                if not self._session_writer_built:
+                    self._session_writer = session_writer_from_env(self.repository(), self.metrics())
+                    self._session_writer_built = True
+        return self._session_writer
+
+    def role_service(self) -> RoleService:
+        return self._lazy("_role_service", lambda: role_service_from_env(self.repository()))
+
+    def admin_service(self) -> AdminService:
+        return self._lazy("_admin_service", lambda: AdminService(self.repository(), self._clock, self.role_service()))
+
+    def author_service(self) -> AuthorService:
+        return self._lazy("_author_service", lambda: AuthorService(
+            repository=self.repository(),
+            clock=self._clock,
+            listeners=[self.search_index()]))
+
+    def search_index(self) -> SearchIndex:
+        return self._lazy("_search_index", lambda: search_index_from_env(self.repository()))
+
+    def image_service(self) -> ImageService:
+        return self._lazy("_image_service", lambda: image_service_from_env(
+            self.repository(), self.author_service(), self.job_queue()))
+
+    def job_queue(self) -> JobQueue:
+        return self._lazy("_job_queue", lambda: JobQueue(self.repository(), self._clock))
+
+    def job_workers(self) -> JobWorkerPool:
+        return self._lazy("_job_workers", lambda: job_workers_from_env(
+            self.job_queue(), self.image_service(), self.metrics()))
+
+    def feed_cache(self) -> FeedCache:
+        return self._lazy("_feed_cache", lambda: feed_cache_from_env(self.author_service()))
+
+    def autosave_buffer(self) -> AutosaveBuffer:
+        return self._lazy("_autosave_buffer", lambda: autosave_buffer_from_env(self.author_service()))
+
+    def view_counter(self) -> ViewCounter:
+        return self._lazy("_view_counter", lambda: view_counter_from_env(self.repository()))
+
+    def middleware(self) -> list:
+        return [IdentityMapMiddleware(), *consistency_middleware(self.mysql_connector),
+                SessionCookieMiddleware(self.user_service())]
+
+    def session_sweeper(self) -> SessionSweeper:
+        return self._lazy("_session_sweeper", lambda: session_sweeper_from_env(
+            self.repository(), self._clock, self.session_ttl))
+
+    def prepare(self):
+        with self.startup_timer.phase("schema"):
+            migrations = self.repository().create_tables()
+        for statement in migrations:
+            logger.info("Applied migration: %s", statement)
+        logger.info("Schema ready:\n%s", self.startup_timer.report())
+
+    def start(self):
+        with self.startup_timer.phase("search index"):
+            self.search_index().rebuild(self.repository())
+        if self.username_filter():
+            with self.startup_timer.phase("username filter"):
+                self.username_filter().build()
+        with self.startup_timer.phase("background tasks"):
+            if self.session_writer():
+                self.session_writer().start()
+            self.session_sweeper().start()
+            self.autosave_buffer().start()
+            self.view_counter().start()
+            if self.job_workers().workers:
+                self.job_workers().start()
+
+    def warmup(self, view: TemplateView):
+        with self.startup_timer.phase("connection pool"):
+            self.mysql_connector.prefill()
+        with self.startup_timer.phase("services"):
+            self.user_service()
+            self.author_service()
+            self.image_service()
+            self.feed_cache()
+        with self.startup_timer.phase("templates"):
+            view.warmup()
+        if self.cache_settings:
+            with self.startup_timer.phase("caches"):
+                self._prime_caches()
+        logger.info("Startup phases (pid %d):\n%s", os.getpid(), self.startup_timer.report())
+
+    def _prime_caches(self):
+        repository = self.repository()
+        for post in repository.find_posts_by_status(PostStatus.PUBLISHED, limit=self.WARMUP_POSTS):
+            repository.find_post_by_id(post.id)
+            repository.find_user_by_id(post.author.id)
 
+    def close(self):
+        if self._job_workers:
+            # Running jobs finish before their connections go away; queued ones stay queued.
+            self._job_workers.stop()
+        if self._session_writer:
+            # Sessions handed out but not yet inserted are written before shutdown.
+            self._session_writer.stop()
+        if self._session_sweeper:
+            self._session_sweeper.stop()
+        if self._autosave_buffer:
+            # Pending edits are written before the connections go away.
+            self._autosave_buffer.stop()
+        if self._view_counter:
+            self._view_counter.stop()
+        self.mysql_connector.close()
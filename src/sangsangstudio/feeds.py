@@ -0,0 +1,126 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Callable
+from xml.etree.ElementTree import Element, SubElement, tostring
+
+from sangsangstudio.entities import Post, Content
+from sangsangstudio.services import AuthorService, PostDto, PostListener
+
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+FEED_TITLE = "Sang Sang Studio"
+
+
+@dataclass(frozen=True)
+class Feed:
+    body: bytes
+    content_type: str
+    etag: str
+    last_modified: datetime
+
+
+def _text(parent: Element, tag: str, text: str, **attributes) -> Element:
+    element = SubElement(parent, tag, attributes)
+    element.text = text
+    return element
+
+
+def render_atom(posts: list[PostDto], site_url: str, updated: datetime) -> bytes:
+    feed = Element("feed", xmlns=ATOM_NAMESPACE)
+    _text(feed, "title", FEED_TITLE)
+    _text(feed, "id", f"{site_url}/blog")
+    _text(feed, "updated", updated.isoformat())
+    SubElement(feed, "link", href=f"{site_url}/blog")
+    SubElement(feed, "link", href=f"{site_url}/blog/feed.atom", rel="self")
+    for post in posts:
+        url = f"{site_url}/blog/posts/{post.id}"
+        entry = SubElement(feed, "entry")
+        _text(entry, "title", post.title)
+        _text(entry, "id", url)
+        SubElement(entry, "link", href=url)
+        _text(entry, "published", post.created_on.isoformat())
+        _text(entry, "updated", post.modified_on.isoformat())
+        author = SubElement(entry, "author")
+        _text(author, "name", post.author.username)
+        _text(entry, "summary", post.excerpt)
+    return tostring(feed, encoding="utf-8", xml_declaration=True)
+
+
+def render_rss(posts: list[PostDto], site_url: str, updated: datetime) -> bytes:
+    rss = Element("rss", version="2.0")
+    channel = SubElement(rss, "channel")
+    _text(channel, "title", FEED_TITLE)
+    _text(channel, "link", f"{site_url}/blog")
+    _text(channel, "description", f"Latest posts from {FEED_TITLE}")
+    _text(channel, "lastBuildDate", format_datetime(updated, usegmt=True))
+    for post in posts:
+        url = f"{site_url}/blog/posts/{post.id}"
+        item = SubElement(channel, "item")
+        _text(item, "title", post.title)
+        _text(item, "link", url)
+        _text(item, "guid", url, isPermaLink="true")
+        _text(item, "pubDate", format_datetime(post.created_on.astimezone(timezone.utc), usegmt=True))
+        _text(item, "description", post.excerpt)
+    return tostring(rss, encoding="utf-8", xml_declaration=True)
+
+
+FORMATS = {
+    "atom": (render_atom, "application/atom+xml; charset=utf-8"),
+    "rss": (render_rss, "application/rss+xml; charset=utf-8")}
+
+
+class FeedCache(PostListener):
+    def __init__(self, author_service: AuthorService, site_url: str, size: int = 20, max_age: float = 60.0,
+                 timer: Callable[[], float] = time.monotonic):
+        self.author_service = author_service
+        self.site_url = site_url.rstrip("/")
+        self.size = size
+        self.max_age = max_age
+        self.timer = timer
+        self._lock = threading.Lock()
+        self._feeds: dict[str, tuple[Feed, float]] = {}
+        self._generation = 0
+
+    def feed(self, name: str) -> Feed:
+        cached = self._feeds.get(name)
+        # Mutations in this process clear the cache at once; max_age bounds
+        # how long a feed can lag behind writes made by other workers.
+        if cached and self.timer() - cached[1] < self.max_age:
+            return cached[0]
+        with self._lock:
+            generation = self._generation
+        feed = self._build(name)
+        with self._lock:
+            if generation == self._generation:
+                self._feeds[name] = (feed, self.timer())
+        return feed
+
+    def _build(self, name: str) -> Feed:
+        render, content_type = FORMATS[name]
+        posts = self.author_service.find_published_posts(limit=self.size)
+        # Posts carry the clock's local time; HTTP dates and RSS need UTC.
+        updated = max((p.modified_on for p in posts), default=datetime.fromtimestamp(0, timezone.utc))
+        updated = updated.astimezone(timezone.utc)
+        body = render(posts, self.site_url, updated)
+        return Feed(
+            body=body,
+            content_type=content_type,
+            etag=hashlib.sha256(body).hexdigest()[:32],
+            last_modified=updated.replace(microsecond=0))
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._feeds.clear()
+
+    def post_saved(self, post: Post):
+        self.invalidate()
+
+    def content_saved(self, content: Content):
+        self.invalidate()
+
+    def content_deleted(self, content_id: int):
+        self.invalidate()
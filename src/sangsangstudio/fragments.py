@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+from typing import TYPE_CHECKING, Callable
+
+from sangsangstudio.caching import LRUCache
+from sangsangstudio.services import ContentDto, PostDto
+
+if TYPE_CHECKING:
+    from sangsangstudio.app import TemplateView
+
+
+def content_version(content: ContentDto) -> str:
+    digest = hashlib.blake2b(digest_size=8)
+    for part in (str(content.sequence), content.type.name, content.text, content.src):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FragmentRenderer:
+    # Keys carry the entity's version, so an edited entity simply misses the
+    # cache; stale fragments are never served and age out of the LRU.
+    TTL = 3600.0
+
+    def __init__(self, view: TemplateView, cache: LRUCache | None = None):
+        self.view = view
+        self.cache = cache if cache is not None else LRUCache(max_size=1024)
+
+    def _render(self, key: tuple, render: Callable[[], str]) -> str:
+        return self.cache.get_or_load(key, render, self.TTL)
+
+    def post_card(self, post: PostDto) -> str:
+        return self._render(
+            ("post_card", post.id, post.modified_on, post.status),
+            lambda: self.view.render("fragments/post_card.html", post=post))
+
+    def post_list(self, posts: list[PostDto], page: int, has_next: bool,
+                  page_url: Callable[[int], str], fragment_url: Callable[[int], str] | None = None) -> str:
+        return self.view.render(
+            "fragments/post_list.html",
+            cards=[self.post_card(p) for p in posts],
+            page=page,
+            has_next=has_next,
+            page_url=page_url,
+            fragment_url=fragment_url)
+
+    def content(self, content: ContentDto, srcset: str = "") -> str:
+        return self._render(
+            ("content", content.id, content_version(content), srcset),
+            lambda: self.view.render("fragments/content.html", content=content, srcset=srcset))
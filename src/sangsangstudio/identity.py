@@ -0,0 +1,63 @@
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+from sangsangstudio.entities import Entity
+
+E = TypeVar("E", bound=Entity)
+
+
+class IdentityMap:
+    def __init__(self):
+        self._entities: dict[tuple[type, int], Entity] = {}
+        self.hits = 0
+
+    def get(self, entity_type: type[E], entity_id: int) -> E | None:
+        entity = self._entities.get((entity_type, entity_id))
+        if entity is not None:
+            self.hits += 1
+        return entity
+
+    def add(self, entity: E) -> E:
+        # The first instance loaded in a request wins, so every caller shares one object.
+        return self._entities.setdefault((type(entity), entity.id), entity)
+
+    def discard(self, entity_type: type, entity_id: int):
+        self._entities.pop((entity_type, entity_id), None)
+
+    def __len__(self) -> int:
+        return len(self._entities)
+
+
+_current: contextvars.ContextVar[IdentityMap | None] = contextvars.ContextVar("identity_map", default=None)
+
+
+def current_identity_map() -> IdentityMap | None:
+    return _current.get()
+
+
+def begin_identity_map() -> tuple[IdentityMap, contextvars.Token]:
+    identity_map = IdentityMap()
+    return identity_map, _current.set(identity_map)
+
+
+def end_identity_map(token: contextvars.Token):
+    _current.reset(token)
+
+
+@contextmanager
+def identity_scope() -> Iterator[IdentityMap]:
+    identity_map, token = begin_identity_map()
+    try:
+        yield identity_map
+    finally:
+        end_identity_map(token)
+
+
+def identified(entity_type: type[E], entity_id: int, build: Callable[[], E]) -> E:
+    # Outside a request scope every load builds a new instance, as before.
+    identity_map = _current.get()
+    if identity_map is None:
+        return build()
+    entity = identity_map.get(entity_type, entity_id)
+    return entity if entity is not None else identity_map.add(build())
@@ -0,0 +1,228 @@
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable
+
+from sangsangstudio.entities import ImageVariant
+from sangsangstudio.jobs import JobQueue
+from sangsangstudio.repositories import Repository
+from sangsangstudio.services import (
+    AuthorService,
+    AddContentRequest,
+    ContentDto,
+    ContentTypeDto,
+    UserDto)
+
+logger = logging.getLogger(__name__)
+
+
+class UnsupportedImage(RuntimeError):
+    pass
+
+
+class ImageTooLarge(RuntimeError):
+    pass
+
+
+def sniff_extension(head: bytes) -> str | None:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+CONTENT_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp"}
+
+
+class ImageStore:
+    NAME_PATTERN = re.compile(r"^[0-9a-f]{64}(-\d+)?\.(jpg|png|gif|webp)$")
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name: str) -> str | None:
+        if not self.NAME_PATTERN.match(name):
+            return None
+        path = os.path.join(self.root, name)
+        return path if os.path.exists(path) else None
+
+    def save(self, stream: BinaryIO, max_bytes: int) -> str:
+        # Originals are named after their content hash, so uploading the
+        # same file twice stores it once.
+        digest = hashlib.sha256()
+        size = 0
+        extension = None
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as temp:
+                while chunk := stream.read(self.CHUNK_SIZE):
+                    if extension is None:
+                        extension = sniff_extension(chunk)
+                        if extension is None:
+                            raise UnsupportedImage()
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise ImageTooLarge()
+                    digest.update(chunk)
+                    temp.write(chunk)
+            if extension is None:
+                raise UnsupportedImage()
+            name = f"{digest.hexdigest()}.{extension}"
+            if os.path.exists(os.path.join(self.root, name)):
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, os.path.join(self.root, name))
+            return name
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def write(self, name: str, data: bytes):
+        fd, temp_path = tempfile.mkstemp(dir=self.root, prefix=".variant-")
+        with os.fdopen(fd, "wb") as temp:
+            temp.write(data)
+        os.replace(temp_path, os.path.join(self.root, name))
+
+
+class ImageResizer(ABC):
+    @abstractmethod
+    def resize(self, path: str, width: int, image_format: str) -> bytes | None:
+        pass
+
+
+class PillowImageResizer(ImageResizer):
+    def __init__(self):
+        from PIL import Image
+        self.image = Image
+
+    def resize(self, path: str, width: int, image_format: str) -> bytes | None:
+        with self.image.open(path) as original:
+            if original.width <= width:
+                return None
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), self.image.Resampling.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, format=image_format.upper(), quality=80)
+            return buffer.getvalue()
+
+
+def create_image_resizer() -> ImageResizer | None:
+    try:
+        return PillowImageResizer()
+    except ImportError:
+        logger.warning("Pillow is not installed; responsive image variants are disabled")
+        return None
+
+
+@dataclass(frozen=True)
+class UploadImageRequest:
+    user: UserDto
+    post_id: int
+    stream: BinaryIO
+    text: str = ""
+
+
+class ImageService:
+    URL_PREFIX = "/images/"
+    WIDTHS = (320, 640, 1280)
+    FORMATS = ("webp",)
+    MAX_BYTES = 20 * 1024 * 1024
+    VARIANTS_JOB = "image_variants"
+    VARIANTS_PRIORITY = 10
+
+    def __init__(self, repository: Repository, author_service: AuthorService, store: ImageStore,
+                 resizer: ImageResizer | None, job_queue: JobQueue):
+        self.repository = repository
+        self.author_service = author_service
+        self.store = store
+        self.resizer = resizer
+        self.job_queue = job_queue
+
+    def store_image(self, stream: BinaryIO) -> str:
+        name = self.store.save(stream, self.MAX_BYTES)
+        if not self.resizer:
+            return name
+        # Resizing is slow; it never runs on the request thread.
+        self.job_queue.enqueue(
+            self.VARIANTS_JOB, {"name": name}, priority=self.VARIANTS_PRIORITY,
+            idempotency_key=f"{self.VARIANTS_JOB}:{name}")
+        return name
+
+    def attach_image(self, user: UserDto, post_id: int, name: str, text: str = "") -> ContentDto:
+        return self.author_service.add_content_to_post(AddContentRequest(
+            user=user,
+            post_id=post_id,
+            content_type=ContentTypeDto.IMAGE,
+            text=text,
+            src=self.URL_PREFIX + name))
+
+    def upload(self, request: UploadImageRequest) -> ContentDto:
+        name = self.store_image(request.stream)
+        return self.attach_image(request.user, request.post_id, name, request.text)
+
+    def generate_variants(self, name: str) -> list[ImageVariant]:
+        try:
+            return self._generate_variants(name)
+        except Exception:
+            logger.exception("Generating variants of %s failed", name)
+            return []
+
+    def run_variants_job(self, payload: dict):
+        # Errors propagate, so the job queue retries the job with backoff.
+        self._generate_variants(payload["name"])
+
+    def _generate_variants(self, name: str) -> list[ImageVariant]:
+        key = name.split(".")[0]
+        path = self.store.path(name)
+        existing = {(v.width, v.format) for v in self.repository.find_image_variants([key])}
+        variants = []
+        for width in self.WIDTHS:
+            for image_format in self.FORMATS:
+                if (width, image_format) in existing:
+                    continue
+                data = self.resizer.resize(path, width, image_format)
+                if data is None:
+                    continue
+                variant_name = f"{key}-{width}.{image_format}"
+                self.store.write(variant_name, data)
+                variant = ImageVariant(
+                    image_key=key, width=width, format=image_format, src=self.URL_PREFIX + variant_name)
+                self.repository.save_image_variant(variant)
+                variants.append(variant)
+        return variants
+
+    @classmethod
+    def image_key(cls, src: str) -> str | None:
+        if not src.startswith(cls.URL_PREFIX):
+            return None
+        name = src[len(cls.URL_PREFIX):]
+        return name.split(".")[0] if ImageStore.NAME_PATTERN.match(name) else None
+
+    def srcsets(self, srcs: Iterable[str]) -> dict[str, str]:
+        keys = defaultdict(list)
+        for src in srcs:
+            key = self.image_key(src)
+            if key:
+                keys[key].append(src)
+        candidates = defaultdict(list)
+        for variant in self.repository.find_image_variants(list(keys)):
+            candidates[variant.image_key].append(f"{variant.src} {variant.width}w")
+        return {src: ", ".join(candidates[key]) for key, srcs in keys.items() for src in srcs if candidates[key]}
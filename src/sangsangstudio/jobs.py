@@ -0,0 +1,192 @@
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Callable
+
+from sangsangstudio.clock import Clock
+from sangsangstudio.entities import Job, JobStatus
+from sangsangstudio.metrics import MetricsRegistry
+from sangsangstudio.repositories import Repository
+
+logger = logging.getLogger(__name__)
+
+
+class UnknownJobKind(RuntimeError):
+    pass
+
+
+class JobQueue:
+    def __init__(self, repository: Repository, clock: Clock):
+        self.repository = repository
+        self.clock = clock
+        # Set whenever a job is queued, so idle workers in this process start at once
+        # instead of waiting for their next poll.
+        self.wakeup = threading.Event()
+
+    def enqueue(self, kind: str, payload: dict | None = None, priority: int = 0, delay: float = 0.0,
+                idempotency_key: str | None = None, max_attempts: int = 5) -> Job:
+        now = self.clock.now()
+        job = Job(
+            kind=kind,
+            payload=json.dumps(payload or {}),
+            priority=priority,
+            max_attempts=max_attempts,
+            idempotency_key=idempotency_key,
+            run_at=now + timedelta(seconds=delay),
+            created_on=now)
+        if self.repository.enqueue_job(job):
+            self.wakeup.set()
+        return job
+
+
+class JobWorkerPool:
+    def __init__(self, queue: JobQueue, workers: int = 2, poll_interval: float = 1.0,
+                 backoff: float = 5.0, max_backoff: float = 600.0, lease: timedelta = timedelta(minutes=10),
+                 retention: timedelta = timedelta(days=7), maintenance_interval: float = 60.0,
+                 depth_ttl: float = 5.0, timer: Callable[[], float] = time.monotonic):
+        self.queue = queue
+        self.repository = queue.repository
+        self.clock = queue.clock
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lease = lease
+        self.retention = retention
+        self.maintenance_interval = maintenance_interval
+        self.depth_ttl = depth_ttl
+        self.timer = timer
+        self.handlers: dict[str, Callable[[dict], Any]] = {}
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._stats_lock = threading.Lock()
+        self._maintenance_lock = threading.Lock()
+        self._maintained_at: float | None = None
+        self._depth: tuple[float, dict[JobStatus, int]] | None = None
+        self._stopping = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def register(self, kind: str, handler: Callable[[dict], Any]):
+        self.handlers[kind] = handler
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.max_backoff, self.backoff * 2 ** (attempts - 1))
+
+    def run_next(self) -> Job | None:
+        job = self.repository.claim_job(self.clock.now())
+        if job:
+            self.run(job)
+        return job
+
+    def run(self, job: Job):
+        started = self.timer()
+        try:
+            handler = self.handlers.get(job.kind)
+            if not handler:
+                raise UnknownJobKind(job.kind)
+            handler(json.loads(job.payload))
+        except Exception as e:
+            self._failed(job, e)
+        else:
+            job.status = JobStatus.DONE
+            job.finished_on = self.clock.now()
+            self.repository.update_job(job)
+            with self._stats_lock:
+                self.completed += 1
+        finally:
+            with self._stats_lock:
+                self.wait_seconds += max(0.0, (job.started_on - job.run_at).total_seconds())
+                self.run_seconds += self.timer() - started
+
+    def _failed(self, job: Job, error: Exception):
+        job.last_error = repr(error)[:1000]
+        now = self.clock.now()
+        if job.attempts >= job.max_attempts:
+            logger.error("Job %s (%s) failed after %d attempts: %s", job.id, job.kind, job.attempts, job.last_error)
+            job.status = JobStatus.FAILED
+            job.finished_on = now
+        else:
+            logger.warning("Job %s (%s) failed, retrying: %s", job.id, job.kind, job.last_error)
+            job.status = JobStatus.QUEUED
+            job.run_at = now + timedelta(seconds=self.retry_delay(job.attempts))
+        self.repository.update_job(job)
+        with self._stats_lock:
+            if job.status == JobStatus.FAILED:
+                self.failed += 1
+            else:
+                self.retried += 1
+
+    def maintain(self):
+        # Jobs left running by a crashed process are queued again once their lease
+        # runs out; finished jobs are kept for a while, then deleted in batches.
+        now = self.clock.now()
+        requeued = self.repository.requeue_stale_jobs(now - self.lease)
+        if requeued:
+            logger.warning("Requeued %d stale jobs", requeued)
+        self.repository.delete_jobs_finished_before(now - self.retention, 1000)
+
+    def _maintain_if_due(self):
+        if not self._maintenance_lock.acquire(blocking=False):
+            return
+        try:
+            if self._maintained_at is None or self.timer() - self._maintained_at >= self.maintenance_interval:
+                self._maintained_at = self.timer()
+                self.maintain()
+        finally:
+            self._maintenance_lock.release()
+
+    def depth(self) -> dict[JobStatus, int]:
+        cached = self._depth
+        if cached and self.timer() - cached[0] < self.depth_ttl:
+            return cached[1]
+        counts = self.repository.count_jobs_by_status()
+        self._depth = (self.timer(), counts)
+        return counts
+
+    def register_metrics(self, metrics: MetricsRegistry):
+        for status in JobStatus:
+            metrics.gauge(f"jobs_{status.name.lower()}", f"Jobs in the queue with status {status.name.lower()}",
+                          lambda status=status: self.depth()[status])
+        metrics.counter("jobs_completed_total", "Jobs that ran successfully", lambda: self.completed)
+        metrics.counter("jobs_retried_total", "Job attempts that failed and were scheduled again",
+                        lambda: self.retried)
+        metrics.counter("jobs_failed_total", "Jobs that failed on their last attempt", lambda: self.failed)
+        metrics.counter("jobs_wait_seconds_sum", "Time jobs waited in the queue once due",
+                        lambda: self.wait_seconds)
+        metrics.counter("jobs_run_seconds_sum", "Time spent running jobs", lambda: self.run_seconds)
+        metrics.counter("jobs_runs_total", "Job attempts run by this process",
+                        lambda: self.completed + self.retried + self.failed)
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = None
+            try:
+                self._maintain_if_due()
+                job = self.run_next()
+            except Exception:
+                logger.exception("Running the next job failed")
+            if job is None:
+                self.queue.wakeup.wait(self.poll_interval)
+                self.queue.wakeup.clear()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stopping.clear()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        # Draining: no new job is claimed, and jobs already running are finished.
+        self._stopping.set()
+        self.queue.wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
@@ -0,0 +1,235 @@
+import http.client
+import itertools
+import json
+import math
+import os
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from falcon import testing
+
+from sangsangstudio.factories import AppFactory
+from sangsangstudio.services import AddContentRequest, CreatePostRequest, CreateUserRequest, LoginRequest
+
+Scenario = Callable[[], int]
+
+
+@dataclass(frozen=True)
+class LoadTestConfig:
+    concurrency: int = 8
+    duration: float = 10.0
+    users: int = 10
+    posts: int = 100
+    mode: str = "inprocess"
+    paths: tuple[str, ...] = ("/", "/blog")
+
+
+@dataclass(frozen=True)
+class RouteStats:
+    route: str
+    requests: int
+    errors: int
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+
+
+@dataclass
+class LoadReport:
+    config: LoadTestConfig
+    routes: list[RouteStats]
+    commit: str = ""
+    started_on: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LoadReport":
+        config = data["config"]
+        return cls(
+            config=LoadTestConfig(**{**config, "paths": tuple(config["paths"])}),
+            routes=[RouteStats(**r) for r in data["routes"]],
+            commit=data["commit"],
+            started_on=data["started_on"])
+
+    def format(self, baseline: "LoadReport | None" = None) -> str:
+        previous = {r.route: r for r in baseline.routes} if baseline else {}
+        lines = [f"{'route':<12} {'requests':>9} {'errors':>7} {'req/s':>9} "
+                 f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for r in self.routes:
+            line = (f"{r.route:<12} {r.requests:>9} {r.errors:>7} {r.throughput:>9.1f} "
+                    f"{r.p50:>8.2f} {r.p95:>8.2f} {r.p99:>8.2f}")
+            before = previous.get(r.route)
+            if before:
+                line += (f"   vs {baseline.commit or 'baseline'}: {_change(before.throughput, r.throughput)} req/s, "
+                         f"{_change(before.p95, r.p95)} p95")
+            lines.append(line)
+        return "\n".join(lines)
+
+
+def _change(before: float, after: float) -> str:
+    return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+
+def percentile(ordered: list[float], p: float) -> float:
+    # Nearest rank: the smallest sample that at least p percent of samples do not exceed.
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def run_load(scenarios: dict[str, Scenario], concurrency: int, duration: float,
+             timer: Callable[[], float] = time.perf_counter) -> list[RouteStats]:
+    names = list(scenarios)
+    samples: list[list[tuple[str, float, bool]]] = [[] for _ in range(concurrency)]
+    start = timer()
+    deadline = start + duration
+
+    def worker(index: int):
+        # Workers start on different scenarios, so every route is under load at once.
+        i = index
+        while timer() < deadline:
+            name = names[i % len(names)]
+            i += 1
+            began = timer()
+            try:
+                ok = scenarios[name]() < 500
+            except Exception:
+                ok = False
+            samples[index].append((name, timer() - began, ok))
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"load-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = max(timer() - start, 1e-9)
+
+    routes = []
+    for name in names:
+        latencies = sorted(s[1] * 1000 for worker_samples in samples for s in worker_samples if s[0] == name)
+        errors = sum(1 for worker_samples in samples for s in worker_samples if s[0] == name and not s[2])
+        routes.append(RouteStats(
+            route=name,
+            requests=len(latencies),
+            errors=errors,
+            throughput=len(latencies) / elapsed,
+            p50=percentile(latencies, 50),
+            p95=percentile(latencies, 95),
+            p99=percentile(latencies, 99)))
+    return routes
+
+
+class InProcessClient:
+    def __init__(self, app):
+        self.client = testing.TestClient(app)
+
+    def get(self, path: str) -> int:
+        return self.client.simulate_get(path).status_code
+
+    def close(self):
+        pass
+
+
+class SocketClient:
+    # Serves the app with waitress on an ephemeral local port; each load
+    # thread keeps its own keep-alive connection.
+    def __init__(self, app, threads: int):
+        from waitress import create_server
+        self.server = create_server(app, host="127.0.0.1", port=0, threads=threads)
+        self.port = self.server.effective_port
+        self._thread = threading.Thread(target=self.server.run, name="loadtest-server", daemon=True)
+        self._thread.start()
+        self._local = threading.local()
+
+    def get(self, path: str) -> int:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+        try:
+            conn.request("GET", path)
+            res = conn.getresponse()
+            res.read()
+            return res.status
+        except Exception:
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def close(self):
+        # Sockets are closed from the server's own loop; once none are left the loop returns.
+        def shutdown():
+            for channel in list(self.server._map.values()):
+                channel.close()
+        self.server.trigger.pull_trigger(shutdown)
+        self._thread.join()
+        self.server.task_dispatcher.shutdown()
+
+
+def seed(factory: AppFactory, users: int, posts: int, password: str = "load-test") -> list[LoginRequest]:
+    user_service = factory.user_service()
+    author_service = factory.author_service()
+    logins = []
+    authors = []
+    for i in range(users):
+        authors.append(user_service.create_user(CreateUserRequest(username=f"load{i}", password=password)))
+        logins.append(LoginRequest(username=f"load{i}", password=password))
+    for i in range(posts):
+        author = authors[i % len(authors)]
+        post = author_service.create_post(CreatePostRequest(user=author, title=f"Load test post {i}"))
+        author_service.add_content_to_post(AddContentRequest(
+            user=author, post_id=post.id, text=f"Paragraph {i} written to give the blog something to render."))
+        author_service.publish_post(author, post.id)
+    return logins
+
+
+def scenarios_for(factory: AppFactory, client, paths: tuple[str, ...], logins: list[LoginRequest]) -> dict[str, Scenario]:
+    scenarios: dict[str, Scenario] = {path: (lambda path=path: client.get(path)) for path in paths}
+    if logins:
+        user_service = factory.user_service()
+        counter = itertools.count()
+
+        def login() -> int:
+            # There is no login route; the service call is what a login request costs.
+            user_service.login(logins[next(counter) % len(logins)])
+            return 200
+        scenarios["login"] = login
+    return scenarios
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def save_report(report: LoadReport, out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = report.started_on.replace(":", "").replace("-", "")
+    path = os.path.join(out_dir, f"{stamp}-{report.commit or 'unknown'}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report.to_dict(), f, indent=2)
+    return path
+
+
+def load_report(path: str) -> LoadReport:
+    with open(path, encoding="utf-8") as f:
+        return LoadReport.from_dict(json.load(f))
+
+
+def run_load_test(factory: AppFactory, app, config: LoadTestConfig) -> LoadReport:
+    logins = seed(factory, config.users, config.posts)
+    client = SocketClient(app, config.concurrency) if config.mode == "socket" else InProcessClient(app)
+    try:
+        routes = run_load(scenarios_for(factory, client, config.paths, logins), config.concurrency, config.duration)
+    finally:
+        client.close()
+    return LoadReport(config=config, routes=routes, commit=current_commit())
@@ -0,0 +1,34 @@
+import threading
+from typing import Callable
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: dict[str, tuple[str, str, Callable[[], float]]] = {}
+
+    def gauge(self, name: str, description: str, read: Callable[[], float]):
+        self._register(name, "gauge", description, read)
+
+    def counter(self, name: str, description: str, read: Callable[[], float]):
+        self._register(name, "counter", description, read)
+
+    def _register(self, name: str, kind: str, description: str, read: Callable[[], float]):
+        with self._lock:
+            self._metrics[name] = (kind, description, read)
+
+    def collect(self) -> dict[str, float]:
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return {name: read() for name, (_, _, read) in metrics}
+
+    def render(self) -> str:
+        # Prometheus text exposition format.
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, (kind, description, read) in metrics:
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {read()}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,93 @@
+import logging
+
+from falcon import HTTPForbidden, HTTPUnauthorized, Request, Response
+
+from sangsangstudio.identity import begin_identity_map, end_identity_map
+from sangsangstudio.querybudget import QueryLog, begin_recording, end_recording
+from sangsangstudio.repositories import ReplicatedConnector
+from sangsangstudio.services import LoginRequest, PostDto, PostStatusDto, SessionDto, SessionNotFound, UserService
+
+logger = logging.getLogger(__name__)
+
+
+def is_visible(post: PostDto, session: SessionDto | None) -> bool:
+    # Drafts are only shown to their author.
+    return post.status == PostStatusDto.PUBLISHED or (session is not None and session.user.id == post.author.id)
+
+
+class SessionCookieMiddleware:
+    # Requests without a live session cookie stay anonymous.
+    def __init__(self, user_service: UserService):
+        self.user_service = user_service
+
+    def process_request(self, req: Request, res: Response):
+        key = req.get_cookie_values("session")
+        if not key:
+            return
+        try:
+            req.env["session"] = self.user_service.find_session(key[0])
+        except SessionNotFound:
+            res.unset_cookie("session")
+
+
+class DevelopmentLoginMiddleware:
+    # Only for development: every request is logged in as the sample author.
+    def __init__(self, user_service: UserService):
+        self.user_service = user_service
+
+    def process_request(self, req: Request, res: Response):
+        session = self.user_service.login(
+            LoginRequest(username="vince", password="p1a2s3s4"))
+        res.set_cookie("session", session.key)
+        req.env["session"] = session
+
+
+class ReadYourWritesMiddleware:
+    def __init__(self, connector: ReplicatedConnector):
+        self.connector = connector
+
+    def process_request(self, req: Request, res: Response):
+        self.connector.begin_request()
+
+
+class IdentityMapMiddleware:
+    # Entities loaded during a request are shared by (type, id) and forgotten when it ends.
+    def process_request(self, req: Request, res: Response):
+        req.context.identity_map, req.context.identity_map_token = begin_identity_map()
+
+    def process_response(self, req: Request, res: Response, resource, req_succeeded: bool):
+        if req.context.get("identity_map") is not None:
+            end_identity_map(req.context.identity_map_token)
+            req.context.identity_map = None
+
+
+class QueryBudgetMiddleware:
+    # Development only: every statement a request runs is recorded with its caller.
+    def __init__(self, repeat_threshold: int = 5, budget: int = 0):
+        self.repeat_threshold = repeat_threshold
+        self.budget = budget
+
+    def process_request(self, req: Request, res: Response):
+        req.context.query_log, req.context.query_log_token = begin_recording()
+
+    def process_response(self, req: Request, res: Response, resource, req_succeeded: bool):
+        log: QueryLog | None = req.context.get("query_log")
+        if log is None:
+            return
+        end_recording(req.context.query_log_token)
+        for shape, count, caller in log.repeated(self.repeat_threshold):
+            logger.warning("%s %s ran the same statement %d times, first from %s: %s",
+                           req.method, req.path, count, caller, shape)
+        if self.budget and len(log) > self.budget:
+            logger.warning("%s %s ran %d queries, the budget is %d", req.method, req.path, len(log), self.budget)
+
+
+def require_role(role: str):
+    # Roles are resolved with the session, so the check itself runs no query.
+    def hook(req: Request, res: Response, resource, params):
+        session = req.env.get("session", None)
+        if not session:
+            raise HTTPUnauthorized()
+        if role not in session.roles:
+            raise HTTPForbidden()
+    return hook
@@ -0,0 +1,127 @@
+import contextvars
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames in these files are the repository layer itself; the caller is the first frame outside them.
+_REPOSITORY_FILES = {os.path.join(_PACKAGE_DIR, f) for f in ("repositories.py", "caching.py", "querybudget.py")}
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def statement_shape(statement: str) -> str:
+    # Statements are parameterized, so only IN lists of different lengths need folding.
+    return _IN_LIST.sub("(...)", _SPACES.sub(" ", statement).strip())
+
+
+def find_caller() -> str:
+    frame = sys._getframe(1)
+    while frame:
+        if frame.f_code.co_filename not in _REPOSITORY_FILES:
+            return f"{os.path.relpath(frame.f_code.co_filename)}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "<unknown>"
+
+
+class QueryLog:
+    def __init__(self):
+        self.statements: list[tuple[str, str]] = []
+
+    def record(self, statement: str):
+        self.statements.append((statement_shape(statement), find_caller()))
+
+    def __len__(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int, str]]:
+        counts = Counter(shape for shape, _ in self.statements)
+        callers = {}
+        for shape, caller in self.statements:
+            callers.setdefault(shape, caller)
+        return [(shape, count, callers[shape]) for shape, count in counts.most_common() if count >= threshold]
+
+    def report(self) -> str:
+        return "\n".join(f"  {shape}  [{caller}]" for shape, caller in self.statements)
+
+
+_log: contextvars.ContextVar[QueryLog | None] = contextvars.ContextVar("query_log", default=None)
+
+
+def begin_recording() -> tuple[QueryLog, contextvars.Token]:
+    log = QueryLog()
+    return log, _log.set(log)
+
+
+def end_recording(token: contextvars.Token):
+    _log.reset(token)
+
+
+@contextmanager
+def record_queries() -> Iterator[QueryLog]:
+    log, token = begin_recording()
+    try:
+        yield log
+    finally:
+        end_recording(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryLog]:
+    with record_queries() as log:
+        yield log
+    if len(log) > limit:
+        raise QueryBudgetExceeded(f"{len(log)} queries ran, the budget is {limit}:\n{log.report()}")
+
+
+class WatchedCursor:
+    def __init__(self, cursor, log: QueryLog):
+        self.cursor = cursor
+        self.log = log
+
+    def execute(self, statement: str, *args, **kwargs):
+        self.log.record(statement)
+        return self.cursor.execute(statement, *args, **kwargs)
+
+    def executemany(self, statement: str, *args, **kwargs):
+        self.log.record(statement)
+        return self.cursor.executemany(statement, *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.cursor, name)
+
+
+class WatchedConnection:
+    def __init__(self, connection, log: QueryLog):
+        self.connection = connection
+        self.log = log
+
+    def __enter__(self):
+        self.connection.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.connection.__exit__(exc_type, exc_val, exc_tb)
+
+    def cursor(self, *args, **kwargs) -> WatchedCursor:
+        return WatchedCursor(self.connection.cursor(*args, **kwargs), self.log)
+
+    def __getattr__(self, name: str):
+        return getattr(self.connection, name)
+
+
+def watch(connection):
+    # Connections are only wrapped while queries are being recorded, so
+    # production requests pay for a single context variable lookup.
+    log = _log.get()
+    return WatchedConnection(connection, log) if log is not None else connection
@@ -1,7 +1,14 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
 from abc import ABCMeta, abstractmethod
-
-import mysql.connector
-from mysql.connector.abstracts import MySQLCursorAbstract
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Iterator
 
 from sangsangstudio.clock import Clock
 from sangsangstudio.entities import (
@@ -11,7 +18,19 @@ from sangsangstudio.entities import (
     Post,
     PostStatus,
     Content,
-    ContentType, Entity)
+    ContentType, Entity, ImageVariant, Job, JobStatus)
+from sangsangstudio.identity import current_identity_map, identified
+from sangsangstudio.querybudget import watch
+
+if TYPE_CHECKING:
+    from mysql.connector.abstracts import MySQLCursorAbstract
+    from mysql.connector.pooling import MySQLConnectionPool
+
+logger = logging.getLogger(__name__)
+
+
+class JobNotEnqueued(RuntimeError):
+    pass
 
 
 class Repository(metaclass=ABCMeta):
@@ -43,6 +62,10 @@ class Repository(metaclass=ABCMeta):
     def delete_session(self, session_id: str):
         pass
 
+    @abstractmethod
+    def delete_sessions_created_before(self, cutoff: datetime, limit: int) -> int:
+        pass
+
     @abstractmethod
     def save_post(self, post: Post):
         pass
@@ -75,38 +98,405 @@ class Repository(metaclass=ABCMeta):
     def find_admin_by_id(self, admin_id: int) -> Admin | None:
         pass
 
+    @abstractmethod
+    def iter_users(self, batch_size: int = 1000) -> Iterator[User]:
+        pass
+
+    @abstractmethod
+    def iter_posts(self, batch_size: int = 1000) -> Iterator[Post]:
+        pass
+
+    @abstractmethod
+    def iter_contents(self, batch_size: int = 1000) -> Iterator[Content]:
+        pass
+
+    @abstractmethod
+    def import_users(self, users: list[User]):
+        pass
+
+    @abstractmethod
+    def import_posts(self, posts: list[Post]):
+        pass
+
+    @abstractmethod
+    def import_contents(self, contents: list[Content]):
+        pass
+
+    @abstractmethod
+    def find_posts_by_status(self, status: PostStatus, limit: int | None = None, offset: int = 0) -> list[Post]:
+        pass
+
+    @abstractmethod
+    def find_posts_by_author(self, author_id: int, status: PostStatus | None = None) -> list[Post]:
+        pass
+
+    @abstractmethod
+    def update_post_status(self, post_id: int, status: PostStatus, modified_on: datetime):
+        pass
+
+    @abstractmethod
+    def repair_post_summaries(self, batch_size: int = 1000) -> int:
+        pass
+
+    @abstractmethod
+    def search_posts(self, query: str, status: PostStatus | None, limit: int, offset: int) -> tuple[list[tuple[Post, float]], int]:
+        pass
+
+    @abstractmethod
+    def save_image_variant(self, variant: ImageVariant):
+        pass
+
+    @abstractmethod
+    def find_image_variants(self, image_keys: list[str]) -> list[ImageVariant]:
+        pass
+
+    @abstractmethod
+    def add_post_views(self, counts: dict[int, int]):
+        pass
+
+    @abstractmethod
+    def find_post_views(self, post_ids: list[int]) -> dict[int, int]:
+        pass
+
+    @abstractmethod
+    def find_most_viewed_posts(self, limit: int) -> list[tuple[Post, int]]:
+        pass
+
+    @abstractmethod
+    def find_admin_by_user_id(self, user_id: int) -> Admin | None:
+        pass
+
+    @abstractmethod
+    def find_users_after(self, user_id: int, limit: int) -> list[User]:
+        pass
+
+    @abstractmethod
+    def enqueue_job(self, job: Job) -> bool:
+        pass
+
+    @abstractmethod
+    def claim_job(self, now: datetime) -> Job | None:
+        pass
+
+    @abstractmethod
+    def update_job(self, job: Job):
+        pass
+
+    @abstractmethod
+    def requeue_stale_jobs(self, started_before: datetime) -> int:
+        pass
+
+    @abstractmethod
+    def delete_jobs_finished_before(self, cutoff: datetime, limit: int) -> int:
+        pass
+
+    @abstractmethod
+    def count_jobs_by_status(self) -> dict[JobStatus, int]:
+        pass
+
+    @abstractmethod
+    def save_sessions(self, sessions: list[Session]):
+        pass
+
+
+class RepositoryDecorator(Repository):
+    def __init__(self, repository: Repository):
+        self.repository = repository
+
+    def save_user(self, user: User):
+        self.repository.save_user(user)
+
+    def find_user_by_id(self, user_id: int) -> User | None:
+        return self.repository.find_user_by_id(user_id)
+
+    def find_user_by_username(self, username: str) -> User | None:
+        return self.repository.find_user_by_username(username)
+
+    def save_session(self, session: Session):
+        self.repository.save_session(session)
+
+    def find_session_by_key(self, session_id: str) -> Session | None:
+        return self.repository.find_session_by_key(session_id)
+
+    def find_session_by_user_id(self, user_id: int) -> Session | None:
+        return self.repository.find_session_by_user_id(user_id)
+
+    def delete_session(self, session_id: str):
+        self.repository.delete_session(session_id)
+
+    def delete_sessions_created_before(self, cutoff: datetime, limit: int) -> int:
+        return self.repository.delete_sessions_created_before(cutoff, limit)
+
+    def save_post(self, post: Post):
+        self.repository.save_post(post)
+
+    def find_post_by_id(self, post_id: int) -> Post | None:
+        return self.repository.find_post_by_id(post_id)
+
+    def save_content(self, content: Content):
+        self.repository.save_content(content)
+
+    def delete_content(self, content_id: int):
+        self.repository.delete_content(content_id)
+
+    def find_content_by_id(self, content_id: int) -> Content | None:
+        return self.repository.find_content_by_id(content_id)
+
+    def find_all_posts(self) -> list[Post]:
+        return self.repository.find_all_posts()
+
+    def save_admin(self, admin: Admin):
+        self.repository.save_admin(admin)
+
+    def find_admin_by_id(self, admin_id: int) -> Admin | None:
+        return self.repository.find_admin_by_id(admin_id)
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[User]:
+        return self.repository.iter_users(batch_size)
+
+    def iter_posts(self, batch_size: int = 1000) -> Iterator[Post]:
+        return self.repository.iter_posts(batch_size)
+
+    def iter_contents(self, batch_size: int = 1000) -> Iterator[Content]:
+        return self.repository.iter_contents(batch_size)
+
+    def import_users(self, users: list[User]):
+        self.repository.import_users(users)
+
+    def import_posts(self, posts: list[Post]):
+        self.repository.import_posts(posts)
+
+    def import_contents(self, contents: list[Content]):
+        self.repository.import_contents(contents)
+
+    def find_posts_by_status(self, status: PostStatus, limit: int | None = None, offset: int = 0) -> list[Post]:
+        return self.repository.find_posts_by_status(status, limit, offset)
+
+    def find_posts_by_author(self, author_id: int, status: PostStatus | None = None) -> list[Post]:
+        return self.repository.find_posts_by_author(author_id, status)
+
+    def update_post_status(self, post_id: int, status: PostStatus, modified_on: datetime):
+        self.repository.update_post_status(post_id, status, modified_on)
+
+    def repair_post_summaries(self, batch_size: int = 1000) -> int:
+        return self.repository.repair_post_summaries(batch_size)
+
+    def search_posts(self, query: str, status: PostStatus | None, limit: int, offset: int) -> tuple[list[tuple[Post, float]], int]:
+        return self.repository.search_posts(query, status, limit, offset)
+
+    def save_image_variant(self, variant: ImageVariant):
+        self.repository.save_image_variant(variant)
+
+    def find_image_variants(self, image_keys: list[str]) -> list[ImageVariant]:
+        return self.repository.find_image_variants(image_keys)
+
+    def add_post_views(self, counts: dict[int, int]):
+        self.repository.add_post_views(counts)
+
+    def find_post_views(self, post_ids: list[int]) -> dict[int, int]:
+        return self.repository.find_post_views(post_ids)
+
+    def find_most_viewed_posts(self, limit: int) -> list[tuple[Post, int]]:
+        return self.repository.find_most_viewed_posts(limit)
+
+    def find_admin_by_user_id(self, user_id: int) -> Admin | None:
+        return self.repository.find_admin_by_user_id(user_id)
+
+    def find_users_after(self, user_id: int, limit: int) -> list[User]:
+        return self.repository.find_users_after(user_id, limit)
+
+    def enqueue_job(self, job: Job) -> bool:
+        return self.repository.enqueue_job(job)
+
+    def claim_job(self, now: datetime) -> Job | None:
+        return self.repository.claim_job(now)
+
+    def update_job(self, job: Job):
+        self.repository.update_job(job)
+
+    def requeue_stale_jobs(self, started_before: datetime) -> int:
+        return self.repository.requeue_stale_jobs(started_before)
+
+    def delete_jobs_finished_before(self, cutoff: datetime, limit: int) -> int:
+        return self.repository.delete_jobs_finished_before(cutoff, limit)
+
+    def count_jobs_by_status(self) -> dict[JobStatus, int]:
+        return self.repository.count_jobs_by_status()
+
+    def save_sessions(self, sessions: list[Session]):
+        self.repository.save_sessions(sessions)
+
+    def __getattr__(self, name: str):
+        return getattr(self.repository, name)
+
 
 class MySQLConnector:
-    def __init__(self, user: str, host: str, port: int, password: str, database: str):
+    def __init__(self, user: str, host: str, port: int, password: str, database: str, pool_size: int = 0):
         self.database = database
         self.password = password
         self.port = port
         self.host = host
         self.user = user
+        self.pool_size = pool_size
+        self._pool: MySQLConnectionPool | None = None
+        self._pool_pid: int | None = None
+        self._pool_lock = threading.Lock()
 
-    def connect(self):
-        return mysql.connector.connect(
+    def config(self) -> dict:
+        return dict(
             user=self.user,
             database=self.database,
             password=self.password,
             host=self.host,
             port=self.port)
 
+    def pool(self) -> MySQLConnectionPool:
+        # Pools are never shared across fork(): a worker process builds its own
+        # on first use instead of reusing the sockets of its parent.
+        from mysql.connector.pooling import CNX_POOL_MAXSIZE, MySQLConnectionPool
+        pid = os.getpid()
+        with self._pool_lock:
+            if self._pool is None or self._pool_pid != pid:
+                self._pool = MySQLConnectionPool(
+                    pool_name=f"sangsangstudio-{pid}-{id(self)}",
+                    pool_size=min(self.pool_size, CNX_POOL_MAXSIZE),
+                    **self.config())
+                self._pool_pid = pid
+            return self._pool
+
+    def prefill(self):
+        if self.pool_size:
+            self.pool()
+        else:
+            with self.connect():
+                pass
+
+    def connect(self):
+        import mysql.connector
+        if self.pool_size:
+            try:
+                return self.pool().get_connection()
+            except mysql.connector.errors.PoolError:
+                pass
+        return mysql.connector.connect(**self.config())
+
+    def connect_for_read(self):
+        return self.connect()
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool._remove_connections()
+            self._pool = None
+            self._pool_pid = None
+
+
+class ReplicatedConnector:
+    def __init__(self, primary: MySQLConnector, replicas: list[tuple[MySQLConnector, int]],
+                 ejection_period: float = 30.0, timer: Callable[[], float] = time.monotonic,
+                 chooser: random.Random | None = None):
+        self.primary = primary
+        self.replicas = replicas
+        self.ejection_period = ejection_period
+        self.timer = timer
+        self.chooser = chooser or random.Random()
+        self._ejected_until: dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._wrote = contextvars.ContextVar(f"wrote-{id(self)}", default=False)
+
+    def begin_request(self):
+        self._wrote.set(False)
+
+    def connect(self):
+        # Everything after a write in the same request reads its own writes.
+        self._wrote.set(True)
+        return self.primary.connect()
+
+    def healthy_replicas(self) -> list[int]:
+        now = self.timer()
+        with self._lock:
+            return [i for i in range(len(self.replicas)) if self._ejected_until.get(i, 0.0) <= now]
+
+    def eject(self, index: int):
+        with self._lock:
+            self._ejected_until[index] = self.timer() + self.ejection_period
+
+    def connect_for_read(self):
+        import mysql.connector
+        if self._wrote.get():
+            return self.primary.connect()
+        candidates = self.healthy_replicas()
+        while candidates:
+            weights = [self.replicas[i][1] for i in candidates]
+            index = self.chooser.choices(candidates, weights)[0]
+            try:
+                return self.replicas[index][0].connect()
+            except mysql.connector.Error:
+                logger.warning("Ejecting replica %d for %.0fs", index, self.ejection_period, exc_info=True)
+                self.eject(index)
+                candidates.remove(index)
+        return self.primary.connect()
+
+    def prefill(self):
+        self.primary.prefill()
+        for replica, _ in self.replicas:
+            replica.prefill()
+
+    def close(self):
+        self.primary.close()
+        for replica, _ in self.replicas:
+            replica.close()
+
 
 class MySQLRepository(Repository):
     USERS_COLUMNS = "id, username, password_hash"
     SESSION_COLUMNS = "id, session_key, user_id, created_on"
-    POST_COLUMNS = "id, author_id, created_on, status, title"
+    POST_COLUMNS = "id, author_id, created_on, status, title, excerpt, image_src, content_count, modified_on"
     CONTENT_COLUMNS = "id, post_id, type, sequence, text, src"
     ADMIN_COLUMNS = "id, user_id, first_name, family_name"
     TIMESTAMP_FMT = "%Y-%m-%d %H:%M:%S.%f"
-
-    def __init__(self, connector: MySQLConnector, clock: Clock):
+    IMAGE_VARIANT_COLUMNS = "id, image_key, width, format, src"
+    JOB_COLUMNS = ("id, kind, payload, priority, status, attempts, max_attempts, idempotency_key, "
+                   "run_at, created_on, started_on, finished_on, last_error")
+    TABLES = ("users", "admin", "sessions", "posts", "contents", "image_variants", "post_views", "jobs")
+    # Columns and indexes added after a table was first released. They are
+    # applied to existing databases by create_tables() without dropping data.
+    SCHEMA_COLUMNS: dict[tuple[str, str], str] = {
+        ("posts", "excerpt"):
+            "ALTER TABLE posts ADD COLUMN excerpt VARCHAR(255) NOT NULL DEFAULT '';",
+        ("posts", "image_src"):
+            "ALTER TABLE posts ADD COLUMN image_src VARCHAR(255) NOT NULL DEFAULT '';",
+        ("posts", "content_count"):
+            "ALTER TABLE posts ADD COLUMN content_count INT(6) NOT NULL DEFAULT 0;",
+        ("posts", "modified_on"):
+            "ALTER TABLE posts ADD COLUMN modified_on TIMESTAMP(6) NULL;",
+    }
+    SCHEMA_INDEXES: dict[tuple[str, str], str] = {
+        ("sessions", "sessions_session_key"):
+            "CREATE UNIQUE INDEX sessions_session_key ON sessions (session_key);",
+        ("sessions", "sessions_created_on"):
+            "CREATE INDEX sessions_created_on ON sessions (created_on);",
+        ("posts", "posts_status_created_on"):
+            "CREATE INDEX posts_status_created_on ON posts (status, created_on, id);",
+        ("posts", "posts_author_status_created_on"):
+            "CREATE INDEX posts_author_status_created_on ON posts (author_id, status, created_on);",
+        ("contents", "contents_post_type_sequence"):
+            "CREATE INDEX contents_post_type_sequence ON contents (post_id, type, sequence);",
+        ("posts", "posts_title_fulltext"):
+            "CREATE FULLTEXT INDEX posts_title_fulltext ON posts (title);",
+        ("contents", "contents_text_fulltext"):
+            "CREATE FULLTEXT INDEX contents_text_fulltext ON contents (text);",
+    }
+
+    def __init__(self, connector: MySQLConnector | ReplicatedConnector, clock: Clock):
         self.clock = clock
         self.connector = connector
 
     def connect(self):
-        return self.connector.connect()
+        return watch(self.connector.connect())
+
+    def connect_for_read(self):
+        return watch(self.connector.connect_for_read())
 
     @staticmethod
     def create_users_table_statement() -> str:
@@ -179,7 +569,60 @@ class MySQLRepository(Repository):
     def drop_admin_table_statement() -> str:
         return "DROP TABLE IF EXISTS admin;"
 
-    def create_tables(self):
+    @staticmethod
+    def create_image_variants_table_statement() -> str:
+        return ("CREATE TABLE IF NOT EXISTS image_variants ("
+                "id INT(11) NOT NULL AUTO_INCREMENT, "
+                "image_key CHAR(64), "
+                "width INT(6), "
+                "format VARCHAR(10), "
+                "src VARCHAR(255), "
+                "PRIMARY KEY (id), "
+                "UNIQUE KEY image_variants_key_width_format (image_key, width, format));")
+
+    @staticmethod
+    def drop_image_variants_table_statement() -> str:
+        return "DROP TABLE IF EXISTS image_variants;"
+
+    @staticmethod
+    def create_post_views_table_statement() -> str:
+        return ("CREATE TABLE IF NOT EXISTS post_views ("
+                "post_id INT(11) NOT NULL, "
+                "views BIGINT NOT NULL DEFAULT 0, "
+                "PRIMARY KEY (post_id), "
+                "KEY post_views_views (views), "
+                "FOREIGN KEY (post_id) REFERENCES posts(id));")
+
+    @staticmethod
+    def drop_post_views_table_statement() -> str:
+        return "DROP TABLE IF EXISTS post_views;"
+
+    @staticmethod
+    def create_jobs_table_statement() -> str:
+        return ("CREATE TABLE IF NOT EXISTS jobs ("
+                "id BIGINT NOT NULL AUTO_INCREMENT, "
+                "kind VARCHAR(64) NOT NULL, "
+                "payload TEXT NOT NULL, "
+                "priority INT NOT NULL DEFAULT 0, "
+                "status TINYINT NOT NULL DEFAULT 0, "
+                "attempts INT NOT NULL DEFAULT 0, "
+                "max_attempts INT NOT NULL DEFAULT 5, "
+                "idempotency_key VARCHAR(191) NULL, "
+                "run_at TIMESTAMP(6) NOT NULL, "
+                "created_on TIMESTAMP(6) NOT NULL, "
+                "started_on TIMESTAMP(6) NULL, "
+                "finished_on TIMESTAMP(6) NULL, "
+                "last_error TEXT, "
+                "PRIMARY KEY (id), "
+                "UNIQUE KEY jobs_idempotency_key (idempotency_key), "
+                "KEY jobs_status_priority_run_at (status, priority DESC, run_at), "
+                "KEY jobs_status_finished_on (status, finished_on));")
+
+    @staticmethod
+    def drop_jobs_table_statement() -> str:
+        return "DROP TABLE IF EXISTS jobs;"
+
+    def create_tables(self) -> list[str]:
         with self.connect() as conn:
             cursor = conn.cursor()
             cursor.execute(self.create_users_table_statement())
@@ -187,10 +630,39 @@ class MySQLRepository(Repository):
             cursor.execute(self.create_sessions_table_statement())
             cursor.execute(self.create_posts_table_statement())
             cursor.execute(self.create_contents_table_statement())
+            cursor.execute(self.create_image_variants_table_statement())
+            cursor.execute(self.create_post_views_table_statement())
+            cursor.execute(self.create_jobs_table_statement())
+            migrations = self.pending_migrations(cursor)
+            for statement in migrations:
+                cursor.execute(statement)
+            return migrations
+
+    def pending_migrations(self, cursor: MySQLCursorAbstract) -> list[str]:
+        columns = set(self._find_all(
+            "SELECT table_name, column_name FROM information_schema.columns "
+            "WHERE table_schema = DATABASE();", (), cursor))
+        indexes = set(self._find_all(
+            "SELECT DISTINCT table_name, index_name FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE();", (), cursor))
+        return ([s for key, s in self.SCHEMA_COLUMNS.items() if key not in columns] +
+                [s for key, s in self.SCHEMA_INDEXES.items() if key not in indexes])
+
+    def verify_schema(self) -> list[str]:
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            tables = {t for t, in self._find_all(
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = DATABASE();", (), cursor)}
+            missing = [f"missing table {t}" for t in self.TABLES if t not in tables]
+            return missing if missing else self.pending_migrations(cursor)
 
     def drop_tables(self):
         with self.connect() as conn:
             cursor = conn.cursor()
+            cursor.execute(self.drop_jobs_table_statement())
+            cursor.execute(self.drop_post_views_table_statement())
+            cursor.execute(self.drop_image_variants_table_statement())
             cursor.execute(self.drop_contents_table_statement())
             cursor.execute(self.drop_posts_table_statement())
             cursor.execute(self.drop_sessions_table_statement())
@@ -212,7 +684,7 @@ class MySQLRepository(Repository):
 
     @staticmethod
     def excluding(fields: str, value: str) -> str:
-        return fields.strip(f"{value}, ")
+        return ", ".join(field for field in fields.split(", ") if field != value)
 
     def insert_user_statement(self):
         return (f"INSERT INTO users "
@@ -222,6 +694,18 @@ class MySQLRepository(Repository):
     def save_user(self, user: User):
         self.save(user, self.insert_user_statement(), (
             user.username, user.password_hash))
+        self.remember(user)
+
+    @staticmethod
+    def remember(entity: Entity):
+        identity_map = current_identity_map()
+        if identity_map is not None:
+            identity_map.add(entity)
+
+    @staticmethod
+    def recall(entity_type: type, entity_id: int) -> Entity | None:
+        identity_map = current_identity_map()
+        return identity_map.get(entity_type, entity_id) if identity_map is not None else None
 
     @staticmethod
     def _find_one(statement: str, params: tuple, cursor: MySQLCursorAbstract) -> tuple | None:
@@ -231,7 +715,7 @@ class MySQLRepository(Repository):
     def find_one(self, statement: str, params: tuple, cursor: MySQLCursorAbstract | None = None) -> tuple | None:
         if cursor:
             return self._find_one(statement, params, cursor)
-        with self.connect() as conn:
+        with self.connect_for_read() as conn:
             return self._find_one(statement, params, conn.cursor())
 
     def select_user_by_id_statement(self) -> str:
@@ -240,9 +724,12 @@ class MySQLRepository(Repository):
     @staticmethod
     def row_to_user(row: tuple) -> User:
         user_id, username, password_hash = row
-        return User(id=user_id, username=username, password_hash=password_hash)
+        return identified(User, user_id, lambda: User(id=user_id, username=username, password_hash=password_hash))
 
     def find_user_by_id(self, user_id: int) -> User | None:
+        user = self.recall(User, user_id)
+        if user:
+            return user
         row = self.find_one(self.select_user_by_id_statement(), (user_id,))
         return self.row_to_user(row) if row else None
 
@@ -262,6 +749,12 @@ class MySQLRepository(Repository):
         self.save(session, self.insert_session_statement(), (
             session.key, session.user.id, session.created_on.strftime(self.TIMESTAMP_FMT)))
 
+    def save_sessions(self, sessions: list[Session]):
+        if not sessions:
+            return
+        self.save_many(self.insert_session_statement(), [
+            (s.key, s.user.id, s.created_on.strftime(self.TIMESTAMP_FMT)) for s in sessions])
+
     @staticmethod
     def with_prefix(fields: str, prefix: str) -> str:
         return ", ".join([f"{prefix}.{f}" for f in fields.split(", ")])
@@ -278,7 +771,9 @@ class MySQLRepository(Repository):
                 f"{self.with_prefix(self.USERS_COLUMNS, 'users')} "
                 "FROM sessions "
                 "INNER JOIN users ON sessions.user_id = users.id "
-                "WHERE user_id = %s;")
+                "WHERE user_id = %s "
+                "ORDER BY sessions.created_on DESC "
+                "LIMIT 1;")
 
     def row_to_session(self, row: tuple) -> Session:
         session_id, key, _, created_on, *rest = row
@@ -305,15 +800,32 @@ class MySQLRepository(Repository):
     def delete_session(self, session_id: str):
         self.delete("sessions", "session_key", (session_id,))
 
+    @staticmethod
+    def delete_sessions_created_before_statement() -> str:
+        return ("DELETE FROM sessions "
+                "WHERE created_on < %s "
+                "ORDER BY created_on "
+                "LIMIT %s;")
+
+    def delete_sessions_created_before(self, cutoff: datetime, limit: int) -> int:
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.delete_sessions_created_before_statement(), (
+                cutoff.strftime(self.TIMESTAMP_FMT), limit))
+            conn.commit()
+            return cursor.rowcount
+
     def insert_post_statement(self) -> str:
         return (f"INSERT INTO posts "
                 f"({self.excluding(self.POST_COLUMNS, 'id')}) "
-                f"VALUES (%s, %s, %s, %s);")
+                f"VALUES (%s, %s, %s, %s, %s, %s, %s, %s);")
 
     def save_post(self, post: Post):
+        modified_on = post.modified_on or post.created_on
         self.save(post, self.insert_post_statement(), (
             post.author.id, post.created_on.strftime(self.TIMESTAMP_FMT),
-            post.status.value, post.title))
+            post.status.value, post.title, post.excerpt, post.image_src,
+            post.content_count, modified_on.strftime(self.TIMESTAMP_FMT)))
 
     def select_post_by_id_statement(self) -> str:
         return (f"SELECT {self.with_prefix(self.POST_COLUMNS, 'posts')}, "
@@ -323,16 +835,20 @@ class MySQLRepository(Repository):
                 "WHERE posts.id = %s;")
 
     def row_to_post(self, row: tuple) -> Post:
-        post_id, _, created_on, status, title, *rest = row
+        post_id, _, created_on, status, title, excerpt, image_src, content_count, modified_on, *rest = row
         return Post(
             id=post_id,
             author=self.row_to_user(rest),
             created_on=self.clock.add_timezone(created_on),
             status=PostStatus(status),
-            title=title)
+            title=title,
+            excerpt=excerpt,
+            image_src=image_src,
+            content_count=content_count,
+            modified_on=self.clock.add_timezone(modified_on or created_on))
 
     def find_post_by_id(self, post_id: int) -> Post | None:
-        with self.connect() as conn:
+        with self.connect_for_read() as conn:
             cursor = conn.cursor()
             row = self.find_one(self.select_post_by_id_statement(), (post_id,), cursor)
             if not row:
@@ -352,6 +868,71 @@ class MySQLRepository(Repository):
         rows = self.find_all(self._select_all_posts_statement(), ())
         return [self.row_to_post(r) for r in rows]
 
+    def select_posts_by_status_statement(self, paginated: bool) -> str:
+        return (f"SELECT {self.with_prefix(self.POST_COLUMNS, 'posts')}, "
+                f"{self.with_prefix(self.USERS_COLUMNS, 'users')} "
+                "FROM posts "
+                "INNER JOIN users ON posts.author_id = users.id "
+                "WHERE posts.status = %s "
+                "ORDER BY posts.created_on DESC, posts.id DESC"
+                + (" LIMIT %s OFFSET %s;" if paginated else ";"))
+
+    def find_posts_by_status(self, status: PostStatus, limit: int | None = None, offset: int = 0) -> list[Post]:
+        if limit is None:
+            rows = self.find_all(self.select_posts_by_status_statement(False), (status.value,))
+        else:
+            rows = self.find_all(self.select_posts_by_status_statement(True), (status.value, limit, offset))
+        return [self.row_to_post(r) for r in rows]
+
+    def select_posts_by_author_statement(self, with_status: bool) -> str:
+        return (f"SELECT {self.with_prefix(self.POST_COLUMNS, 'posts')}, "
+                f"{self.with_prefix(self.USERS_COLUMNS, 'users')} "
+                "FROM posts "
+                "INNER JOIN users ON posts.author_id = users.id "
+                "WHERE posts.author_id = %s "
+                + ("AND posts.status = %s " if with_status else "") +
+                "ORDER BY posts.created_on DESC;")
+
+    def find_posts_by_author(self, author_id: int, status: PostStatus | None = None) -> list[Post]:
+        if status is None:
+            rows = self.find_all(self.select_posts_by_author_statement(False), (author_id,))
+        else:
+            rows = self.find_all(self.select_posts_by_author_statement(True), (author_id, status.value))
+        return [self.row_to_post(r) for r in rows]
+
+    def search_posts_statement(self, with_status: bool) -> str:
+        # Title matches weigh double; a post's paragraph scores are summed.
+        return (f"SELECT {self.with_prefix(self.POST_COLUMNS, 'posts')}, "
+                f"{self.with_prefix(self.USERS_COLUMNS, 'users')}, "
+                "2 * MATCH (posts.title) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+                "+ COALESCE(matches.score, 0) AS score, "
+                "COUNT(*) OVER () AS total "
+                "FROM posts "
+                "INNER JOIN users ON posts.author_id = users.id "
+                "LEFT JOIN (SELECT post_id, SUM(MATCH (text) AGAINST (%s IN NATURAL LANGUAGE MODE)) AS score "
+                "FROM contents WHERE MATCH (text) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+                "GROUP BY post_id) AS matches ON matches.post_id = posts.id "
+                "WHERE (MATCH (posts.title) AGAINST (%s IN NATURAL LANGUAGE MODE) "
+                "OR matches.post_id IS NOT NULL) "
+                + ("AND posts.status = %s " if with_status else "") +
+                "ORDER BY score DESC, posts.id DESC "
+                "LIMIT %s OFFSET %s;")
+
+    def search_posts(self, query: str, status: PostStatus | None, limit: int,
+                     offset: int) -> tuple[list[tuple[Post, float]], int]:
+        params = (query, query, query, query) + ((status.value,) if status else ()) + (limit, offset)
+        rows = self.find_all(self.search_posts_statement(status is not None), params)
+        total = rows[0][-1] if rows else 0
+        return [(self.row_to_post(r[:-2]), float(r[-2])) for r in rows], total
+
+    @staticmethod
+    def update_post_status_statement() -> str:
+        return "UPDATE posts SET status = %s, modified_on = %s WHERE id = %s;"
+
+    def update_post_status(self, post_id: int, status: PostStatus, modified_on: datetime):
+        self.update(self.update_post_status_statement(), (
+            status.value, modified_on.strftime(self.TIMESTAMP_FMT), post_id))
+
     def insert_content_statement(self) -> str:
         return (f"INSERT INTO contents "
                 f"({self.excluding(self.CONTENT_COLUMNS, 'id')}) "
@@ -365,9 +946,28 @@ class MySQLRepository(Repository):
     def find_all(self, statement: str, params: tuple, cursor: MySQLCursorAbstract | None = None) -> list[tuple]:
         if cursor:
             return self._find_all(statement, params, cursor)
-        with self.connect() as conn:
+        with self.connect_for_read() as conn:
             return self._find_all(statement, params, conn.cursor())
 
+    def stream(self, statement: str, params: tuple, batch_size: int = 1000) -> Iterator[tuple]:
+        with self.connect_for_read() as conn:
+            cursor = conn.cursor(buffered=False)
+            cursor.execute(statement, params)
+            try:
+                while rows := cursor.fetchmany(batch_size):
+                    yield from rows
+            finally:
+                # An abandoned stream still has to be read off the wire before
+                # the connection can be reused; discard it batch by batch.
+                while cursor.fetchmany(batch_size):
+                    pass
+
+    def save_many(self, statement: str, params: list[tuple]):
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(statement, params)
+            conn.commit()
+
     def select_content_by_post_id(self) -> str:
         return f"SELECT {self.CONTENT_COLUMNS} FROM contents WHERE post_id = %s ORDER BY sequence;"
 
@@ -386,16 +986,64 @@ class MySQLRepository(Repository):
             text=text,
             src=src)
 
+    @staticmethod
+    def post_summary_assignments() -> str:
+        return ("excerpt = COALESCE((SELECT LEFT(text, 255) FROM contents "
+                "WHERE post_id = posts.id AND type = %s ORDER BY sequence LIMIT 1), ''), "
+                "image_src = COALESCE((SELECT src FROM contents "
+                "WHERE post_id = posts.id AND type = %s ORDER BY sequence LIMIT 1), ''), "
+                "content_count = (SELECT COUNT(*) FROM contents WHERE post_id = posts.id), ")
+
+    def refresh_post_summary_statement(self) -> str:
+        return (f"UPDATE posts SET {self.post_summary_assignments()}"
+                "modified_on = %s "
+                "WHERE id = %s;")
+
+    def refresh_post_summary(self, post_id: int, cursor: MySQLCursorAbstract):
+        cursor.execute(self.refresh_post_summary_statement(), (
+            ContentType.PARAGRAPH.value, ContentType.IMAGE.value,
+            self.clock.now().strftime(self.TIMESTAMP_FMT), post_id))
+
     def save_content(self, content: Content):
         if content.id:
             self.update_content(content)
-        else:
-            self.save(content, self.insert_content_statement(),
-                      (content.post_id, content.type.value, content.sequence,
-                       content.text, content.src))
+            return
+        # The content row and its post's summary are written in one transaction.
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.insert_content_statement(), (
+                content.post_id, content.type.value, content.sequence, content.text, content.src))
+            content.id = cursor.lastrowid
+            self.refresh_post_summary(content.post_id, cursor)
+            conn.commit()
 
     def delete_content(self, content_id: int):
-        self.delete("contents", "id", (content_id,))
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            row = self._find_one("SELECT post_id FROM contents WHERE id = %s FOR UPDATE;", (content_id,), cursor)
+            cursor.execute("DELETE FROM contents WHERE id = %s;", (content_id,))
+            if row:
+                self.refresh_post_summary(row[0], cursor)
+            conn.commit()
+
+    def repair_post_summaries_statement(self) -> str:
+        return (f"UPDATE posts SET {self.post_summary_assignments()}"
+                "modified_on = COALESCE(modified_on, created_on) "
+                "WHERE id BETWEEN %s AND %s;")
+
+    def repair_post_summaries(self, batch_size: int = 1000) -> int:
+        row = self.find_one("SELECT COALESCE(MAX(id), 0) FROM posts;", ())
+        last_id = row[0]
+        repaired = 0
+        # One short transaction per id range instead of a table-wide UPDATE.
+        for start in range(1, last_id + 1, batch_size):
+            with self.connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(self.repair_post_summaries_statement(), (
+                    ContentType.PARAGRAPH.value, ContentType.IMAGE.value, start, start + batch_size - 1))
+                repaired += cursor.rowcount
+                conn.commit()
+        return repaired
 
     def select_content_by_id_statement(self) -> str:
         return f"SELECT {self.CONTENT_COLUMNS} FROM contents WHERE id = %s"
@@ -412,6 +1060,7 @@ class MySQLRepository(Repository):
     def save_admin(self, admin: Admin):
         self.save(admin, self.insert_admin_statement(),
                   (admin.user.id, admin.first_name, admin.family_name))
+        self.remember(admin)
 
 
     def select_admin_by_id_statement(self) -> str:
@@ -422,22 +1071,259 @@ class MySQLRepository(Repository):
                 "WHERE admin.id = %s;")
 
     def find_admin_by_id(self, admin_id: int) -> Admin | None:
+        admin = self.recall(Admin, admin_id)
+        if admin:
+            return admin
         row = self.find_one(self.select_admin_by_id_statement(), (admin_id, ))
         return self.row_to_admin(row) if row else None
 
+    def select_admin_by_user_id_statement(self) -> str:
+        return (f"SELECT {self.with_prefix(self.ADMIN_COLUMNS, 'admin')}, "
+                f"{self.with_prefix(self.USERS_COLUMNS, 'users')} "
+                "FROM admin "
+                "INNER JOIN users ON admin.user_id = users.id "
+                "WHERE admin.user_id = %s;")
+
+    def find_admin_by_user_id(self, user_id: int) -> Admin | None:
+        row = self.find_one(self.select_admin_by_user_id_statement(), (user_id, ))
+        return self.row_to_admin(row) if row else None
+
     def row_to_admin(self, row: tuple) -> Admin:
         admin_id, _, first_name, last_name, *rest = row
-        return Admin(
+        return identified(Admin, admin_id, lambda: Admin(
             id=admin_id,
             user=self.row_to_user(rest),
             first_name=first_name,
-            family_name=last_name)
+            family_name=last_name))
 
     @staticmethod
     def update_contents_statement() -> str:
         return "UPDATE contents SET text = %s, src = %s WHERE id = %s"
 
     def update_content(self, content: Content):
-        self.update(self.update_contents_statement(), (content.text, content.src, content.id))
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.update_contents_statement(), (content.text, content.src, content.id))
+            self.refresh_post_summary(content.post_id, cursor)
+            conn.commit()
+
+    def insert_image_variant_statement(self) -> str:
+        return (f"INSERT INTO image_variants "
+                f"({self.excluding(self.IMAGE_VARIANT_COLUMNS, 'id')}) "
+                f"VALUES (%s, %s, %s, %s) "
+                f"ON DUPLICATE KEY UPDATE src = VALUES(src);")
+
+    def save_image_variant(self, variant: ImageVariant):
+        self.save(variant, self.insert_image_variant_statement(), (
+            variant.image_key, variant.width, variant.format, variant.src))
+
+    def select_image_variants_statement(self, count: int) -> str:
+        return (f"SELECT {self.IMAGE_VARIANT_COLUMNS} FROM image_variants "
+                f"WHERE image_key IN ({', '.join(['%s'] * count)}) "
+                f"ORDER BY image_key, width;")
+
+    @staticmethod
+    def row_to_image_variant(row: tuple) -> ImageVariant:
+        variant_id, image_key, width, image_format, src = row
+        return ImageVariant(id=variant_id, image_key=image_key, width=width, format=image_format, src=src)
 
+    def find_image_variants(self, image_keys: list[str]) -> list[ImageVariant]:
+        if not image_keys:
+            return []
+        rows = self.find_all(self.select_image_variants_statement(len(image_keys)), tuple(image_keys))
+        return [self.row_to_image_variant(r) for r in rows]
 
+    @staticmethod
+    def add_post_views_statement() -> str:
+        return ("INSERT INTO post_views (post_id, views) VALUES (%s, %s) "
+                "ON DUPLICATE KEY UPDATE views = views + VALUES(views);")
+
+    def add_post_views(self, counts: dict[int, int]):
+        if not counts:
+            return
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            # Sorted keys take the row locks in the same order in every worker.
+            cursor.executemany(self.add_post_views_statement(), sorted(counts.items()))
+            conn.commit()
+
+    def find_post_views(self, post_ids: list[int]) -> dict[int, int]:
+        if not post_ids:
+            return {}
+        rows = self.find_all(
+            f"SELECT post_id, views FROM post_views WHERE post_id IN ({', '.join(['%s'] * len(post_ids))});",
+            tuple(post_ids))
+        return dict(rows)
+
+    def select_most_viewed_posts_statement(self) -> str:
+        return (f"SELECT {self.with_prefix(self.POST_COLUMNS, 'posts')}, "
+                f"{self.with_prefix(self.USERS_COLUMNS, 'users')}, post_views.views "
+                "FROM post_views "
+                "INNER JOIN posts ON post_views.post_id = posts.id "
+                "INNER JOIN users ON posts.author_id = users.id "
+                "WHERE posts.status = %s "
+                "ORDER BY post_views.views DESC "
+                "LIMIT %s;")
+
+    def find_most_viewed_posts(self, limit: int) -> list[tuple[Post, int]]:
+        rows = self.find_all(self.select_most_viewed_posts_statement(), (PostStatus.PUBLISHED.value, limit))
+        return [(self.row_to_post(r[:-1]), r[-1]) for r in rows]
+
+    def format_timestamp(self, value: datetime | None) -> str | None:
+        return value.strftime(self.TIMESTAMP_FMT) if value else None
+
+    def row_to_job(self, row: tuple) -> Job:
+        (job_id, kind, payload, priority, status, attempts, max_attempts, idempotency_key,
+         run_at, created_on, started_on, finished_on, last_error) = row
+        return Job(
+            id=job_id,
+            kind=kind,
+            payload=payload,
+            priority=priority,
+            status=JobStatus(status),
+            attempts=attempts,
+            max_attempts=max_attempts,
+            idempotency_key=idempotency_key,
+            run_at=self.clock.add_timezone(run_at),
+            created_on=self.clock.add_timezone(created_on),
+            started_on=self.clock.add_timezone(started_on) if started_on else None,
+            finished_on=self.clock.add_timezone(finished_on) if finished_on else None,
+            last_error=last_error or "")
+
+    def insert_job_statement(self) -> str:
+        # A duplicate idempotency key is ignored, so enqueueing the same work twice is harmless.
+        return (f"INSERT IGNORE INTO jobs ({self.excluding(self.JOB_COLUMNS, 'id')}) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s);")
+
+    def enqueue_job(self, job: Job) -> bool:
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.insert_job_statement(), (
+                job.kind, job.payload, job.priority, job.status.value, job.attempts, job.max_attempts,
+                job.idempotency_key, self.format_timestamp(job.run_at), self.format_timestamp(job.created_on),
+                self.format_timestamp(job.started_on), self.format_timestamp(job.finished_on), job.last_error))
+            inserted = cursor.rowcount == 1
+            if inserted:
+                job.id = cursor.lastrowid
+            else:
+                row = self._find_one(
+                    "SELECT id FROM jobs WHERE idempotency_key = %s;", (job.idempotency_key,), cursor)
+                if not row:
+                    # INSERT IGNORE also skips rows for errors other than a duplicate key.
+                    raise JobNotEnqueued(f"{job.kind} job with key {job.idempotency_key!r} was not inserted")
+                job.id, = row
+            conn.commit()
+            return inserted
+
+    def select_next_job_statement(self) -> str:
+        # SKIP LOCKED lets every worker, in every process, claim a different job without waiting.
+        return (f"SELECT {self.JOB_COLUMNS} FROM jobs "
+                "WHERE status = %s AND run_at <= %s "
+                "ORDER BY priority DESC, run_at "
+                "LIMIT 1 "
+                "FOR UPDATE SKIP LOCKED;")
+
+    def claim_job(self, now: datetime) -> Job | None:
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            row = self._find_one(self.select_next_job_statement(), (
+                JobStatus.QUEUED.value, self.format_timestamp(now)), cursor)
+            if not row:
+                conn.rollback()
+                return None
+            job = self.row_to_job(row)
+            job.status = JobStatus.RUNNING
+            job.attempts += 1
+            job.started_on = now
+            cursor.execute(
+                "UPDATE jobs SET status = %s, attempts = %s, started_on = %s WHERE id = %s;",
+                (job.status.value, job.attempts, self.format_timestamp(now), job.id))
+            conn.commit()
+            return job
+
+    def update_job(self, job: Job):
+        self.update(
+            "UPDATE jobs SET status = %s, run_at = %s, finished_on = %s, last_error = %s WHERE id = %s;",
+            (job.status.value, self.format_timestamp(job.run_at), self.format_timestamp(job.finished_on),
+             job.last_error, job.id))
+
+    @staticmethod
+    def requeue_stale_jobs_statement() -> str:
+        # Jobs given up on get a finished_on, so retention purges them like any other failure.
+        return ("UPDATE jobs SET "
+                "finished_on = IF(attempts >= max_attempts, %s, finished_on), "
+                "status = IF(attempts >= max_attempts, %s, %s) "
+                "WHERE status = %s AND started_on < %s;")
+
+    def requeue_stale_jobs(self, started_before: datetime) -> int:
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.requeue_stale_jobs_statement(), (
+                self.format_timestamp(self.clock.now()),
+                JobStatus.FAILED.value, JobStatus.QUEUED.value, JobStatus.RUNNING.value,
+                self.format_timestamp(started_before)))
+            conn.commit()
+            return cursor.rowcount
+
+    @staticmethod
+    def delete_jobs_finished_before_statement() -> str:
+        return ("DELETE FROM jobs "
+                "WHERE status IN (%s, %s) AND finished_on < %s "
+                "ORDER BY finished_on "
+                "LIMIT %s;")
+
+    def delete_jobs_finished_before(self, cutoff: datetime, limit: int) -> int:
+        with self.connect() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.delete_jobs_finished_before_statement(), (
+                JobStatus.DONE.value, JobStatus.FAILED.value, self.format_timestamp(cutoff), limit))
+            conn.commit()
+            return cursor.rowcount
+
+    def count_jobs_by_status(self) -> dict[JobStatus, int]:
+        rows = self.find_all("SELECT status, COUNT(*) FROM jobs GROUP BY status;", ())
+        counts = {status: 0 for status in JobStatus}
+        counts.update({JobStatus(status): count for status, count in rows})
+        return counts
+
+    def iter_users(self, batch_size: int = 1000) -> Iterator[User]:
+        rows = self.stream(f"SELECT {self.USERS_COLUMNS} FROM users ORDER BY id;", (), batch_size)
+        return (self.row_to_user(r) for r in rows)
+
+    def find_users_after(self, user_id: int, limit: int) -> list[User]:
+        rows = self.find_all(
+            f"SELECT {self.USERS_COLUMNS} FROM users WHERE id > %s ORDER BY id LIMIT %s;", (user_id, limit))
+        return [self.row_to_user(r) for r in rows]
+
+    def _stream_posts_statement(self) -> str:
+        return (f"SELECT {self.with_prefix(self.POST_COLUMNS, 'posts')}, "
+                f"{self.with_prefix(self.USERS_COLUMNS, 'users')} "
+                "FROM posts "
+                "INNER JOIN users ON posts.author_id = users.id "
+                "ORDER BY posts.id;")
+
+    def iter_posts(self, batch_size: int = 1000) -> Iterator[Post]:
+        rows = self.stream(self._stream_posts_statement(), (), batch_size)
+        return (self.row_to_post(r) for r in rows)
+
+    def iter_contents(self, batch_size: int = 1000) -> Iterator[Content]:
+        rows = self.stream(f"SELECT {self.CONTENT_COLUMNS} FROM contents ORDER BY id;", (), batch_size)
+        return (self.row_to_content(r) for r in rows)
+
+    def import_users(self, users: list[User]):
+        self.save_many(
+            f"INSERT INTO users ({self.USERS_COLUMNS}) VALUES (%s, %s, %s);",
+            [(u.id, u.username, u.password_hash) for u in users])
+
+    def import_posts(self, posts: list[Post]):
+        self.save_many(
+            "INSERT INTO posts (id, author_id, created_on, status, title, modified_on) "
+            "VALUES (%s, %s, %s, %s, %s, %s);",
+            [(p.id, p.author.id, p.created_on.strftime(self.TIMESTAMP_FMT), p.status.value, p.title,
+              (p.modified_on or p.created_on).strftime(self.TIMESTAMP_FMT))
+             for p in posts])
+
+    def import_contents(self, contents: list[Content]):
+        self.save_many(
+            f"INSERT INTO contents ({self.CONTENT_COLUMNS}) VALUES (%s, %s, %s, %s, %s, %s);",
+            [(c.id, c.post_id, c.type.value, c.sequence, c.text, c.src) for c in contents])
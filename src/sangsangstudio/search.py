@@ -0,0 +1,157 @@
+import heapq
+import math
+import re
+import threading
+from abc import abstractmethod
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from sangsangstudio.entities import Post, PostStatus, Content
+from sangsangstudio.repositories import Repository
+from sangsangstudio.services import PostListener
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    post_id: int
+    title: str
+    score: float
+
+
+@dataclass(frozen=True)
+class SearchResults:
+    query: str
+    hits: list[SearchHit]
+    total: int
+    page: int
+    per_page: int
+
+    @property
+    def has_next(self) -> bool:
+        return self.page * self.per_page < self.total
+
+
+class SearchIndex(PostListener):
+    @abstractmethod
+    def search(self, query: str, page: int = 1, per_page: int = 10,
+               published_only: bool = True) -> SearchResults:
+        pass
+
+    def rebuild(self, repository: Repository):
+        pass
+
+
+class MySQLSearchIndex(SearchIndex):
+    def __init__(self, repository: Repository):
+        self.repository = repository
+
+    def search(self, query: str, page: int = 1, per_page: int = 10,
+               published_only: bool = True) -> SearchResults:
+        if not tokenize(query):
+            return SearchResults(query=query, hits=[], total=0, page=page, per_page=per_page)
+        matches, total = self.repository.search_posts(
+            query,
+            PostStatus.PUBLISHED if published_only else None,
+            limit=per_page,
+            offset=(page - 1) * per_page)
+        hits = [SearchHit(post_id=p.id, title=p.title, score=score) for p, score in matches]
+        return SearchResults(query=query, hits=hits, total=total, page=page, per_page=per_page)
+
+
+class InMemorySearchIndex(SearchIndex):
+    K1 = 1.2
+    B = 0.75
+    TITLE_WEIGHT = 2
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        # A post's document is the sum of its parts (title and each content),
+        # so a single edited paragraph is re-indexed without reloading the post.
+        self._parts: dict[int, dict[str, Counter]] = defaultdict(dict)
+        self._postings: dict[str, dict[int, int]] = defaultdict(dict)
+        self._lengths: dict[int, int] = defaultdict(int)
+        self._total_length = 0
+        self._titles: dict[int, str] = {}
+        self._published: set[int] = set()
+        self._content_posts: dict[int, int] = {}
+
+    def _set_part(self, post_id: int, key: str, terms: Counter):
+        old = self._parts[post_id].pop(key, None)
+        added = terms - old if old else terms
+        removed = old - terms if old else {}
+        for term, count in added.items():
+            postings = self._postings[term]
+            postings[post_id] = postings.get(post_id, 0) + count
+        for term, count in removed.items():
+            postings = self._postings[term]
+            postings[post_id] -= count
+            if not postings[post_id]:
+                del postings[post_id]
+                if not postings:
+                    del self._postings[term]
+        delta = terms.total() - (old.total() if old else 0)
+        self._lengths[post_id] += delta
+        self._total_length += delta
+        if terms:
+            self._parts[post_id][key] = terms
+
+    def post_saved(self, post: Post):
+        with self._lock:
+            self._titles[post.id] = post.title
+            if post.status == PostStatus.PUBLISHED:
+                self._published.add(post.id)
+            else:
+                self._published.discard(post.id)
+            title_terms = Counter(tokenize(post.title))
+            for term in title_terms:
+                title_terms[term] *= self.TITLE_WEIGHT
+            self._set_part(post.id, "title", title_terms)
+
+    def content_saved(self, content: Content):
+        with self._lock:
+            self._content_posts[content.id] = content.post_id
+            self._set_part(content.post_id, f"content:{content.id}", Counter(tokenize(content.text)))
+
+    def content_deleted(self, content_id: int):
+        with self._lock:
+            post_id = self._content_posts.pop(content_id, None)
+            if post_id is not None:
+                self._set_part(post_id, f"content:{content_id}", Counter())
+
+    def rebuild(self, repository: Repository):
+        with self._lock:
+            self._clear()
+            for post in repository.iter_posts():
+                self.post_saved(post)
+            for content in repository.iter_contents():
+                self.content_saved(content)
+
+    def search(self, query: str, page: int = 1, per_page: int = 10,
+               published_only: bool = True) -> SearchResults:
+        with self._lock:
+            documents = len(self._lengths)
+            average_length = self._total_length / documents if documents else 0.0
+            scores: dict[int, float] = defaultdict(float)
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (documents - len(postings) + 0.5) / (len(postings) + 0.5))
+                for post_id, frequency in postings.items():
+                    if published_only and post_id not in self._published:
+                        continue
+                    norm = self.K1 * (1 - self.B + self.B * self._lengths[post_id] / average_length)
+                    scores[post_id] += idf * frequency * (self.K1 + 1) / (frequency + norm)
+            ranked = heapq.nlargest(page * per_page, scores.items(), key=lambda item: (item[1], item[0]))
+            hits = [SearchHit(post_id=post_id, title=self._titles.get(post_id, ""), score=score)
+                    for post_id, score in ranked[(page - 1) * per_page:]]
+        return SearchResults(query=query, hits=hits, total=len(scores), page=page, per_page=per_page)
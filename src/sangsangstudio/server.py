@@ -0,0 +1,187 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Mapping
+
+from waitress import create_server
+
+from sangsangstudio.app import create_app
+from sangsangstudio.factories import AppFactory, ProductionAppFactory
+from sangsangstudio.settings import load_env, reload_env
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ServerConfig:
+    host: str = "localhost"
+    port: int = 8080
+    threads: int = 4
+    workers: int = 1
+    backlog: int = 1024
+    connection_limit: int = 100
+
+
+def parse_config(args: list[str], environ: Mapping[str, str] = os.environ) -> ServerConfig:
+    defaults = ServerConfig()
+    parser = argparse.ArgumentParser(
+        prog="sangsangstudio.server",
+        description="Serve Sang Sang Studio from pre-forked worker processes.")
+    parser.add_argument("--host", default=environ.get("SERVER_HOST", defaults.host))
+    parser.add_argument("--port", type=int, default=int(environ.get("SERVER_PORT", defaults.port)))
+    parser.add_argument("--threads", type=int, default=int(environ.get("SERVER_THREADS", defaults.threads)))
+    parser.add_argument("--workers", type=int, default=int(environ.get("SERVER_WORKERS", defaults.workers)))
+    parser.add_argument("--backlog", type=int, default=int(environ.get("SERVER_BACKLOG", defaults.backlog)))
+    parser.add_argument("--connection-limit", type=int, default=int(
+        environ.get("SERVER_CONNECTION_LIMIT", defaults.connection_limit)))
+    return ServerConfig(**vars(parser.parse_args(args)))
+
+
+def create_listen_socket(config: ServerConfig) -> socket.socket:
+    return socket.create_server((config.host, config.port), backlog=config.backlog)
+
+
+class PreforkServer:
+    RESPAWN_DELAY = 1.0
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, config: ServerConfig, factory_builder: Callable[[], AppFactory]):
+        self.config = config
+        self.factory_builder = factory_builder
+        self.socket: socket.socket | None = None
+        self.workers: set[int] = set()
+        self._stopping = False
+        self._restarting = False
+
+    def run(self):
+        # One-time setup happens before forking; the master keeps no
+        # connections or threads that the workers would inherit.
+        factory = self.factory_builder()
+        try:
+            factory.prepare()
+        finally:
+            factory.close()
+        self.socket = create_listen_socket(self.config)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGHUP, self._handle_restart)
+        host, port = self.socket.getsockname()[:2]
+        print(f"Serving at http://{host}:{port} with {self.config.workers} workers", flush=True)
+        for _ in range(self.config.workers):
+            self.spawn_worker()
+        try:
+            self._supervise()
+        finally:
+            self.stop_workers(self.workers)
+            self.socket.close()
+
+    def _handle_stop(self, signum, frame):
+        self._stopping = True
+
+    def _handle_restart(self, signum, frame):
+        self._restarting = True
+
+    def _supervise(self):
+        while not self._stopping:
+            if self._restarting:
+                self._restarting = False
+                self.restart_workers()
+            self.reap_workers()
+            time.sleep(self.POLL_INTERVAL)
+
+    def reap_workers(self):
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            if pid not in self.workers:
+                continue
+            self.workers.discard(pid)
+            if not self._stopping:
+                logger.warning("Worker %d exited with status %d, respawning", pid, status)
+                time.sleep(self.RESPAWN_DELAY)
+                self.spawn_worker()
+
+    def restart_workers(self):
+        # New workers start accepting on the shared socket before the old
+        # ones are asked to finish their in-flight requests and exit. They
+        # build their factories from a freshly read .env; code changes and
+        # the server's own options still need a full restart.
+        reload_env()
+        old_workers = set(self.workers)
+        for _ in old_workers:
+            self.spawn_worker()
+        self.stop_workers(old_workers)
+
+    def stop_workers(self, pids: set[int]):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(pids):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+            self.workers.discard(pid)
+
+    def spawn_worker(self):
+        pid = os.fork()
+        if pid:
+            self.workers.add(pid)
+            return
+        status = 1
+        try:
+            self._run_worker()
+            status = 0
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 0
+        except BaseException:
+            logger.exception("Worker %d crashed", os.getpid())
+        finally:
+            # Skip the parent's atexit handlers and finalizers.
+            os._exit(status)
+
+    def _run_worker(self):
+        signal.signal(signal.SIGTERM, _raise_system_exit)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        factory = self.factory_builder()
+        try:
+            factory.start()
+            app = create_app(factory, warmup=True)
+            server = create_server(
+                app,
+                sockets=[self.socket],
+                threads=self.config.threads,
+                backlog=self.config.backlog,
+                connection_limit=self.config.connection_limit)
+            server.run()
+        finally:
+            factory.close()
+
+
+def _raise_system_exit(signum, frame):
+    raise SystemExit(0)
+
+
+def main(args: list[str]):
+    logging.basicConfig(level=logging.INFO)
+    load_env()
+    config = parse_config(args)
+    server = PreforkServer(config, partial(ProductionAppFactory, pool_size=config.threads))
+    server.run()
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,13 +1,13 @@
 import uuid
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
 
-import bcrypt
-
+from sangsangstudio.bloom import UsernameFilter
+from sangsangstudio.caching import LRUCache
 from sangsangstudio.clock import Clock
-from sangsangstudio.entities import User, Session, Post, Content, ContentType, Admin
+from sangsangstudio.entities import User, Session, Post, PostStatus, Content, ContentType, Admin
 from sangsangstudio.repositories import Repository
 
 
@@ -22,6 +22,7 @@ class SessionDto:
     key: str
     created_on: datetime
     user: UserDto
+    roles: frozenset[str] = frozenset()
 
 
 @dataclass(frozen=True)
@@ -51,27 +52,64 @@ class PasswordHasher(ABC):
 
 
 class BcryptPasswordHasher(PasswordHasher):
+    def __init__(self):
+        import bcrypt
+        self.bcrypt = bcrypt
+
     def hash(self, password: str) -> bytes:
-        return bcrypt.hashpw(password.encode(), bcrypt.gensalt())
+        return self.bcrypt.hashpw(password.encode(), self.bcrypt.gensalt())
 
     def check(self, password: str, hashed: bytes) -> bool:
-        return bcrypt.checkpw(password.encode(), hashed)
+        return self.bcrypt.checkpw(password.encode(), hashed)
 
 
 class SessionNotFound(RuntimeError):
     pass
 
 
+class SessionExpired(SessionNotFound):
+    pass
+
+
+ADMIN_ROLE = "admin"
+
+
+class RoleService:
+    def __init__(self, repository: Repository, cache: LRUCache | None = None, ttl: float = 300.0):
+        self.repository = repository
+        self.cache = cache if cache is not None else LRUCache(max_size=4096)
+        self.ttl = ttl
+
+    def roles(self, user_id: int) -> frozenset[str]:
+        return self.cache.get_or_load(user_id, lambda: self._load_roles(user_id), self.ttl)
+
+    def _load_roles(self, user_id: int) -> frozenset[str]:
+        admin = self.repository.find_admin_by_user_id(user_id)
+        return frozenset({ADMIN_ROLE}) if admin else frozenset()
+
+    def invalidate(self, user_id: int):
+        self.cache.invalidate(user_id)
+
+
 class UserService:
-    def __init__(self, repository: Repository, password_hasher: PasswordHasher, clock: Clock):
+    DEFAULT_SESSION_TTL = timedelta(days=14)
+
+    def __init__(self, repository: Repository, password_hasher: PasswordHasher, clock: Clock,
+                 session_ttl: timedelta = DEFAULT_SESSION_TTL, role_service: RoleService | None = None,
+                 username_filter: UsernameFilter | None = None):
         self.repository = repository
         self.password_hasher = password_hasher
         self.clock = clock
+        self.session_ttl = session_ttl
+        self.role_service = role_service
+        self.username_filter = username_filter
 
     def create_user(self, request: CreateUserRequest) -> UserDto:
         password_hash = self.password_hasher.hash(request.password)
         user = User(username=request.username, password_hash=password_hash)
         self.repository.save_user(user)
+        if self.username_filter:
+            self.username_filter.add(user.username, user.id)
         return self.user_to_dto(user)
 
     def find_user(self, user_id: int) -> UserDto:
@@ -79,9 +117,11 @@ class UserService:
         return self.user_to_dto(user)
 
     def login(self, request: LoginRequest) -> SessionDto:
+        if self.username_filter and not self.username_filter.might_exist(request.username):
+            raise UnauthorizedLogin
         user = self.repository.find_user_by_username(request.username)
         session = self.repository.find_session_by_user_id(user.id) if user else None
-        if session:
+        if session and not self.is_expired(session):
             return self.session_to_dto(session)
         if user and self.password_hasher.check(request.password, user.password_hash):
             session = Session(
@@ -96,8 +136,14 @@ class UserService:
         session = self.repository.find_session_by_key(session_id)
         if not session:
             raise SessionNotFound()
+        if self.is_expired(session):
+            self.repository.delete_session(session.key)
+            raise SessionExpired()
         return self.session_to_dto(session)
 
+    def is_expired(self, session: Session) -> bool:
+        return session.created_on <= self.clock.now() - self.session_ttl
+
     def logout(self, session_id: str):
         self.repository.delete_session(session_id)
 
@@ -111,7 +157,8 @@ class UserService:
         return SessionDto(
             key=session.key,
             created_on=session.created_on,
-            user=self.user_to_dto(session.user))
+            user=self.user_to_dto(session.user),
+            roles=self.role_service.roles(session.user.id) if self.role_service else frozenset())
 
     @staticmethod
     def generate_session_id() -> str:
@@ -152,6 +199,10 @@ class PostDto:
     status: PostStatusDto
     title: str
     contents: list[ContentDto]
+    excerpt: str
+    image_src: str
+    content_count: int
+    modified_on: datetime
 
 
 @dataclass(frozen=True)
@@ -167,6 +218,14 @@ class PostNotFound(RuntimeError):
     pass
 
 
+class ContentNotFound(RuntimeError):
+    pass
+
+
+class NotPostAuthor(RuntimeError):
+    pass
+
+
 @dataclass(frozen=True)
 class UpdateContentRequest:
     user: UserDto
@@ -175,15 +234,33 @@ class UpdateContentRequest:
     src: str = ""
 
 
+class PostListener(ABC):
+    def post_saved(self, post: Post):
+        pass
+
+    def content_saved(self, content: Content):
+        pass
+
+    def content_deleted(self, content_id: int):
+        pass
+
+
 class AuthorService:
-    def __init__(self, repository: Repository, clock: Clock):
+    def __init__(self, repository: Repository, clock: Clock, listeners: list[PostListener] | None = None):
         self.clock = clock
         self.repository = repository
+        self.listeners = list(listeners or [])
+
+    def add_listener(self, listener: PostListener):
+        self.listeners.append(listener)
 
     def create_post(self, request: CreatePostRequest) -> PostDto:
         user = self.repository.find_user_by_id(request.user.id)
-        post = Post(author=user, created_on=self.clock.now(), title=request.title)
+        now = self.clock.now()
+        post = Post(author=user, created_on=now, modified_on=now, title=request.title)
         self.repository.save_post(post)
+        for listener in self.listeners:
+            listener.post_saved(post)
         return self.post_to_dto(post)
 
     def find_post_by_id(self, post_id: int) -> PostDto:
@@ -200,8 +277,15 @@ class AuthorService:
     def _get_next_sequence(contents: list[Content]) -> int:
         return max(c.sequence for c in contents) + 1 if contents else 1
 
-    def _add_content_to_post(self, post_id: int, content_type: ContentType, text: str = "", src: str = "") -> ContentDto:
+    @staticmethod
+    def _check_author(post: Post, user: UserDto):
+        if post.author.id != user.id:
+            raise NotPostAuthor()
+
+    def _add_content_to_post(self, user: UserDto, post_id: int, content_type: ContentType, text: str = "",
+                             src: str = "") -> ContentDto:
         post = self._find_post_by_id(post_id)
+        self._check_author(post, user)
         content = Content(
             post_id=post_id,
             type=content_type,
@@ -209,10 +293,13 @@ class AuthorService:
             text=text,
             src=src)
         self.repository.save_content(content)
+        for listener in self.listeners:
+            listener.content_saved(content)
         return self.content_to_dto(content)
 
     def add_content_to_post(self, request: AddContentRequest) -> ContentDto:
         return self._add_content_to_post(
+            request.user,
             request.post_id,
             ContentType(request.content_type.value),
             text=request.text,
@@ -225,7 +312,11 @@ class AuthorService:
             created_on=post.created_on,
             author=UserService.user_to_dto(post.author),
             status=PostStatusDto(post.status.value),
-            contents=self.contents_to_dto(post.contents))
+            contents=self.contents_to_dto(post.contents),
+            excerpt=post.excerpt,
+            image_src=post.image_src,
+            content_count=post.content_count,
+            modified_on=post.modified_on or post.created_on)
 
     def contents_to_dto(self, contents: list[Content]) -> list[ContentDto]:
         return [self.content_to_dto(c) for c in contents]
@@ -242,22 +333,60 @@ class AuthorService:
 
     def delete_content(self, user: UserDto, content_id: int):
         self.repository.delete_content(content_id)
+        for listener in self.listeners:
+            listener.content_deleted(content_id)
 
     def update_content(self, request: UpdateContentRequest) -> ContentDto:
-        content = self.repository.find_content_by_id(request.content_id)
+        content = self._find_content_by_id(request.content_id)
+        self._check_author(self._find_post_by_id(content.post_id), request.user)
         content.src = request.src
         content.text = request.text
         self.repository.save_content(content)
+        for listener in self.listeners:
+            listener.content_saved(content)
         return self.content_to_dto(content)
 
     def find_all_posts(self) -> list[PostDto]:
         posts = self.repository.find_all_posts()
         return [self.post_to_dto(p) for p in posts]
 
+    def publish_post(self, user: UserDto, post_id: int) -> PostDto:
+        post = self._find_post_by_id(post_id)
+        post.status = PostStatus.PUBLISHED
+        # Publishing counts as a change, so feeds and exports move their Last-Modified forward.
+        post.modified_on = self.clock.now()
+        self.repository.update_post_status(post.id, post.status, post.modified_on)
+        for listener in self.listeners:
+            listener.post_saved(post)
+        return self.post_to_dto(post)
+
+    def find_posts_by_status(self, status: PostStatusDto, limit: int | None = None, offset: int = 0) -> list[PostDto]:
+        posts = self.repository.find_posts_by_status(PostStatus(status.value), limit, offset)
+        return [self.post_to_dto(p) for p in posts]
+
+    def find_published_posts(self, limit: int | None = None, offset: int = 0) -> list[PostDto]:
+        return self.find_posts_by_status(PostStatusDto.PUBLISHED, limit, offset)
+
+    def find_posts_by_author(self, user: UserDto, status: PostStatusDto | None = None) -> list[PostDto]:
+        posts = self.repository.find_posts_by_author(
+            user.id, PostStatus(status.value) if status else None)
+        return [self.post_to_dto(p) for p in posts]
+
     def find_content_by_id(self, content_id: int) -> ContentDto:
-        content = self.repository.find_content_by_id(content_id)
+        content = self._find_content_by_id(content_id)
+        return self.content_to_dto(content)
+
+    def find_editable_content(self, user: UserDto, content_id: int) -> ContentDto:
+        content = self._find_content_by_id(content_id)
+        self._check_author(self._find_post_by_id(content.post_id), user)
         return self.content_to_dto(content)
 
+    def _find_content_by_id(self, content_id: int) -> Content:
+        content = self.repository.find_content_by_id(content_id)
+        if not content:
+            raise ContentNotFound()
+        return content
+
 
 @dataclass(frozen=True)
 class RegisterAdminRequest:
@@ -275,14 +404,17 @@ class AdminDto:
 
 
 class AdminService:
-    def __init__(self, repository: Repository, clock: Clock):
+    def __init__(self, repository: Repository, clock: Clock, role_service: RoleService | None = None):
         self.clock = clock
         self.repository = repository
+        self.role_service = role_service
 
     def register_admin(self, request: RegisterAdminRequest) -> AdminDto:
         user = self.repository.find_user_by_id(request.user_id)
         admin = Admin(user=user, first_name=request.first_name, family_name=request.family_name)
         self.repository.save_admin(admin)
+        if self.role_service:
+            self.role_service.invalidate(user.id)
         return self.admin_to_dto(admin)
 
     def find_admin_by_id(self, admin_id: int) -> AdminDto:
@@ -0,0 +1,135 @@
+import logging
+import threading
+from concurrent.futures import Future
+
+from sangsangstudio.entities import Session
+from sangsangstudio.repositories import Repository, RepositoryDecorator
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindSessionRepository(RepositoryDecorator):
+    # New sessions are inserted by a background flush, one executemany for
+    # every login that arrived in the same few milliseconds. save_session
+    # waits for its batch to commit, so a cookie is only handed out once
+    # every process can find its session, and a failed insert fails the login.
+    WRITE_TIMEOUT = 10.0
+
+    def __init__(self, repository: Repository, interval: float = 0.005, batch_size: int = 500,
+                 max_pending: int = 10_000):
+        super().__init__(repository)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.flushed = 0
+        self._lock = threading.Lock()
+        self._pending: dict[str, Session] = {}
+        self._latest_by_user: dict[int, Session] = {}
+        self._written: dict[str, Future] = {}
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def save_session(self, session: Session):
+        written = Future()
+        with self._lock:
+            self._pending[session.key] = session
+            self._latest_by_user[session.user.id] = session
+            self._written[session.key] = written
+            pending = len(self._pending)
+        if pending >= self.max_pending or not self._thread:
+            # Backpressure: with the queue full, or no flusher running, the caller writes.
+            self.flush()
+        else:
+            self._wakeup.set()
+        written.result(self.WRITE_TIMEOUT)
+
+    def _forget(self, session: Session) -> Future | None:
+        if self._pending.get(session.key) is not session:
+            return None
+        del self._pending[session.key]
+        if self._latest_by_user.get(session.user.id) is session:
+            del self._latest_by_user[session.user.id]
+        return self._written.pop(session.key, None)
+
+    def find_session_by_key(self, session_id: str) -> Session | None:
+        with self._lock:
+            session = self._pending.get(session_id)
+        return session if session else self.repository.find_session_by_key(session_id)
+
+    def find_session_by_user_id(self, user_id: int) -> Session | None:
+        # A pending session is newer than any the user has in the database.
+        with self._lock:
+            session = self._latest_by_user.get(user_id)
+        return session if session else self.repository.find_session_by_user_id(user_id)
+
+    def delete_session(self, session_id: str):
+        # Waiting for an in-flight flush means a deleted session is never inserted after its delete.
+        with self._flush_lock:
+            with self._lock:
+                session = self._pending.get(session_id)
+            if session:
+                self._settle([session])
+            else:
+                self.repository.delete_session(session_id)
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                sessions = list(self._pending.values())
+            for i in range(0, len(sessions), self.batch_size):
+                batch = sessions[i:i + self.batch_size]
+                try:
+                    self.repository.save_sessions(batch)
+                except Exception as e:
+                    # The later batches fail with it rather than leave their logins waiting.
+                    self._settle(sessions[i:], e)
+                    raise
+                self._settle(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+            return len(sessions)
+
+    def _settle(self, sessions: list[Session], error: Exception | None = None):
+        with self._lock:
+            written = [future for future in map(self._forget, sessions) if future]
+        for future in written:
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(None)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait()
+            # A short pause lets a burst of logins share one insert.
+            self._stopped.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                # The logins waiting on the failed batch raise the error themselves.
+                logger.exception("Flushing sessions failed")
+
+    def start(self):
+        if self._thread:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="session-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Flushing sessions on shutdown failed, failing the waiting logins")
@@ -1,9 +1,31 @@
 import os
 
-from dotenv import load_dotenv
-
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 TEMPLATES_DIR = os.path.join(ROOT_DIR, "templates")
 STATIC_DIR = os.path.join(ROOT_DIR, "static")
+MEDIA_DIR = os.path.join(ROOT_DIR, "media")
 DOT_ENV_PATH = os.path.join(ROOT_DIR, ".env")
-load_dotenv(dotenv_path=DOT_ENV_PATH)
+
+_env_loaded = False
+_env_keys: set[str] = set()
+
+
+def load_env(path: str = DOT_ENV_PATH):
+    # Entry points and factories read .env when they start, not every importer of settings.
+    global _env_loaded
+    if not _env_loaded:
+        reload_env(path)
+        _env_loaded = True
+
+
+def reload_env(path: str = DOT_ENV_PATH):
+    # Variables set by the environment itself win over .env, on reload as on first load.
+    from dotenv import dotenv_values
+    values = {key: value for key, value in dotenv_values(path).items() if value is not None}
+    for key in _env_keys - values.keys():
+        os.environ.pop(key, None)
+    for key, value in values.items():
+        if key in _env_keys or key not in os.environ:
+            os.environ[key] = value
+            _env_keys.add(key)
+    _env_keys.intersection_update(values)
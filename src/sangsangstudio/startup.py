@@ -0,0 +1,76 @@
+import json
+import re
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+
+IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+
+
+class StartupTimer:
+    def __init__(self, timer: Callable[[], float] = time.perf_counter):
+        self.timer = timer
+        self.phases: list[tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = self.timer()
+        try:
+            yield
+        finally:
+            self.phases.append((name, self.timer() - start))
+
+    def total(self) -> float:
+        return sum(elapsed for _, elapsed in self.phases)
+
+    def report(self) -> str:
+        width = max((len(name) for name, _ in self.phases), default=0)
+        lines = [f"{name:<{width}}  {elapsed * 1000:8.1f} ms" for name, elapsed in self.phases]
+        lines.append(f"{'total':<{width}}  {self.total() * 1000:8.1f} ms")
+        return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class ModuleImport:
+    name: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(lines: Iterable[str]) -> list[ModuleImport]:
+    imports = []
+    for line in lines:
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append(ModuleImport(name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return imports
+
+
+def _run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    # A fresh interpreter, so modules this process already imported are measured too.
+    return subprocess.run([sys.executable, *options, "-c", code], capture_output=True, text=True, check=True)
+
+
+def profile_imports(module: str) -> list[ModuleImport]:
+    return parse_importtime(_run_python(f"import {module}", "-X", "importtime").stderr.splitlines())
+
+
+def modules_imported_by(module: str) -> set[str]:
+    result = _run_python(f"import json, sys; import {module}; print(json.dumps(sorted(sys.modules)))")
+    return set(json.loads(result.stdout))
+
+
+def format_imports(imports: list[ModuleImport], top: int) -> str:
+    slowest = sorted(imports, key=lambda i: i.self_us, reverse=True)[:top]
+    width = max((len(i.name) for i in slowest), default=0)
+    lines = [f"{'module':<{width}}  {'self':>8}  {'cumulative':>10}"]
+    lines.extend(f"{i.name:<{width}}  {i.self_us / 1000:5.1f} ms  {i.cumulative_us / 1000:7.1f} ms"
+                 for i in slowest)
+    total = sum(i.cumulative_us for i in imports if i.depth == 0)
+    lines.append(f"{len(imports)} modules imported in {total / 1000:.1f} ms")
+    return "\n".join(lines)
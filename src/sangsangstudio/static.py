@@ -0,0 +1,148 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Callable
+
+from sangsangstudio.app import Jinja2TemplateView
+from sangsangstudio.fragments import FragmentRenderer
+from sangsangstudio.images import ImageService
+from sangsangstudio.services import AuthorService, PostDto, ContentTypeDto
+
+
+def post_path(post_id: int) -> str:
+    return f"blog/posts/{post_id}/index.html"
+
+
+def page_path(page: int) -> str:
+    return "blog/index.html" if page == 1 else f"blog/page/{page}/index.html"
+
+
+def page_url(page: int) -> str:
+    return "/blog/" if page == 1 else f"/blog/page/{page}/"
+
+
+def post_fingerprint(post: PostDto, srcsets: dict[str, str]) -> str:
+    # Variants arrive from the job queue without touching modified_on.
+    if not srcsets:
+        return post.modified_on.isoformat()
+    return hashlib.sha256(json.dumps([post.modified_on.isoformat(), sorted(srcsets.items())]).encode()).hexdigest()
+
+
+def page_fingerprint(posts: list[PostDto], has_next: bool) -> str:
+    summary = [(p.id, p.modified_on.isoformat()) for p in posts]
+    return hashlib.sha256(json.dumps([summary, has_next]).encode()).hexdigest()
+
+
+@dataclass
+class ExportReport:
+    written: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+    unchanged: int = 0
+
+
+class StaticSiteExporter:
+    MANIFEST = ".manifest.json"
+    PAGE_SIZE = 20
+
+    def __init__(self, author_service: AuthorService, view: Jinja2TemplateView, out_dir: str,
+                 image_service: ImageService | None = None, page_size: int = PAGE_SIZE):
+        self.author_service = author_service
+        self.view = view
+        self.out_dir = out_dir
+        self.image_service = image_service
+        self.page_size = page_size
+        self.fragments = FragmentRenderer(view)
+
+    def templates_fingerprint(self) -> str:
+        # Editing a template invalidates every page rendered from it.
+        digest = hashlib.sha256()
+        for name in sorted(self.view.env.list_templates()):
+            source, _, _ = self.view.env.loader.get_source(self.view.env, name)
+            digest.update(name.encode())
+            digest.update(source.encode())
+        return digest.hexdigest()
+
+    def load_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.out_dir, self.MANIFEST), encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"templates": None, "pages": {}}
+
+    def save_manifest(self, manifest: dict):
+        self.write(self.MANIFEST, json.dumps(manifest, indent=1, sort_keys=True).encode(), compress=False)
+
+    def write(self, path: str, data: bytes, compress: bool = True):
+        target = os.path.join(self.out_dir, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        copies = [(target, data)]
+        if compress:
+            # mtime=0 keeps the .gz byte-identical when the page is unchanged.
+            copies.append((target + ".gz", gzip.compress(data, compresslevel=9, mtime=0)))
+        for copy_path, copy_data in copies:
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), prefix=".export-")
+            with os.fdopen(fd, "wb") as temp:
+                temp.write(copy_data)
+            os.replace(temp_path, copy_path)
+
+    def remove(self, path: str):
+        for copy_path in (path, path + ".gz"):
+            try:
+                os.remove(os.path.join(self.out_dir, copy_path))
+            except FileNotFoundError:
+                pass
+
+    def illustrated_posts(self, posts: list[PostDto]) -> dict[int, tuple[PostDto, dict[str, str]]]:
+        # Only posts with an image can have variants; their srcsets come from one query.
+        if not self.image_service:
+            return {}
+        loaded = [self.author_service.find_post_by_id(p.id) for p in posts if p.image_src]
+        images = {p.id: [c.src for c in p.contents if c.type == ContentTypeDto.IMAGE] for p in loaded}
+        srcsets = self.image_service.srcsets(src for srcs in images.values() for src in srcs)
+        return {p.id: (p, {src: srcsets[src] for src in images[p.id] if src in srcsets}) for p in loaded}
+
+    def render_post(self, post: PostDto, srcsets: dict[str, str]) -> bytes:
+        return self.view.render("post.html", post=post, srcsets=srcsets, user=None).encode()
+
+    def render_page(self, page: int, posts: list[PostDto], has_next: bool) -> bytes:
+        post_list = self.fragments.post_list(posts, page, has_next, page_url)
+        return self.view.render("blog.html", post_list=post_list, user=None).encode()
+
+    def export(self, full: bool = False) -> ExportReport:
+        manifest = self.load_manifest()
+        templates = self.templates_fingerprint()
+        previous = {} if full or manifest["templates"] != templates else manifest["pages"]
+        posts = self.author_service.find_published_posts()
+        wanted: dict[str, tuple[str, Callable[[], bytes]]] = {}
+        illustrated = self.illustrated_posts(posts)
+        for post in posts:
+            if post.id in illustrated:
+                full_post, srcsets = illustrated[post.id]
+                wanted[post_path(post.id)] = (
+                    post_fingerprint(post, srcsets), lambda p=full_post, s=srcsets: self.render_post(p, s))
+            else:
+                wanted[post_path(post.id)] = (
+                    post_fingerprint(post, {}),
+                    lambda p=post: self.render_post(self.author_service.find_post_by_id(p.id), {}))
+        pages = [posts[i:i + self.page_size] for i in range(0, len(posts), self.page_size)] or [[]]
+        for number, page_posts in enumerate(pages, start=1):
+            has_next = number < len(pages)
+            wanted[page_path(number)] = (
+                page_fingerprint(page_posts, has_next),
+                lambda n=number, p=page_posts, h=has_next: self.render_page(n, p, h))
+
+        report = ExportReport()
+        for path, (fingerprint, render) in wanted.items():
+            if previous.get(path) == fingerprint and os.path.exists(os.path.join(self.out_dir, path)):
+                report.unchanged += 1
+                continue
+            self.write(path, render())
+            report.written.append(path)
+        for path in manifest["pages"].keys() - wanted.keys():
+            self.remove(path)
+            report.removed.append(path)
+        self.save_manifest({"templates": templates, "pages": {p: f for p, (f, _) in wanted.items()}})
+        return report
@@ -0,0 +1,55 @@
+import logging
+import threading
+from datetime import timedelta
+
+from sangsangstudio.clock import Clock
+from sangsangstudio.repositories import Repository
+
+logger = logging.getLogger(__name__)
+
+
+class SessionSweeper:
+    def __init__(self, repository: Repository, clock: Clock, session_ttl: timedelta,
+                 interval: float = 300.0, batch_size: int = 500, pause: float = 0.1):
+        self.repository = repository
+        self.clock = clock
+        self.session_ttl = session_ttl
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def sweep(self) -> int:
+        cutoff = self.clock.now() - self.session_ttl
+        total = 0
+        while not self._stopped.is_set():
+            # Small batches keep each DELETE short, so logins are never blocked for long.
+            deleted = self.repository.delete_sessions_created_before(cutoff, self.batch_size)
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            self._stopped.wait(self.pause)
+        return total
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                deleted = self.sweep()
+                if deleted:
+                    logger.info("Swept %d expired sessions", deleted)
+            except Exception:
+                logger.exception("Session sweep failed")
+
+    def start(self):
+        if self._thread:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="session-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,109 @@
+import base64
+import json
+from datetime import datetime
+from itertools import chain
+from typing import Iterable, Iterator, TextIO
+
+from sangsangstudio.entities import User, Post, PostStatus, Content, ContentType
+from sangsangstudio.repositories import Repository
+
+
+def user_to_record(user: User) -> dict:
+    return {
+        "type": "user",
+        "id": user.id,
+        "username": user.username,
+        "password_hash": base64.b64encode(user.password_hash).decode()}
+
+
+def post_to_record(post: Post) -> dict:
+    return {
+        "type": "post",
+        "id": post.id,
+        "author_id": post.author.id,
+        "created_on": post.created_on.isoformat(),
+        "status": post.status.value,
+        "title": post.title,
+        "modified_on": (post.modified_on or post.created_on).isoformat()}
+
+
+def content_to_record(content: Content) -> dict:
+    return {
+        "type": "content",
+        "id": content.id,
+        "post_id": content.post_id,
+        "content_type": content.type.value,
+        "sequence": content.sequence,
+        "text": content.text,
+        "src": content.src}
+
+
+def record_to_user(record: dict) -> User:
+    return User(
+        id=record["id"],
+        username=record["username"],
+        password_hash=base64.b64decode(record["password_hash"]))
+
+
+def record_to_post(record: dict) -> Post:
+    return Post(
+        id=record["id"],
+        author=User(id=record["author_id"]),
+        created_on=datetime.fromisoformat(record["created_on"]),
+        status=PostStatus(record["status"]),
+        title=record["title"],
+        modified_on=datetime.fromisoformat(record.get("modified_on", record["created_on"])))
+
+
+def record_to_content(record: dict) -> Content:
+    return Content(
+        id=record["id"],
+        post_id=record["post_id"],
+        type=ContentType(record["content_type"]),
+        sequence=record["sequence"],
+        text=record["text"],
+        src=record["src"])
+
+
+def export_blog(repository: Repository, out: TextIO, batch_size: int = 1000) -> dict[str, int]:
+    # Parents are written before children so an import never breaks a foreign key.
+    records = chain(
+        (user_to_record(u) for u in repository.iter_users(batch_size)),
+        (post_to_record(p) for p in repository.iter_posts(batch_size)),
+        (content_to_record(c) for c in repository.iter_contents(batch_size)))
+    counts = {"user": 0, "post": 0, "content": 0}
+    for record in records:
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+        counts[record["type"]] += 1
+    return counts
+
+
+def _chunks(records: Iterable[dict], batch_size: int) -> Iterator[tuple[str, list[dict]]]:
+    record_type, chunk = None, []
+    for record in records:
+        if chunk and (record["type"] != record_type or len(chunk) == batch_size):
+            yield record_type, chunk
+            chunk = []
+        record_type = record["type"]
+        chunk.append(record)
+    if chunk:
+        yield record_type, chunk
+
+
+def import_blog(repository: Repository, lines: Iterable[str], batch_size: int = 1000) -> dict[str, int]:
+    records = (json.loads(line) for line in lines if line.strip())
+    counts = {"user": 0, "post": 0, "content": 0}
+    for record_type, chunk in _chunks(records, batch_size):
+        if record_type == "user":
+            repository.import_users([record_to_user(r) for r in chunk])
+        elif record_type == "post":
+            repository.import_posts([record_to_post(r) for r in chunk])
+        elif record_type == "content":
+            repository.import_contents([record_to_content(r) for r in chunk])
+        else:
+            raise ValueError(f"Unknown record type: {record_type}")
+        counts[record_type] += len(chunk)
+    if counts["content"] or counts["post"]:
+        repository.repair_post_summaries(batch_size)
+    return counts
@@ -1,10 +1,12 @@
 from typing import Generator, Any
 
+import mysql.connector
 import pytest
 import os
 from dotenv import load_dotenv
 
 from sangsangstudio.clock import Clock, SystemClock
+from sangsangstudio.querybudget import assert_max_queries
 from sangsangstudio.repositories import (
     MySQLConnector,
     MySQLRepository)
@@ -68,6 +70,75 @@ def clock() -> Clock:
     return SystemClock()
 
 
+class FakeCursor:
+    def __init__(self, connector: "FakeConnector"):
+        self.connector = connector
+        self.rowcount = connector.rowcount
+        self.lastrowid = connector.lastrowid
+
+    def execute(self, statement, params=()):
+        self.connector.statements.append(statement)
+
+    def fetchone(self):
+        return self.connector.row
+
+    def fetchall(self):
+        return list(self.connector.rows)
+
+
+class FakeConnection:
+    def __init__(self, connector: "FakeConnector"):
+        self.connector = connector
+        self.name = connector.name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def cursor(self, **kwargs):
+        return FakeCursor(self.connector)
+
+    def commit(self):
+        pass
+
+
+class FakeConnector:
+    # Stands in for MySQL: every cursor returns `row` and `rows`, and statements are recorded.
+    def __init__(self, name: str = "primary", row: tuple | None = None, rows: list[tuple] = (),
+                 rowcount: int = 1, lastrowid: int = 7, fail: bool = False):
+        self.name = name
+        self.row = row
+        self.rows = rows
+        self.rowcount = rowcount
+        self.lastrowid = lastrowid
+        self.fail = fail
+        self.statements = []
+
+    @property
+    def queries(self) -> int:
+        return len(self.statements)
+
+    def connect(self):
+        if self.fail:
+            raise mysql.connector.InterfaceError("down")
+        return FakeConnection(self)
+
+    def connect_for_read(self):
+        return self.connect()
+
+
+@pytest.fixture
+def fake_connector() -> FakeConnector:
+    return FakeConnector()
+
+
+@pytest.fixture
+def offline_repository(fake_connector, clock) -> MySQLRepository:
+    return MySQLRepository(fake_connector, clock)
+
+
 class FakePasswordHasher(PasswordHasher):
     def hash(self, password: str) -> bytes:
         return password.encode()
@@ -111,3 +182,8 @@ def login_request(a_user, user_password):
 @pytest.fixture
 def a_session(user_service, login_request):
     return user_service.login(login_request)
+
+
+@pytest.fixture
+def query_budget():
+    return assert_max_queries
@@ -1,6 +1,19 @@
+from datetime import datetime
+
 import pytest
+from falcon import App, testing
 
-from sangsangstudio.services import RegisterAdminRequest, AdminService
+from sangsangstudio.app import AdminResource, Jinja2TemplateView
+from sangsangstudio.entities import Admin
+from sangsangstudio.services import (
+    RegisterAdminRequest,
+    AdminService,
+    ADMIN_ROLE,
+    RoleService,
+    SessionDto,
+    UserDto,
+    UserService)
+from sangsangstudio.settings import TEMPLATES_DIR
 
 
 @pytest.fixture
@@ -15,3 +28,47 @@ def test_admin_journey(admin_service, a_user):
         family_name="Jang")
     an_admin = admin_service.register_admin(request)
     assert admin_service.find_admin_by_id(an_admin.id) == an_admin
+
+
+def test_roles_are_resolved_with_the_session_and_refreshed_on_register(repository, password_hasher, clock,
+                                                                       login_request, a_user):
+    role_service = RoleService(repository)
+    user_service = UserService(repository, password_hasher, clock, role_service=role_service)
+    admin_service = AdminService(repository, clock, role_service)
+    assert user_service.login(login_request).roles == frozenset()
+
+    admin_service.register_admin(RegisterAdminRequest(user_id=a_user.id, first_name="Ally", family_name="Jang"))
+    session = user_service.login(login_request)
+    assert session.roles == {ADMIN_ROLE}
+    assert user_service.find_session(session.key).roles == {ADMIN_ROLE}
+
+
+def test_roles_are_cached_per_user():
+    class CountingRepository:
+        queries = 0
+
+        def find_admin_by_user_id(self, user_id):
+            self.queries += 1
+            return Admin(id=1) if user_id == 1 else None
+
+    repository = CountingRepository()
+    role_service = RoleService(repository)
+    assert role_service.roles(1) == {ADMIN_ROLE}
+    assert role_service.roles(1) == {ADMIN_ROLE}
+    assert role_service.roles(2) == frozenset()
+    assert repository.queries == 2
+
+
+def test_admin_page_requires_admin_role():
+    def client_for(roles):
+        class FakeSession:
+            def process_request(self, req, res):
+                req.env["session"] = SessionDto(
+                    key="k", created_on=datetime.now(), user=UserDto(id=1, username="vince"), roles=roles)
+
+        app = App(middleware=[FakeSession()])
+        app.add_route("/admin", AdminResource(Jinja2TemplateView(TEMPLATES_DIR)))
+        return testing.TestClient(app)
+
+    assert client_for(frozenset()).simulate_get("/admin").status_code == 403
+    assert client_for(frozenset({ADMIN_ROLE})).simulate_get("/admin").status_code == 200
@@ -0,0 +1,78 @@
+import json
+from datetime import datetime, timezone
+
+import pytest
+from falcon import App, testing
+
+from sangsangstudio import api
+from sangsangstudio.api import PostApiResource, PostsApiResource
+from sangsangstudio.services import (
+    ContentDto, ContentTypeDto, PostDto, PostNotFound, PostStatusDto, UserDto)
+
+NOW = datetime(2024, 5, 1, tzinfo=timezone.utc)
+VINCE = UserDto(id=1, username="vince")
+
+
+def a_post(post_id: int, status: PostStatusDto = PostStatusDto.PUBLISHED) -> PostDto:
+    return PostDto(
+        id=post_id, author=VINCE, created_on=NOW, status=status, title=f"Post {post_id}",
+        contents=[ContentDto(id=9, post_id=post_id, type=ContentTypeDto.IMAGE, sequence=1, text="", src="/a.png")],
+        excerpt="", image_src="/a.png", content_count=1, modified_on=NOW)
+
+
+class FakeAuthorService:
+    def __init__(self):
+        self.posts = {i: a_post(i) for i in range(1, 301)}
+        self.posts[500] = a_post(500, PostStatusDto.DRAFT)
+
+    def find_published_posts(self, limit=None, offset=0):
+        published = [p for p in self.posts.values() if p.status == PostStatusDto.PUBLISHED]
+        return published[offset:offset + limit]
+
+    def find_post_by_id(self, post_id):
+        if post_id not in self.posts:
+            raise PostNotFound()
+        return self.posts[post_id]
+
+
+@pytest.fixture
+def client():
+    app = App()
+    service = FakeAuthorService()
+    app.add_route("/api/posts", PostsApiResource(service))
+    app.add_route("/api/posts/{post_id:int}", PostApiResource(service))
+    return testing.TestClient(app)
+
+
+def test_list_selects_fields_and_streams_every_post(client, monkeypatch):
+    monkeypatch.setattr(PostsApiResource, "CHUNK_SIZE", 256)
+    response = client.simulate_get("/api/posts", params={"fields": "id,title", "limit": 300})
+    posts = response.json
+    assert len(posts) == 300
+    assert posts[0] == {"id": 1, "title": "Post 1"}
+
+
+def test_list_rejects_unknown_fields(client):
+    assert client.simulate_get("/api/posts", params={"fields": "id,password"}).status_code == 400
+    assert client.simulate_get("/api/posts", params={"fields": "contents"}).status_code == 400
+
+
+def test_post_detail_encodes_nested_values(client):
+    post = client.simulate_get("/api/posts/7").json
+    assert post["author"] == {"id": 1, "username": "vince"}
+    assert post["status"] == "published"
+    assert post["created_on"] == "2024-05-01T00:00:00+00:00"
+    assert post["contents"][0]["type"] == "image"
+
+
+def test_drafts_are_hidden_from_other_users(client):
+    assert client.simulate_get("/api/posts/500").status_code == 404
+    assert client.simulate_get("/api/posts/404").status_code == 404
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_serializers_agree(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(api, "orjson", None)
+    encoded = api.encoder(PostDto)(a_post(1))
+    assert json.loads(api.dumps(encoded)) == json.loads(json.dumps(encoded))
@@ -4,7 +4,10 @@ from sangsangstudio.services import (
     CreatePostRequest,
     AuthorService,
     AddContentRequest,
-    UpdateContentRequest)
+    UpdateContentRequest,
+    CreateUserRequest,
+    NotPostAuthor,
+    PostStatusDto)
 
 
 @pytest.fixture
@@ -64,3 +67,56 @@ def test_contents(a_session, a_post, author_service, a_paragraph, an_image):
     assert an_image not in updated_post.contents
 
 
+def test_only_published_posts_are_listed(a_session, a_post, author_service):
+    draft = author_service.create_post(CreatePostRequest(user=a_session.user, title="Draft"))
+    published = author_service.publish_post(a_session.user, a_post.id)
+    assert published.status == PostStatusDto.PUBLISHED
+    assert author_service.find_published_posts() == [published]
+    assert author_service.find_posts_by_status(PostStatusDto.DRAFT) == [draft]
+
+
+def test_published_posts_are_paginated_newest_first(a_session, author_service):
+    posts = [author_service.create_post(CreatePostRequest(user=a_session.user, title=f"Post {i}"))
+             for i in range(3)]
+    published = [author_service.publish_post(a_session.user, p.id) for p in posts]
+    assert author_service.find_published_posts(limit=2) == published[:0:-1]
+    assert author_service.find_published_posts(limit=2, offset=2) == published[:1]
+
+
+def test_find_posts_by_author(a_session, a_post, author_service):
+    published = author_service.publish_post(a_session.user, a_post.id)
+    draft = author_service.create_post(CreatePostRequest(user=a_session.user, title="Draft"))
+    assert author_service.find_posts_by_author(a_session.user) == [draft, published]
+    assert author_service.find_posts_by_author(a_session.user, PostStatusDto.DRAFT) == [draft]
+
+
+def test_post_summary_follows_its_contents(a_session, a_post, author_service, a_paragraph, an_image):
+    post = author_service.find_post_by_id(a_post.id)
+    assert (post.excerpt, post.image_src, post.content_count) == ("Some text", "/image/url", 2)
+    assert post.modified_on > a_post.modified_on
+
+    author_service.delete_content(a_session.user, a_paragraph.id)
+    listed = author_service.find_posts_by_author(a_session.user)[0]
+    assert (listed.excerpt, listed.image_src, listed.content_count) == ("", "/image/url", 1)
+
+
+def test_repair_recomputes_summaries(repository, a_post, a_paragraph, author_service):
+    repository.update("UPDATE posts SET excerpt = '', content_count = 0;", ())
+    assert repository.repair_post_summaries(batch_size=1) == 1
+    assert author_service.find_post_by_id(a_post.id).excerpt == "Some text"
+
+
+def test_only_the_author_can_add_content(a_post, author_service, user_service):
+    other = user_service.create_user(CreateUserRequest(username="ally", password="p1a2s3s4"))
+    with pytest.raises(NotPostAuthor):
+        author_service.add_content_to_post(AddContentRequest(user=other, post_id=a_post.id, text="Not mine"))
+    assert author_service.find_post_by_id(a_post.id).contents == []
+
+
+def test_only_the_author_can_edit_content(a_post, a_paragraph, author_service, user_service):
+    other = user_service.create_user(CreateUserRequest(username="ally", password="p1a2s3s4"))
+    with pytest.raises(NotPostAuthor):
+        author_service.find_editable_content(other, a_paragraph.id)
+    with pytest.raises(NotPostAuthor):
+        author_service.update_content(UpdateContentRequest(user=other, content_id=a_paragraph.id, text="Not mine"))
+    assert author_service.find_content_by_id(a_paragraph.id) == a_paragraph
@@ -0,0 +1,184 @@
+import pytest
+from falcon import App, testing
+
+from sangsangstudio.app import ContentFragment, ContentResource, Jinja2TemplateView
+from sangsangstudio.autosave import AutosaveBuffer
+from sangsangstudio.fragments import FragmentRenderer
+from sangsangstudio.services import (
+    ContentDto,
+    ContentNotFound,
+    ContentTypeDto,
+    NotPostAuthor,
+    PostDto,
+    PostStatusDto,
+    SessionDto,
+    UpdateContentRequest,
+    UserDto)
+from sangsangstudio.settings import TEMPLATES_DIR
+
+USER = UserDto(id=1, username="vince")
+
+
+class FakeAuthorService:
+    def __init__(self):
+        self.contents = {7: ContentDto(id=7, post_id=1, type=ContentTypeDto.PARAGRAPH, sequence=1, text="", src="")}
+        self.status = PostStatusDto.PUBLISHED
+        self.failures = []
+        self.writes = []
+
+    def find_content_by_id(self, content_id):
+        if content_id not in self.contents:
+            raise ContentNotFound()
+        return self.contents[content_id]
+
+    def find_post_by_id(self, post_id):
+        return PostDto(id=post_id, author=USER, created_on=None, status=self.status, title="",
+                       contents=[], excerpt="", image_src="", content_count=0, modified_on=None)
+
+    def find_editable_content(self, user, content_id):
+        content = self.find_content_by_id(content_id)
+        if user.id != USER.id:
+            raise NotPostAuthor()
+        return content
+
+    def update_content(self, request):
+        if self.failures:
+            raise self.failures.pop(0)
+        content = self.find_editable_content(request.user, request.content_id)
+        self.writes.append(request.text)
+        self.contents[request.content_id] = ContentDto(
+            id=content.id, post_id=content.post_id, type=content.type, sequence=content.sequence,
+            text=request.text, src=request.src)
+        return self.contents[request.content_id]
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def author_service():
+    return FakeAuthorService()
+
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+
+@pytest.fixture
+def buffer(author_service, timer):
+    return AutosaveBuffer(author_service, delay=2.0, max_delay=10.0, timer=timer)
+
+
+def type_text(buffer, timer, text):
+    for i in range(1, len(text) + 1):
+        buffer.edit(UpdateContentRequest(user=USER, content_id=7, text=text[:i]))
+        timer.now += 0.5
+
+
+def test_edits_are_coalesced_into_one_write(buffer, author_service, timer):
+    type_text(buffer, timer, "glaze")
+    assert buffer.flush_due() == 0
+    assert buffer.find_content_by_id(7).text == "glaze"
+    timer.now += 2
+    assert buffer.flush_due() == 1
+    assert author_service.writes == ["glaze"]
+    assert buffer.pending() == 0
+
+
+def test_continuous_typing_is_written_after_max_delay(buffer, author_service, timer):
+    type_text(buffer, timer, "a" * 21)
+    buffer.flush_due()
+    assert author_service.writes == ["a" * 21]
+
+
+def test_explicit_save_and_shutdown_flush_pending_edits(buffer, author_service, timer):
+    buffer.edit(UpdateContentRequest(user=USER, content_id=7, text="kiln"))
+    assert buffer.save(7).text == "kiln"
+    buffer.edit(UpdateContentRequest(user=USER, content_id=7, text="kiln log"))
+    buffer.start()
+    buffer.stop()
+    assert author_service.writes == ["kiln", "kiln log"]
+
+
+def test_deleted_content_is_not_written(buffer, author_service):
+    buffer.edit(UpdateContentRequest(user=USER, content_id=7, text="gone"))
+    buffer.content_deleted(7)
+    assert buffer.flush() == 0
+
+
+def test_a_failing_edit_does_not_hold_back_the_others(buffer, author_service):
+    author_service.contents[8] = author_service.contents[7]
+    buffer.edit(UpdateContentRequest(user=USER, content_id=8, text="removed meanwhile"))
+    buffer.edit(UpdateContentRequest(user=USER, content_id=7, text="kept"))
+    del author_service.contents[8]
+
+    assert buffer.flush() == 1
+    assert author_service.writes == ["kept"]
+    assert buffer.pending() == 0
+    with pytest.raises(ContentNotFound):
+        buffer.edit(UpdateContentRequest(user=USER, content_id=8, text="again"))
+
+
+def test_a_transient_failure_is_retried_on_the_next_tick(buffer, author_service):
+    author_service.failures.append(ConnectionError("MySQL server has gone away"))
+    buffer.edit(UpdateContentRequest(user=USER, content_id=7, text="retried"))
+
+    assert buffer.flush() == 0
+    assert buffer.pending() == 1
+    assert buffer.flush() == 1
+    assert author_service.writes == ["retried"]
+    assert buffer.pending() == 0
+
+
+def test_autosave_route_buffers_until_saved(buffer, author_service):
+    class Session:
+        user = USER
+
+    class FakeSession:
+        def process_request(self, req, res):
+            req.env["session"] = Session()
+
+    app = App(middleware=[FakeSession()])
+    app.add_route("/blog/contents/{content_id:int}", ContentResource(buffer, author_service))
+    app.add_route("/blog/fragments/contents/{content_id:int}",
+                  ContentFragment(buffer, author_service, None, FragmentRenderer(Jinja2TemplateView(TEMPLATES_DIR))))
+    client = testing.TestClient(app)
+    form = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    assert client.simulate_patch("/blog/contents/7", body="text=draft", headers=form).status_code == 204
+    assert client.simulate_get("/blog/contents/7").json["text"] == "draft"
+    assert author_service.writes == []
+    assert client.simulate_put("/blog/contents/7", body="text=final", headers=form).json["text"] == "final"
+    assert author_service.writes == ["final"]
+    assert client.simulate_patch("/blog/contents/99", body="text=draft", headers=form).status_code == 404
+    assert client.simulate_get("/blog/contents/99").status_code == 404
+    assert client.simulate_get("/blog/fragments/contents/99").status_code == 404
+    assert buffer.pending() == 0
+
+
+def test_only_the_author_edits_or_sees_draft_contents(buffer, author_service):
+    session = {"session": SessionDto(key="k", created_on=None, user=UserDto(id=2, username="ally"))}
+
+    class FakeSessionMiddleware:
+        def process_request(self, req, res):
+            req.env.update(session)
+
+    app = App(middleware=[FakeSessionMiddleware()])
+    app.add_route("/blog/contents/{content_id:int}", ContentResource(buffer, author_service))
+    client = testing.TestClient(app)
+    form = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    assert client.simulate_patch("/blog/contents/7", body="text=mine", headers=form).status_code == 403
+    assert client.simulate_put("/blog/contents/7", body="text=mine", headers=form).status_code == 403
+    assert buffer.pending() == 0
+    assert client.simulate_get("/blog/contents/7").status_code == 200
+    author_service.status = PostStatusDto.DRAFT
+    assert client.simulate_get("/blog/contents/7").status_code == 404
+    session["session"] = SessionDto(key="k", created_on=None, user=USER)
+    assert client.simulate_get("/blog/contents/7").status_code == 200
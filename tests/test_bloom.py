@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from sangsangstudio.bloom import BloomFilter, UsernameFilter
+from sangsangstudio.entities import User
+from sangsangstudio.metrics import MetricsRegistry
+from sangsangstudio.services import UserService, LoginRequest, UnauthorizedLogin, CreateUserRequest
+
+
+class FakeUserRepository:
+    def __init__(self, usernames):
+        self.users = [User(id=i, username=name, password_hash=b"secret") for i, name in enumerate(usernames, 1)]
+        self.catch_ups = 0
+        self.lookups = 0
+
+    def iter_users(self, batch_size=1000):
+        return iter(list(self.users))
+
+    def find_users_after(self, user_id, limit):
+        self.catch_ups += 1
+        return [u for u in self.users if u.id > user_id][:limit]
+
+    def find_user_by_username(self, username):
+        self.lookups += 1
+        return next((u for u in self.users if u.username == username), None)
+
+    def find_session_by_user_id(self, user_id):
+        return None
+
+    def save_session(self, session):
+        pass
+
+    def save_user(self, user):
+        user.id = len(self.users) + 1
+        self.users.append(user)
+
+
+def test_false_positive_rate_stays_near_the_configured_rate():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"user{i}".encode())
+    assert all(f"user{i}".encode() in bloom for i in range(10_000))
+    false_positives = sum(f"stranger{i}".encode() in bloom for i in range(20_000))
+    assert false_positives / 20_000 < 0.015
+    assert bloom.memory_bytes() < 12_000
+
+
+def test_filter_grows_without_false_negatives():
+    username_filter = UsernameFilter(FakeUserRepository([]), capacity=100)
+    username_filter.build()
+    for i in range(1000):
+        username_filter.add(f"user{i}")
+    assert all(username_filter.might_exist(f"user{i}") for i in range(1000))
+    assert username_filter.count() == 1000
+
+
+def test_usernames_match_case_insensitively():
+    username_filter = UsernameFilter(FakeUserRepository(["Vince"]))
+    username_filter.build()
+    assert username_filter.might_exist("vince")
+
+
+def test_unknown_usernames_are_rejected_without_a_lookup(password_hasher, clock):
+    repository = FakeUserRepository(["vince"])
+    username_filter = UsernameFilter(repository)
+    username_filter.build()
+    user_service = UserService(repository, password_hasher, clock, username_filter=username_filter)
+
+    for i in range(100):
+        with pytest.raises(UnauthorizedLogin):
+            user_service.login(LoginRequest(username=f"bot{i}", password="guess"))
+    assert repository.lookups == 0
+    assert username_filter.rejections == 100
+
+    user_service.create_user(CreateUserRequest(username="ally", password="p"))
+    assert user_service.login(LoginRequest(username="ally", password="p")).user.username == "ally"
+
+
+def test_users_created_elsewhere_are_never_rejected():
+    repository = FakeUserRepository(["vince"])
+    username_filter = UsernameFilter(repository)
+    username_filter.build()
+    repository.save_user(User(username="ally"))
+
+    assert username_filter.might_exist("ally")
+    assert repository.catch_ups == 1
+    assert username_filter.might_exist("ally")
+    assert repository.catch_ups == 1
+
+
+def test_concurrent_misses_share_a_catch_up():
+    started, release = threading.Event(), threading.Event()
+
+    class SlowRepository(FakeUserRepository):
+        def find_users_after(self, user_id, limit):
+            started.set()
+            release.wait()
+            return super().find_users_after(user_id, limit)
+
+    repository = SlowRepository(["vince"])
+    username_filter = UsernameFilter(repository)
+    username_filter.build()
+    first = threading.Thread(target=username_filter.might_exist, args=("bot",))
+    first.start()
+    started.wait()
+    repository.save_user(User(username="ally"))
+    waiting = [threading.Thread(target=username_filter.might_exist, args=(f"bot{i}",)) for i in range(5)]
+    for thread in waiting:
+        thread.start()
+    while len(username_filter._refreshed._waiters) < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in [first, *waiting]:
+        thread.join()
+
+    assert repository.catch_ups == 2
+    assert username_filter.rejections == 6
+    assert username_filter.might_exist("ally")
+
+
+def test_filter_metrics_are_exposed():
+    metrics = MetricsRegistry()
+    username_filter = UsernameFilter(FakeUserRepository(["vince"]))
+    username_filter.build()
+    metrics.gauge("username_filter_memory_bytes", "Memory", username_filter.memory_bytes)
+    assert metrics.collect()["username_filter_memory_bytes"] == username_filter.memory_bytes() > 0
+    assert "# TYPE username_filter_memory_bytes gauge" in metrics.render()
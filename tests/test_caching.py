@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from sangsangstudio.caching import LRUCache, CachingRepository
+from sangsangstudio.services import (
+    AuthorService,
+    CreatePostRequest,
+    AddContentRequest)
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = LRUCache(max_size=2)
+    cache.put("a", 1, ttl=60)
+    cache.put("b", 2, ttl=60)
+    cache.get("a")
+    cache.put("c", 3, ttl=60)
+    assert cache.get("b") is LRUCache.MISSING
+    assert cache.get("a") == 1
+    assert cache.stats().evictions == 1
+
+
+def test_entries_expire_after_their_ttl():
+    timer = FakeTimer()
+    cache = LRUCache(timer=timer)
+    cache.put("a", 1, ttl=10)
+    timer.now = 9
+    assert cache.get("a") == 1
+    timer.now = 10
+    assert cache.get("a") is LRUCache.MISSING
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.expirations) == (1, 1, 1)
+
+
+def test_concurrent_misses_load_a_hot_key_once():
+    cache = LRUCache()
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    threads = [threading.Thread(target=cache.get_or_load, args=("hot", loader, 60))
+               for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+
+
+def test_invalidation_during_load_is_not_cached():
+    cache = LRUCache()
+
+    def loader():
+        cache.invalidate("key")
+        return "stale"
+
+    assert cache.get_or_load("key", loader, ttl=60) == "stale"
+    assert cache.get("key") is LRUCache.MISSING
+
+
+def test_invalidating_another_key_during_load_still_caches():
+    cache = LRUCache()
+
+    def loader():
+        cache.invalidate("other")
+        return "fresh"
+
+    assert cache.get_or_load("key", loader, ttl=60) == "fresh"
+    assert cache.get("key") == "fresh"
+
+
+def test_failed_loads_leave_no_flight_behind():
+    cache = LRUCache()
+
+    def loader():
+        raise RuntimeError("database is down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_load("key", loader, ttl=60)
+    assert (cache._flights, cache._loading) == ({}, {})
+    assert cache.get_or_load("key", lambda: "value", ttl=60) == "value"
+
+
+@pytest.fixture
+def caching_repository(repository):
+    return CachingRepository(repository)
+
+
+@pytest.fixture
+def cached_author_service(caching_repository, clock):
+    return AuthorService(repository=caching_repository, clock=clock)
+
+
+def test_saving_content_evicts_the_owning_post(a_session, cached_author_service, caching_repository):
+    post = cached_author_service.create_post(CreatePostRequest(user=a_session.user, title="Cached"))
+    assert cached_author_service.find_post_by_id(post.id).contents == []
+    paragraph = cached_author_service.add_content_to_post(AddContentRequest(
+        user=a_session.user, post_id=post.id, text="Some text"))
+    assert cached_author_service.find_post_by_id(post.id).contents == [paragraph]
+    cached_author_service.delete_content(a_session.user, paragraph.id)
+    assert cached_author_service.find_post_by_id(post.id).contents == []
+    assert caching_repository.stats().invalidations >= 2
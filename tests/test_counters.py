@@ -0,0 +1,132 @@
+import threading
+
+import pytest
+
+from sangsangstudio.counters import ViewCounter
+from sangsangstudio.entities import Post, PostStatus
+from sangsangstudio.services import AuthorService, CreatePostRequest
+
+
+class FakeViewRepository:
+    def __init__(self):
+        self.views = {}
+        self.flushes = 0
+        self.top_queries = 0
+        self.view_queries = 0
+        self.fail = False
+
+    def add_post_views(self, counts):
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.flushes += 1
+        for post_id, count in counts.items():
+            self.views[post_id] = self.views.get(post_id, 0) + count
+
+    def find_post_views(self, post_ids):
+        self.view_queries += 1
+        return {p: self.views[p] for p in post_ids if p in self.views}
+
+    def find_most_viewed_posts(self, limit):
+        self.top_queries += 1
+        ranked = sorted(self.views.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(Post(id=post_id), views) for post_id, views in ranked]
+
+
+class FakeTimer:
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def view_repository():
+    return FakeViewRepository()
+
+
+def test_views_from_many_threads_are_flushed_in_one_batch(view_repository):
+    counter = ViewCounter(view_repository, shards=4)
+
+    def read_posts():
+        for i in range(1000):
+            counter.record(i % 3)
+
+    threads = [threading.Thread(target=read_posts) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert counter.flush() == 8000
+    assert view_repository.flushes == 1
+    assert view_repository.views == {0: 2672, 1: 2664, 2: 2664}
+    assert counter.flush() == 0
+
+
+def test_threads_record_into_different_shards(view_repository):
+    counter = ViewCounter(view_repository, shards=4)
+    threads = [threading.Thread(target=counter.record, args=(1,)) for _ in range(4)]
+    for t in threads:
+        t.start()
+        t.join()
+    assert sorted(sum(counts.values()) for _, counts in counter._shards) == [1, 1, 1, 1]
+
+
+def test_view_counts_are_served_without_a_query_per_view(view_repository):
+    timer = FakeTimer()
+    counter = ViewCounter(view_repository, views_ttl=60, timer=timer)
+    view_repository.views[1] = 10
+    for _ in range(5):
+        counter.record(1)
+        counter.views([1])
+    assert counter.views([1]) == {1: 15}
+    assert view_repository.view_queries == 1
+
+    counter.flush()
+    assert counter.views([1]) == {1: 15}
+    assert view_repository.view_queries == 2
+    view_repository.views[1] += 3
+    timer.now = 61
+    assert counter.views([1]) == {1: 18}
+
+
+def test_unflushed_views_are_counted_and_survive_failed_flushes(view_repository):
+    counter = ViewCounter(view_repository)
+    counter.record(1)
+    counter.flush()
+    counter.record(1)
+    assert counter.views([1, 2]) == {1: 2, 2: 0}
+    view_repository.fail = True
+    with pytest.raises(RuntimeError):
+        counter.flush()
+    view_repository.fail = False
+    counter.flush()
+    assert view_repository.views == {1: 2}
+
+
+def test_popular_posts_are_cached(view_repository):
+    timer = FakeTimer()
+    counter = ViewCounter(view_repository, popular_ttl=60, timer=timer)
+    for post_id, views in ((1, 3), (2, 5), (3, 1)):
+        for _ in range(views):
+            counter.record(post_id)
+    counter.flush()
+    assert [(p.id, v) for p, v in counter.popular(2)] == [(2, 5), (1, 3)]
+    assert [p.id for p, _ in counter.popular(1)] == [2]
+    assert view_repository.top_queries == 1
+    timer.now = 61
+    counter.popular(2)
+    assert view_repository.top_queries == 2
+
+
+def test_most_viewed_published_posts(repository, clock, a_user):
+    author_service = AuthorService(repository, clock)
+    draft = author_service.create_post(CreatePostRequest(user=a_user, title="Draft"))
+    published = author_service.create_post(CreatePostRequest(user=a_user, title="Published"))
+    author_service.publish_post(a_user, published.id)
+    repository.add_post_views({draft.id: 10, published.id: 2})
+    repository.add_post_views({published.id: 3})
+
+    assert repository.find_post_views([draft.id, published.id]) == {draft.id: 10, published.id: 5}
+    [(post, views)] = repository.find_most_viewed_posts(5)
+    assert (post.id, post.status, views) == (published.id, PostStatus.PUBLISHED, 5)
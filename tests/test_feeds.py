@@ -0,0 +1,117 @@
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from xml.etree.ElementTree import fromstring
+from zoneinfo import ZoneInfo
+
+import pytest
+from falcon import App, testing
+
+from sangsangstudio.app import FeedResource
+from sangsangstudio.clock import SystemClock
+from sangsangstudio.entities import Content
+from sangsangstudio.feeds import FeedCache, ATOM_NAMESPACE
+from sangsangstudio.services import AuthorService, CreatePostRequest, PostDto, PostStatusDto, UserDto
+
+NOW = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+
+
+class FakeAuthorService:
+    def __init__(self):
+        self.queries = 0
+        self.posts = [PostDto(
+            id=1, author=UserDto(id=1, username="vince"), created_on=NOW, status=PostStatusDto.PUBLISHED,
+            title="Raku <firing>", contents=[], excerpt="Smoke & fire", image_src="", content_count=1,
+            modified_on=NOW)]
+
+    def find_published_posts(self, limit=None, offset=0):
+        self.queries += 1
+        return self.posts[:limit]
+
+
+@pytest.fixture
+def author_service():
+    return FakeAuthorService()
+
+
+@pytest.fixture
+def feed_cache(author_service):
+    return FeedCache(author_service, site_url="https://example.com/", size=10)
+
+
+@pytest.fixture
+def client(feed_cache):
+    app = App()
+    app.add_route("/blog/feed.atom", FeedResource(feed_cache, "atom"))
+    app.add_route("/blog/feed.rss", FeedResource(feed_cache, "rss"))
+    return testing.TestClient(app)
+
+
+def test_feeds_are_well_formed_and_escaped(feed_cache):
+    atom = fromstring(feed_cache.feed("atom").body)
+    assert atom.find(f"{{{ATOM_NAMESPACE}}}entry/{{{ATOM_NAMESPACE}}}title").text == "Raku <firing>"
+    rss = fromstring(feed_cache.feed("rss").body)
+    assert rss.find("channel/item/link").text == "https://example.com/blog/posts/1"
+    assert rss.find("channel/item/description").text == "Smoke & fire"
+
+
+def test_feed_is_cached_until_a_post_changes(feed_cache, author_service):
+    first = feed_cache.feed("atom")
+    assert feed_cache.feed("atom") is first
+    assert author_service.queries == 1
+    author_service.posts[0] = replace(author_service.posts[0], title="Pit firing")
+    feed_cache.content_saved(Content(id=1, post_id=1))
+    assert feed_cache.feed("atom").etag != first.etag
+    assert author_service.queries == 2
+
+
+def test_conditional_requests_get_not_modified(client):
+    response = client.simulate_get("/blog/feed.atom")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/atom+xml")
+    assert client.simulate_get(
+        "/blog/feed.atom", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+    assert client.simulate_get(
+        "/blog/feed.rss", headers={"If-Modified-Since": format_datetime(NOW, usegmt=True)}).status_code == 304
+    assert client.simulate_get(
+        "/blog/feed.rss", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_feeds_of_local_time_posts_use_utc(client, author_service):
+    seoul = NOW.astimezone(ZoneInfo("Asia/Seoul"))
+    author_service.posts[0] = replace(author_service.posts[0], created_on=seoul, modified_on=seoul)
+
+    response = client.simulate_get("/blog/feed.rss")
+    assert response.status_code == 200
+    assert response.headers["last-modified"] == "Wed, 01 May 2024 12:30:00 GMT"
+    assert fromstring(response.content).find("channel/lastBuildDate").text == "Wed, 01 May 2024 12:30:00 GMT"
+    assert client.simulate_get("/blog/feed.rss", headers={"If-None-Match": "*"}).status_code == 304
+
+
+class SteppingClock(SystemClock):
+    # Each reading is a minute after the last, so Last-Modified visibly moves at one-second resolution.
+    def __init__(self):
+        super().__init__()
+        self.current = datetime(2024, 5, 1, 9, 0, tzinfo=self.tz_info)
+
+    def now(self):
+        self.current += timedelta(minutes=1)
+        return self.current
+
+
+def test_publishing_an_older_draft_moves_last_modified_forward(repository, a_user):
+    author_service = AuthorService(repository, SteppingClock())
+    published = author_service.create_post(CreatePostRequest(user=a_user, title="Bisque"))
+    draft = author_service.create_post(CreatePostRequest(user=a_user, title="Glaze"))
+    author_service.publish_post(a_user, published.id)
+    feed_cache = FeedCache(author_service, site_url="https://example.com")
+    author_service.add_listener(feed_cache)
+    app = App()
+    app.add_route("/blog/feed.rss", FeedResource(feed_cache, "rss"))
+    client = testing.TestClient(app)
+    last_modified = client.simulate_get("/blog/feed.rss").headers["last-modified"]
+
+    author_service.publish_post(a_user, draft.id)
+    response = client.simulate_get("/blog/feed.rss", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert b"Glaze" in response.content
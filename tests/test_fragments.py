@@ -0,0 +1,161 @@
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from falcon import App, testing
+
+from sangsangstudio.app import ContentFragment, Jinja2TemplateView, PostCardFragment, PostListFragment, PostResource
+from sangsangstudio.fragments import FragmentRenderer
+from sangsangstudio.services import ContentDto, ContentTypeDto, PostDto, PostStatusDto, SessionDto, UserDto
+from sangsangstudio.settings import TEMPLATES_DIR
+
+NOW = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def a_post(post_id: int) -> PostDto:
+    return PostDto(
+        id=post_id, author=UserDto(id=1, username="vince"), created_on=NOW, status=PostStatusDto.PUBLISHED,
+        title=f"Post {post_id}", contents=[], excerpt="", image_src="", content_count=0, modified_on=NOW)
+
+
+class CountingView(Jinja2TemplateView):
+    def __init__(self):
+        super().__init__(TEMPLATES_DIR)
+        self.renders = []
+
+    def render(self, name: str, *args, **kwargs) -> str:
+        self.renders.append(name)
+        return super().render(name, *args, **kwargs)
+
+
+@pytest.fixture
+def view():
+    return CountingView()
+
+
+@pytest.fixture
+def fragments(view):
+    return FragmentRenderer(view)
+
+
+def test_cards_are_rendered_once_per_version(fragments, view):
+    post = a_post(1)
+    assert 'id="post-1"' in fragments.post_card(post)
+    fragments.post_card(post)
+    assert view.renders == ["fragments/post_card.html"]
+    edited = replace(post, title="Edited", modified_on=NOW + timedelta(seconds=1))
+    assert "Edited" in fragments.post_card(edited)
+    assert len(view.renders) == 2
+
+
+def test_content_fragments_change_with_their_text(fragments):
+    content = ContentDto(id=3, post_id=1, type=ContentTypeDto.PARAGRAPH, sequence=1, text="Bisque", src="")
+    assert fragments.content(content) == fragments.content(content)
+    assert "Glaze" in fragments.content(replace(content, text="Glaze"))
+
+
+def test_post_list_fragment_has_no_layout(fragments, view):
+    class FakeAuthorService:
+        def find_published_posts(self, limit=None, offset=0):
+            return [a_post(i) for i in range(offset + 1, offset + limit + 1)]
+
+    app = App()
+    app.add_route("/blog/fragments/posts", PostListFragment(FakeAuthorService(), fragments))
+    html = testing.TestClient(app).simulate_get("/blog/fragments/posts", params={"page": 2}).text
+
+    assert "<html" not in html
+    assert 'id="post-21"' in html
+    assert 'hx-get="/blog/fragments/posts?page=3"' in html
+    assert 'hx-push-url="/blog?page=1"' in html
+
+
+def test_draft_cards_are_only_shown_to_their_author(fragments):
+    draft = replace(a_post(4), status=PostStatusDto.DRAFT)
+
+    class FakeAuthorService:
+        def find_post_by_id(self, post_id):
+            return draft
+
+    session = {}
+
+    class FakeSessionMiddleware:
+        def process_request(self, req, res):
+            req.env.update(session)
+
+    app = App(middleware=[FakeSessionMiddleware()])
+    app.add_route("/blog/fragments/posts/{post_id:int}", PostCardFragment(FakeAuthorService(), fragments))
+    client = testing.TestClient(app)
+
+    assert client.simulate_get("/blog/fragments/posts/4").status_code == 404
+    session["session"] = SessionDto(key="k", created_on=NOW, user=draft.author)
+    assert 'id="post-4"' in client.simulate_get("/blog/fragments/posts/4").text
+
+
+def test_draft_contents_are_only_shown_to_their_author(fragments):
+    draft = replace(a_post(4), status=PostStatusDto.DRAFT)
+    content = ContentDto(id=3, post_id=4, type=ContentTypeDto.PARAGRAPH, sequence=1, text="Bisque", src="")
+
+    class FakeAuthorService:
+        def find_content_by_id(self, content_id):
+            return content
+
+        def find_post_by_id(self, post_id):
+            return draft
+
+    session = {}
+
+    class FakeSessionMiddleware:
+        def process_request(self, req, res):
+            req.env.update(session)
+
+    service = FakeAuthorService()
+    app = App(middleware=[FakeSessionMiddleware()])
+    app.add_route("/blog/fragments/contents/{content_id:int}", ContentFragment(service, service, None, fragments))
+    client = testing.TestClient(app)
+
+    assert client.simulate_get("/blog/fragments/contents/3").status_code == 404
+    session["session"] = SessionDto(key="k", created_on=NOW, user=UserDto(id=2, username="ally"))
+    assert client.simulate_get("/blog/fragments/contents/3").status_code == 404
+    session["session"] = SessionDto(key="k", created_on=NOW, user=draft.author)
+    assert "Bisque" in client.simulate_get("/blog/fragments/contents/3").text
+
+
+def test_unpublished_posts_are_only_shown_to_their_author(view):
+    draft = replace(a_post(5), status=PostStatusDto.DRAFT, title="Kiln")
+
+    class FakeAuthorService:
+        def find_post_by_id(self, post_id):
+            return draft
+
+    class FakeImageService:
+        def srcsets(self, srcs):
+            return {}
+
+    class FakeViewCounter:
+        def __init__(self):
+            self.recorded = []
+
+        def record(self, post_id):
+            self.recorded.append(post_id)
+
+        def views(self, post_ids):
+            return {post_id: 0 for post_id in post_ids}
+
+    session = {}
+
+    class FakeSessionMiddleware:
+        def process_request(self, req, res):
+            req.env.update(session)
+
+    counter = FakeViewCounter()
+    app = App(middleware=[FakeSessionMiddleware()])
+    app.add_route("/blog/posts/{post_id:int}", PostResource(view, FakeAuthorService(), FakeImageService(), counter))
+    client = testing.TestClient(app)
+
+    assert client.simulate_get("/blog/posts/5").status_code == 404
+    session["session"] = SessionDto(key="k", created_on=NOW, user=UserDto(id=2, username="ally"))
+    assert client.simulate_get("/blog/posts/5").status_code == 404
+    assert counter.recorded == []
+    session["session"] = SessionDto(key="k", created_on=NOW, user=draft.author)
+    assert "Kiln" in client.simulate_get("/blog/posts/5").text
+    assert counter.recorded == [5]
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+import pytest
+from falcon import App, testing
+
+from conftest import FakeConnector
+from sangsangstudio.entities import User
+from sangsangstudio.identity import current_identity_map, identity_scope
+from sangsangstudio.middleware import IdentityMapMiddleware
+
+CREATED_ON = datetime(2024, 5, 1, 9, 30)
+USER_ROW = (1, "vince", b"hash")
+
+
+@pytest.fixture
+def fake_connector():
+    return FakeConnector(row=USER_ROW, rows=[
+        (post_id, 1, CREATED_ON, 1, f"Post {post_id}", "", "", 0, CREATED_ON, *USER_ROW) for post_id in (1, 2, 3)])
+
+
+def test_entities_are_loaded_once_per_scope(offline_repository):
+    with identity_scope() as identity_map:
+        user = offline_repository.find_user_by_id(1)
+        assert offline_repository.find_user_by_id(1) is user
+        assert {id(p.author) for p in offline_repository.find_all_posts()} == {id(user)}
+    assert offline_repository.connector.queries == 2
+    assert identity_map.hits >= 1
+
+    assert offline_repository.find_user_by_id(1) is not user
+    assert offline_repository.connector.queries == 3
+
+
+def test_saved_entities_are_known_to_the_scope(offline_repository):
+    with identity_scope():
+        user = User(username="ally", password_hash=b"hash")
+        offline_repository.save_user(user)
+        queries = offline_repository.connector.queries
+        assert offline_repository.find_user_by_id(user.id) is user
+        assert offline_repository.connector.queries == queries
+
+
+def test_middleware_clears_the_map_when_the_request_ends(offline_repository):
+    seen = []
+
+    class UserResource:
+        def on_get(self, req, res):
+            seen.append(offline_repository.find_user_by_id(1) is offline_repository.find_user_by_id(1))
+
+    app = App(middleware=[IdentityMapMiddleware()])
+    app.add_route("/user", UserResource())
+    client = testing.TestClient(app)
+    client.simulate_get("/user")
+    client.simulate_get("/user")
+
+    assert seen == [True, True]
+    assert offline_repository.connector.queries == 2
+    assert current_identity_map() is None
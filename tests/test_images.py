@@ -0,0 +1,115 @@
+import io
+
+import pytest
+from PIL import Image
+
+from sangsangstudio.entities import ImageVariant
+from sangsangstudio.images import (
+    ImageService,
+    ImageStore,
+    ImageTooLarge,
+    PillowImageResizer,
+    UnsupportedImage,
+    UploadImageRequest,
+    sniff_extension)
+from sangsangstudio.jobs import JobQueue, JobWorkerPool
+from sangsangstudio.repositories import MySQLRepository
+from sangsangstudio.services import (
+    AuthorService,
+    CreatePostRequest,
+    ContentTypeDto)
+
+
+def png_bytes(width: int, height: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), "teal").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeVariantRepository:
+    def __init__(self):
+        self.variants = []
+
+    def save_image_variant(self, variant):
+        self.variants.append(variant)
+
+    def find_image_variants(self, image_keys):
+        return [v for v in self.variants if v.image_key in image_keys]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ImageStore(str(tmp_path))
+
+
+def test_sniffs_image_types_from_magic_bytes():
+    assert sniff_extension(png_bytes(1, 1)) == "png"
+    assert sniff_extension(b"\xff\xd8\xff\xe0") == "jpg"
+    assert sniff_extension(b"GIF89a") == "gif"
+    assert sniff_extension(b"<html>") is None
+
+
+def test_identical_uploads_are_stored_once(store, tmp_path):
+    data = png_bytes(10, 10)
+    first = store.save(io.BytesIO(data), max_bytes=len(data))
+    second = store.save(io.BytesIO(data), max_bytes=len(data))
+    assert first == second
+    assert [p.name for p in tmp_path.iterdir()] == [first]
+
+
+def test_rejects_non_images_and_oversized_uploads(store, tmp_path):
+    with pytest.raises(UnsupportedImage):
+        store.save(io.BytesIO(b"#!/bin/sh\n"), max_bytes=100)
+    with pytest.raises(ImageTooLarge):
+        store.save(io.BytesIO(png_bytes(50, 50)), max_bytes=10)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_store_never_resolves_names_outside_its_root(store):
+    assert store.path("../secrets.png") is None
+    assert store.path("a" * 64 + ".exe") is None
+
+
+def test_variants_are_generated_once_and_never_upscaled(store):
+    repository = FakeVariantRepository()
+    service = ImageService(repository, None, store, PillowImageResizer(), None)
+    name = store.save(io.BytesIO(png_bytes(700, 350)), max_bytes=ImageService.MAX_BYTES)
+
+    variants = service.generate_variants(name)
+    assert [(v.width, v.format) for v in variants] == [(320, "webp"), (640, "webp")]
+    with Image.open(store.path(variants[0].src.rsplit("/", 1)[1])) as resized:
+        assert resized.size == (320, 160)
+    assert service.generate_variants(name) == []
+
+    src = ImageService.URL_PREFIX + name
+    assert service.srcsets([src, "https://example.com/x.png"]) == {
+        src: ", ".join(f"{v.src} {v.width}w" for v in variants)}
+
+
+def test_variant_insert_names_every_column(clock):
+    assert MySQLRepository(None, clock).insert_image_variant_statement().startswith(
+        "INSERT INTO image_variants (image_key, width, format, src) ")
+
+
+def test_variant_rows_round_trip(repository):
+    variant = ImageVariant(image_key="a" * 64, width=320, format="webp", src="/images/a-320.webp")
+    repository.save_image_variant(variant)
+    assert repository.find_image_variants(["a" * 64]) == [variant]
+
+
+def test_upload_attaches_image_and_builds_variants_in_background(repository, clock, a_user, tmp_path):
+    author_service = AuthorService(repository, clock)
+    post = author_service.create_post(CreatePostRequest(user=a_user, title="Kiln"))
+    job_queue = JobQueue(repository, clock)
+    service = ImageService(repository, author_service, ImageStore(str(tmp_path)), PillowImageResizer(), job_queue)
+    workers = JobWorkerPool(job_queue)
+    workers.register(ImageService.VARIANTS_JOB, service.run_variants_job)
+
+    content = service.upload(UploadImageRequest(
+        user=a_user, post_id=post.id, stream=io.BytesIO(png_bytes(1400, 700)), text="Kiln"))
+    assert workers.run_next().kind == ImageService.VARIANTS_JOB
+
+    assert content.type == ContentTypeDto.IMAGE
+    assert author_service.find_post_by_id(post.id).image_src == content.src
+    key = ImageService.image_key(content.src)
+    assert sorted(v.width for v in repository.find_image_variants([key])) == [320, 640, 1280]
@@ -0,0 +1,157 @@
+import threading
+from datetime import timedelta
+
+import pytest
+
+from sangsangstudio.entities import Job, JobStatus
+from sangsangstudio.jobs import JobQueue, JobWorkerPool
+from sangsangstudio.metrics import MetricsRegistry
+from sangsangstudio.repositories import JobNotEnqueued
+
+
+class FakeJobRepository:
+    def __init__(self):
+        self.jobs = []
+        self.lock = threading.Lock()
+
+    def enqueue_job(self, job):
+        with self.lock:
+            for existing in self.jobs:
+                if job.idempotency_key and existing.idempotency_key == job.idempotency_key:
+                    job.id = existing.id
+                    return False
+            job.id = len(self.jobs) + 1
+            self.jobs.append(job)
+            return True
+
+    def claim_job(self, now):
+        with self.lock:
+            due = [j for j in self.jobs if j.status == JobStatus.QUEUED and j.run_at <= now]
+            if not due:
+                return None
+            job = min(due, key=lambda j: (-j.priority, j.run_at))
+            job.status = JobStatus.RUNNING
+            job.attempts += 1
+            job.started_on = now
+            return job
+
+    def update_job(self, job):
+        pass
+
+    def requeue_stale_jobs(self, started_before):
+        return 0
+
+    def delete_jobs_finished_before(self, cutoff, limit):
+        return 0
+
+    def count_jobs_by_status(self):
+        return {s: sum(1 for j in self.jobs if j.status == s) for s in JobStatus}
+
+
+@pytest.fixture
+def job_repository():
+    return FakeJobRepository()
+
+
+@pytest.fixture
+def job_queue(job_repository, clock):
+    return JobQueue(job_repository, clock)
+
+
+def test_jobs_run_by_priority_and_idempotency_keys_deduplicate(job_queue, job_repository):
+    ran = []
+    pool = JobWorkerPool(job_queue)
+    pool.register("resize", lambda payload: ran.append(payload["name"]))
+    job_queue.enqueue("resize", {"name": "low"}, idempotency_key="resize:low")
+    job_queue.enqueue("resize", {"name": "high"}, priority=10)
+    again = job_queue.enqueue("resize", {"name": "low"}, idempotency_key="resize:low")
+
+    assert again.id == 1
+    while pool.run_next():
+        pass
+    assert ran == ["high", "low"]
+    assert [j.status for j in job_repository.jobs] == [JobStatus.DONE, JobStatus.DONE]
+
+
+def test_failed_jobs_are_retried_with_backoff_then_given_up(job_queue, job_repository, clock):
+    pool = JobWorkerPool(job_queue, backoff=10)
+    pool.register("flaky", lambda payload: 1 / 0)
+    job = job_queue.enqueue("flaky", max_attempts=2)
+
+    pool.run_next()
+    assert job.status == JobStatus.QUEUED
+    assert job.run_at - job.started_on >= timedelta(seconds=10)
+    assert pool.run_next() is None
+
+    job.run_at = clock.now()
+    pool.run_next()
+    assert job.status == JobStatus.FAILED
+    assert "ZeroDivisionError" in job.last_error
+
+    metrics = MetricsRegistry()
+    pool.register_metrics(metrics)
+    collected = metrics.collect()
+    assert collected["jobs_failed"] == 1
+    assert collected["jobs_retried_total"] == 1
+    assert collected["jobs_failed_total"] == 1
+    assert collected["jobs_runs_total"] == 2
+
+
+def test_stop_finishes_running_jobs_and_leaves_the_rest_queued(job_queue, job_repository):
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(payload):
+        started.set()
+        release.wait(5)
+
+    pool = JobWorkerPool(job_queue, workers=1, poll_interval=0.01)
+    pool.register("slow", slow)
+    pool.start()
+    first = job_queue.enqueue("slow")
+    assert started.wait(5)
+    second = job_queue.enqueue("slow")
+
+    stopping = threading.Thread(target=pool.stop)
+    stopping.start()
+    stopping.join(0.1)
+    assert stopping.is_alive()
+    release.set()
+    stopping.join(5)
+
+    assert first.status == JobStatus.DONE
+    assert second.status == JobStatus.QUEUED
+
+
+def test_job_queue_journey(repository, clock):
+    queue = JobQueue(repository, clock)
+    job = queue.enqueue("resize", {"name": "a.png"}, idempotency_key="resize:a.png")
+    assert queue.enqueue("resize", {"name": "a.png"}, idempotency_key="resize:a.png").id == job.id
+
+    claimed = repository.claim_job(clock.now())
+    assert (claimed.id, claimed.status, claimed.attempts) == (job.id, JobStatus.RUNNING, 1)
+    assert repository.claim_job(clock.now()) is None
+
+    assert repository.requeue_stale_jobs(clock.now() + timedelta(seconds=1)) == 1
+    assert repository.count_jobs_by_status()[JobStatus.QUEUED] == 1
+
+
+def test_stale_jobs_out_of_attempts_fail_and_are_purged(repository, clock):
+    queue = JobQueue(repository, clock)
+    queue.enqueue("resize", {"name": "b.png"}, max_attempts=1)
+    repository.claim_job(clock.now())
+
+    assert repository.requeue_stale_jobs(clock.now() + timedelta(seconds=1)) == 1
+    assert repository.count_jobs_by_status()[JobStatus.FAILED] == 1
+    assert repository.delete_jobs_finished_before(clock.now() + timedelta(seconds=1), limit=10) == 1
+
+
+def test_duplicate_keys_reuse_the_existing_job(offline_repository, fake_connector):
+    fake_connector.rowcount, fake_connector.row = 0, (3,)
+    job = Job(kind="variants", idempotency_key="variants:a")
+    assert not offline_repository.enqueue_job(job)
+    assert job.id == 3
+
+    fake_connector.row = None
+    with pytest.raises(JobNotEnqueued):
+        offline_repository.enqueue_job(Job(kind="variants", idempotency_key="variants:b"))
@@ -0,0 +1,58 @@
+import pytest
+from falcon import App
+
+from sangsangstudio.loadtest import (
+    InProcessClient,
+    LoadReport,
+    LoadTestConfig,
+    RouteStats,
+    SocketClient,
+    load_report,
+    percentile,
+    run_load,
+    save_report)
+
+
+class HelloResource:
+    def on_get(self, req, res):
+        res.text = "hello"
+
+
+@pytest.fixture
+def hello_app():
+    app = App()
+    app.add_route("/", HelloResource())
+    return app
+
+
+def test_percentiles_use_the_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert (percentile(samples, 50), percentile(samples, 95), percentile(samples, 99)) == (50.0, 95.0, 99.0)
+    assert percentile([], 99) == 0.0
+
+
+def test_load_is_reported_per_route_with_errors():
+    routes = run_load({"ok": lambda: 200, "broken": lambda: 503}, concurrency=2, duration=0.05)
+    ok, broken = routes
+    assert ok.requests > 0 and ok.errors == 0
+    assert broken.requests > 0 and broken.errors == broken.requests
+    assert ok.p50 <= ok.p95 <= ok.p99
+
+
+@pytest.mark.parametrize("mode", ["inprocess", "socket"])
+def test_clients_drive_the_app(hello_app, mode):
+    client = SocketClient(hello_app, threads=2) if mode == "socket" else InProcessClient(hello_app)
+    try:
+        [route] = run_load({"/": lambda: client.get("/")}, concurrency=2, duration=0.1)
+    finally:
+        client.close()
+    assert route.requests > 0 and route.errors == 0
+
+
+def test_reports_are_saved_and_compared(tmp_path):
+    baseline = LoadReport(LoadTestConfig(), [RouteStats("/blog", 100, 0, 10.0, 1.0, 2.0, 3.0)], commit="abc123")
+    path = save_report(baseline, str(tmp_path))
+    assert load_report(path) == baseline
+
+    current = LoadReport(LoadTestConfig(), [RouteStats("/blog", 150, 0, 15.0, 1.0, 1.0, 2.0)], commit="def456")
+    assert "vs abc123: +50.0% req/s, -50.0% p95" in current.format(load_report(path))
@@ -0,0 +1,49 @@
+import logging
+
+import pytest
+from falcon import App, testing
+
+from sangsangstudio.middleware import QueryBudgetMiddleware
+from sangsangstudio.querybudget import QueryBudgetExceeded, WatchedConnection, record_queries, statement_shape
+
+
+def test_statement_shapes_fold_in_lists():
+    assert (statement_shape("SELECT a\n  FROM t WHERE id IN (%s, %s, %s);") ==
+            statement_shape("SELECT a FROM t WHERE id IN (%s, %s);") ==
+            "SELECT a FROM t WHERE id IN (...);")
+
+
+def test_query_budget_names_the_caller(offline_repository, query_budget):
+    with query_budget(2):
+        offline_repository.find_user_by_id(1)
+        offline_repository.find_post_views([1, 2])
+
+    with pytest.raises(QueryBudgetExceeded, match="test_querybudget.py"):
+        with query_budget(1):
+            offline_repository.find_user_by_id(1)
+            offline_repository.find_user_by_id(2)
+
+
+def test_queries_are_only_recorded_inside_a_block(offline_repository):
+    assert not isinstance(offline_repository.connect(), WatchedConnection)
+    with record_queries() as log:
+        offline_repository.find_user_by_id(1)
+    offline_repository.find_user_by_id(2)
+    assert len(log) == 1
+
+
+def test_middleware_warns_when_a_statement_repeats(offline_repository, caplog):
+    class UsersResource:
+        def on_get(self, req, res):
+            for user_id in range(3):
+                offline_repository.find_user_by_id(user_id)
+
+    app = App(middleware=[QueryBudgetMiddleware(repeat_threshold=3)])
+    app.add_route("/users", UsersResource())
+    with caplog.at_level(logging.WARNING, logger="sangsangstudio.middleware"):
+        testing.TestClient(app).simulate_get("/users")
+
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "GET /users ran the same statement 3 times" in message
+    assert "in on_get" in message
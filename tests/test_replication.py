@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from conftest import FakeConnector
+from sangsangstudio.repositories import ReplicatedConnector
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def timer():
+    return FakeTimer()
+
+
+@pytest.fixture
+def replica():
+    return FakeConnector("replica")
+
+
+@pytest.fixture
+def connector(replica, timer):
+    connector = ReplicatedConnector(
+        FakeConnector("primary"), [(replica, 1)], ejection_period=10, timer=timer)
+    connector.begin_request()
+    return connector
+
+
+def test_reads_go_to_replicas_and_writes_to_primary(connector):
+    assert connector.connect_for_read().name == "replica"
+    assert connector.connect().name == "primary"
+
+
+def test_reads_after_a_write_go_to_primary_until_the_next_request(connector):
+    connector.connect()
+    assert connector.connect_for_read().name == "primary"
+    connector.begin_request()
+    assert connector.connect_for_read().name == "replica"
+
+
+def test_replicas_are_chosen_by_weight(timer):
+    connector = ReplicatedConnector(
+        FakeConnector("primary"),
+        [(FakeConnector("small"), 1), (FakeConnector("large"), 9)],
+        timer=timer, chooser=random.Random(1))
+    connector.begin_request()
+    reads = [connector.connect_for_read().name for _ in range(1000)]
+    assert 850 < reads.count("large") < 950
+
+
+def test_failing_replica_is_ejected_then_readmitted(connector, replica, timer):
+    replica.fail = True
+    assert connector.connect_for_read().name == "primary"
+    assert connector.healthy_replicas() == []
+    replica.fail = False
+    timer.now = 10
+    assert connector.connect_for_read().name == "replica"
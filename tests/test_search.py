@@ -0,0 +1,69 @@
+import pytest
+from falcon import App, testing
+
+from sangsangstudio.app import Jinja2TemplateView, SearchResource
+from sangsangstudio.entities import Post, PostStatus, Content
+from sangsangstudio.search import InMemorySearchIndex, MySQLSearchIndex
+from sangsangstudio.services import AuthorService, CreatePostRequest, AddContentRequest
+from sangsangstudio.settings import TEMPLATES_DIR
+
+
+@pytest.fixture
+def index():
+    index = InMemorySearchIndex()
+    index.post_saved(Post(id=1, title="Pottery for beginners", status=PostStatus.PUBLISHED))
+    index.post_saved(Post(id=2, title="Glazing", status=PostStatus.PUBLISHED))
+    index.post_saved(Post(id=3, title="Pottery drafts", status=PostStatus.DRAFT))
+    index.content_saved(Content(id=10, post_id=2, text="Glazes for pottery and stoneware"))
+    return index
+
+
+def test_title_matches_rank_first(index):
+    results = index.search("pottery")
+    assert [h.post_id for h in results.hits] == [1, 2]
+    assert results.total == 2
+
+
+def test_drafts_are_only_found_when_asked_for(index):
+    assert [h.post_id for h in index.search("drafts").hits] == []
+    assert [h.post_id for h in index.search("drafts", published_only=False).hits] == [3]
+
+
+def test_content_edits_are_indexed_incrementally(index):
+    index.content_saved(Content(id=10, post_id=2, text="Stoneware only"))
+    assert [h.post_id for h in index.search("pottery").hits] == [1]
+    index.content_deleted(10)
+    assert index.search("stoneware").total == 0
+
+
+def test_results_are_paginated(index):
+    results = index.search("pottery glazing", page=2, per_page=1)
+    assert len(results.hits) == 1
+    assert not results.has_next
+
+
+@pytest.fixture(params=["memory", "mysql"])
+def search_index(request, repository):
+    if request.param == "memory":
+        return InMemorySearchIndex()
+    return MySQLSearchIndex(repository)
+
+
+def test_search_page_escapes_the_query_and_links_hits(index):
+    app = App()
+    app.add_route("/blog/search", SearchResource(Jinja2TemplateView(TEMPLATES_DIR), index))
+    page = testing.TestClient(app).simulate_get(
+        "/blog/search", params={"q": '"><script>alert(1)</script> pottery'}).text
+
+    assert "<script>alert(1)" not in page
+    assert "&#34;&gt;&lt;script&gt;" in page
+    assert '<a href="/blog/posts/1">Pottery for beginners</a>' in page
+
+
+def test_author_writes_are_searchable(repository, clock, search_index, a_session):
+    author_service = AuthorService(repository=repository, clock=clock, listeners=[search_index])
+    post = author_service.create_post(CreatePostRequest(user=a_session.user, title="Kiln firing"))
+    author_service.add_content_to_post(AddContentRequest(
+        user=a_session.user, post_id=post.id, text="Cone six oxidation schedule"))
+    author_service.publish_post(a_session.user, post.id)
+    assert [h.post_id for h in search_index.search("oxidation").hits] == [post.id]
@@ -0,0 +1,32 @@
+import os
+
+from sangsangstudio.server import ServerConfig, parse_config
+from sangsangstudio.settings import reload_env
+
+
+def test_default_config():
+    assert parse_config([], environ={}) == ServerConfig()
+
+
+def test_arguments_override_environment():
+    config = parse_config(
+        ["--workers", "4", "--connection-limit", "500"],
+        environ={"SERVER_WORKERS": "2", "SERVER_THREADS": "8", "SERVER_PORT": "9000"})
+    assert config == ServerConfig(port=9000, threads=8, workers=4, connection_limit=500)
+
+
+def test_restarts_reread_env_without_overriding_the_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("SANGSANG_FROM_SHELL", "shell")
+    monkeypatch.delenv("SANGSANG_FROM_FILE", raising=False)
+    env = tmp_path / ".env"
+    env.write_text("SANGSANG_FROM_FILE=1\nSANGSANG_FROM_SHELL=file\n")
+    reload_env(str(env))
+    assert (os.environ["SANGSANG_FROM_FILE"], os.environ["SANGSANG_FROM_SHELL"]) == ("1", "shell")
+
+    env.write_text("SANGSANG_FROM_FILE=2\n")
+    reload_env(str(env))
+    assert os.environ["SANGSANG_FROM_FILE"] == "2"
+    env.write_text("")
+    reload_env(str(env))
+    assert "SANGSANG_FROM_FILE" not in os.environ
+    assert os.environ["SANGSANG_FROM_SHELL"] == "shell"
@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+from falcon import App, testing
+
+from sangsangstudio.entities import Session, User
+from sangsangstudio.middleware import SessionCookieMiddleware
+from sangsangstudio.services import LoginRequest, UserService
+from sangsangstudio.sessions import WriteBehindSessionRepository
+
+
+class FakeSessionRepository:
+    def __init__(self):
+        self.users = {"vince": User(id=1, username="vince", password_hash=b"p1a2s3s4")}
+        self.sessions = {}
+        self.inserts = 0
+        self.deletes = 0
+        self.fail = False
+        self.inserting = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def find_user_by_username(self, username):
+        return self.users.get(username)
+
+    def save_sessions(self, sessions):
+        self.inserting.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("database is down")
+        self.inserts += 1
+        self.sessions.update((s.key, s) for s in sessions)
+
+    def find_session_by_key(self, key):
+        return self.sessions.get(key)
+
+    def find_session_by_user_id(self, user_id):
+        return max((s for s in self.sessions.values() if s.user.id == user_id),
+                   key=lambda s: s.created_on, default=None)
+
+    def delete_session(self, key):
+        self.deletes += 1
+        self.sessions.pop(key, None)
+
+
+def a_session(key, user_id=1):
+    return Session(key=key, user=User(id=user_id, username=f"user{user_id}"), created_on=datetime.now())
+
+
+@pytest.fixture
+def base():
+    return FakeSessionRepository()
+
+
+@pytest.fixture
+def writer(base):
+    writer = WriteBehindSessionRepository(base, interval=0.01)
+    writer.start()
+    yield writer
+    writer.stop()
+
+
+def save_in_background(writer, sessions):
+    threads = [threading.Thread(target=writer.save_session, args=(session,)) for session in sessions]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def wait_for_pending(writer, count):
+    while writer.pending() < count:
+        time.sleep(0.001)
+
+
+def test_a_burst_of_sessions_is_written_in_few_batches(writer, base):
+    base.release.clear()
+    saving = save_in_background(writer, [a_session(f"k{i}", user_id=i) for i in range(50)])
+    wait_for_pending(writer, 50)
+    base.release.set()
+    for thread in saving:
+        thread.join(5)
+    assert len(base.sessions) == 50
+    assert base.inserts < 50
+    assert writer.pending() == 0
+
+
+def test_logins_return_once_every_worker_can_find_the_session(writer, base, password_hasher, clock):
+    base.release.clear()
+    user_service = UserService(writer, password_hasher, clock)
+    sessions = []
+    login = threading.Thread(target=lambda: sessions.append(
+        user_service.login(LoginRequest(username="vince", password="p1a2s3s4"))))
+    login.start()
+
+    assert base.inserting.wait(5)
+    login.join(0.05)
+    assert login.is_alive()
+    assert base.sessions == {}
+    base.release.set()
+    login.join(5)
+    other_worker = UserService(WriteBehindSessionRepository(base), password_hasher, clock)
+    assert other_worker.find_session(sessions[0].key) == sessions[0]
+
+
+def test_sessions_deleted_before_they_are_written_never_reach_the_database(base):
+    writer = WriteBehindSessionRepository(base)
+    writer.start()
+    base.release.clear()
+    saving = save_in_background(writer, [a_session("in-flight")])
+    assert base.inserting.wait(5)
+    saving += save_in_background(writer, [a_session("pending", user_id=2)])
+    wait_for_pending(writer, 2)
+
+    deletes = [threading.Thread(target=writer.delete_session, args=(key,)) for key in ("in-flight", "pending")]
+    for deleting in deletes:
+        deleting.start()
+    deletes[0].join(0.1)
+    base.release.set()
+    for thread in deletes + saving:
+        thread.join(5)
+    writer.stop()
+
+    assert base.sessions == {}
+    assert base.deletes == 1
+    assert writer.find_session_by_user_id(2) is None
+
+
+def test_failed_writes_fail_the_login(writer, base):
+    base.fail = True
+    with pytest.raises(RuntimeError, match="database is down"):
+        writer.save_session(a_session("k"))
+    assert writer.pending() == 0
+    assert writer.find_session_by_key("k") is None
+
+    base.fail = False
+    writer.save_session(a_session("k2"))
+    assert "k2" in base.sessions
+
+
+def test_cookie_middleware_leaves_requests_without_a_session_anonymous(writer, password_hasher, clock):
+    user_service = UserService(writer, password_hasher, clock)
+    session = user_service.login(LoginRequest(username="vince", password="p1a2s3s4"))
+    seen = []
+
+    class WhoAmIResource:
+        def on_get(self, req, res):
+            seen.append(req.env.get("session"))
+
+    app = App(middleware=[SessionCookieMiddleware(user_service)])
+    app.add_route("/", WhoAmIResource())
+    client = testing.TestClient(app)
+    client.simulate_get("/")
+    client.simulate_get("/", cookies={"session": session.key})
+    unknown = client.simulate_get("/", cookies={"session": "forged"})
+
+    assert seen == [None, session, None]
+    assert unknown.cookies["session"].value == ""
@@ -0,0 +1,75 @@
+from sangsangstudio.app import Jinja2TemplateView
+from sangsangstudio.factories import ProductionAppFactory
+from sangsangstudio.settings import TEMPLATES_DIR
+from sangsangstudio.startup import (
+    ModuleImport,
+    StartupTimer,
+    format_imports,
+    modules_imported_by,
+    parse_importtime,
+    profile_imports)
+
+# Measured at about 0.25 s, most of it Falcon; the slack absorbs slow CI machines.
+IMPORT_BUDGET = 0.75
+HEAVY_MODULES = ("mysql.connector", "bcrypt", "jinja2", "waitress", "dotenv")
+
+
+class StepTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        self.now += 0.5
+        return self.now
+
+
+def test_startup_timer_reports_each_phase():
+    timer = StartupTimer(timer=StepTimer())
+    with timer.phase("schema"):
+        pass
+    with timer.phase("templates"):
+        pass
+    assert [name for name, _ in timer.phases] == ["schema", "templates"]
+    assert timer.total() == 1.0
+    assert timer.report().splitlines()[-1].split() == ["total", "1000.0", "ms"]
+
+
+def test_importtime_output_is_parsed_per_module():
+    imports = parse_importtime([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |     _weakref",
+        "import time:      2000 |       2120 |   sangsangstudio.entities",
+        "import time:       500 |       2620 | sangsangstudio.app",
+    ])
+    assert imports == [
+        ModuleImport("_weakref", 120, 120, 2),
+        ModuleImport("sangsangstudio.entities", 2000, 2120, 1),
+        ModuleImport("sangsangstudio.app", 500, 2620, 0)]
+    assert format_imports(imports, top=1).splitlines()[1].split()[0] == "sangsangstudio.entities"
+    assert format_imports(imports, top=1).splitlines()[-1] == "3 modules imported in 2.6 ms"
+
+
+def test_importing_the_app_defers_backends_and_hashers():
+    imported = modules_imported_by("sangsangstudio.app")
+    assert [module for module in HEAVY_MODULES if module in imported] == []
+
+
+def test_importing_the_app_stays_within_budget():
+    [app] = [i for i in profile_imports("sangsangstudio.app") if i.name == "sangsangstudio.app"]
+    assert app.cumulative_us / 1_000_000 < IMPORT_BUDGET
+
+
+def test_template_warmup_compiles_every_template():
+    view = Jinja2TemplateView(TEMPLATES_DIR)
+    view.warmup()
+    assert len(view.env.cache) == len(view.env.list_templates())
+
+
+def test_production_prepare_keeps_existing_data(repository, a_user):
+    factory = ProductionAppFactory()
+    try:
+        factory.prepare()
+        assert factory.repository().verify_schema() == []
+        assert factory.user_service().find_user(a_user.id) == a_user
+    finally:
+        factory.close()
@@ -0,0 +1,102 @@
+import gzip
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from sangsangstudio.app import Jinja2TemplateView
+from sangsangstudio.services import PostDto, PostStatusDto, UserDto, ContentDto, ContentTypeDto
+from sangsangstudio.settings import TEMPLATES_DIR
+from sangsangstudio.static import StaticSiteExporter
+
+NOW = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+
+def a_post(post_id: int) -> PostDto:
+    return PostDto(
+        id=post_id,
+        author=UserDto(id=1, username="vince"),
+        created_on=NOW,
+        status=PostStatusDto.PUBLISHED,
+        title=f"Post {post_id}",
+        contents=[ContentDto(id=post_id, post_id=post_id, type=ContentTypeDto.PARAGRAPH,
+                             sequence=1, text=f"Paragraph {post_id}", src="")],
+        excerpt=f"Paragraph {post_id}",
+        image_src="",
+        content_count=1,
+        modified_on=NOW)
+
+
+class FakeAuthorService:
+    def __init__(self, posts: list[PostDto]):
+        self.posts = {p.id: p for p in posts}
+
+    def find_published_posts(self, limit=None, offset=0):
+        return sorted(self.posts.values(), key=lambda p: p.id, reverse=True)
+
+    def find_post_by_id(self, post_id):
+        return self.posts[post_id]
+
+
+@pytest.fixture
+def author_service():
+    return FakeAuthorService([a_post(i) for i in range(1, 6)])
+
+
+@pytest.fixture
+def exporter(author_service, tmp_path):
+    return StaticSiteExporter(author_service, Jinja2TemplateView(TEMPLATES_DIR), str(tmp_path), page_size=2)
+
+
+def test_first_export_renders_every_page_with_compressed_copies(exporter, tmp_path):
+    report = exporter.export()
+    assert len(report.written) == 5 + 3
+    html = (tmp_path / "blog/posts/3/index.html").read_bytes()
+    assert b"Paragraph 3" in html
+    assert gzip.decompress((tmp_path / "blog/posts/3/index.html.gz").read_bytes()) == html
+    assert b'href="/blog/page/2/"' in (tmp_path / "blog/index.html").read_bytes()
+
+
+def test_unchanged_site_is_not_rewritten(exporter):
+    exporter.export()
+    report = exporter.export()
+    assert report.written == []
+    assert report.unchanged == 8
+
+
+def test_editing_a_post_rebuilds_its_page_and_index_page(exporter, author_service):
+    exporter.export()
+    author_service.posts[3] = replace(author_service.posts[3], modified_on=NOW + timedelta(minutes=1))
+    assert sorted(exporter.export().written) == ["blog/page/2/index.html", "blog/posts/3/index.html"]
+
+
+def test_unpublished_posts_are_removed(exporter, author_service, tmp_path):
+    exporter.export()
+    del author_service.posts[1]
+    report = exporter.export()
+    assert "blog/posts/1/index.html" in report.removed
+    assert not (tmp_path / "blog/posts/1/index.html.gz").exists()
+    assert exporter.export(full=True).unchanged == 0
+
+
+def test_new_image_variants_rebuild_the_post_page(author_service, tmp_path):
+    src = "/images/" + "a" * 64 + ".png"
+    image = ContentDto(id=20, post_id=2, type=ContentTypeDto.IMAGE, sequence=2, text="Kiln", src=src)
+    post = author_service.posts[2]
+    author_service.posts[2] = replace(post, contents=[*post.contents, image], image_src=src)
+
+    class FakeImageService:
+        def __init__(self):
+            self.variants = {}
+
+        def srcsets(self, srcs):
+            return {s: self.variants[s] for s in srcs if s in self.variants}
+
+    images = FakeImageService()
+    exporter = StaticSiteExporter(
+        author_service, Jinja2TemplateView(TEMPLATES_DIR), str(tmp_path), images, page_size=2)
+    exporter.export()
+    images.variants[src] = "/images/a-320.webp 320w"
+
+    assert exporter.export().written == ["blog/posts/2/index.html"]
+    assert b"a-320.webp 320w" in (tmp_path / "blog/posts/2/index.html").read_bytes()
@@ -0,0 +1,27 @@
+import io
+
+import pytest
+
+from sangsangstudio.services import AuthorService, CreatePostRequest, AddContentRequest
+from sangsangstudio.transfer import export_blog, import_blog
+
+
+@pytest.fixture
+def author_service(repository, clock):
+    return AuthorService(repository=repository, clock=clock)
+
+
+def test_export_and_import_round_trip(repository, author_service, a_session):
+    post = author_service.create_post(CreatePostRequest(user=a_session.user, title="Exported"))
+    author_service.add_content_to_post(AddContentRequest(
+        user=a_session.user, post_id=post.id, text="Some text"))
+    before = author_service.find_post_by_id(post.id)
+    exported = io.StringIO()
+    assert export_blog(repository, exported, batch_size=2) == {"user": 1, "post": 1, "content": 1}
+
+    repository.drop_tables()
+    repository.create_tables()
+    lines = io.StringIO(exported.getvalue())
+    assert import_blog(repository, lines, batch_size=2) == {"user": 1, "post": 1, "content": 1}
+    assert author_service.find_post_by_id(post.id) == before
+    assert [c.text for c in repository.iter_contents()] == ["Some text"]
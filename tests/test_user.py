@@ -1,10 +1,16 @@
+from datetime import datetime, timedelta
+
 import pytest
 
 from conftest import user_service, a_user, login_request, a_session
+from sangsangstudio.clock import SystemClock
 from sangsangstudio.services import (
     UnauthorizedLogin,
     LoginRequest,
-    SessionNotFound)
+    SessionNotFound,
+    SessionExpired,
+    UserService)
+from sangsangstudio.sweeper import SessionSweeper
 
 
 def test_create_user(user_service, a_user):
@@ -30,3 +36,45 @@ def test_logout_deletes_session(user_service, a_session):
     user_service.logout(a_session.key)
     with pytest.raises(SessionNotFound):
         user_service.find_session(a_session.key)
+
+
+class FrozenClock(SystemClock):
+    def __init__(self):
+        super().__init__()
+        self.current = super().now()
+
+    def now(self) -> datetime:
+        return self.current
+
+
+@pytest.fixture
+def frozen_clock():
+    return FrozenClock()
+
+
+@pytest.fixture
+def expiring_user_service(repository, password_hasher, frozen_clock):
+    return UserService(repository, password_hasher, frozen_clock, session_ttl=timedelta(hours=1))
+
+
+def test_expired_session_is_rejected(expiring_user_service, frozen_clock, a_user, login_request):
+    session = expiring_user_service.login(login_request)
+    frozen_clock.current += timedelta(hours=1)
+    with pytest.raises(SessionExpired):
+        expiring_user_service.find_session(session.key)
+
+
+def test_login_replaces_expired_session(expiring_user_service, frozen_clock, a_user, login_request):
+    session = expiring_user_service.login(login_request)
+    frozen_clock.current += timedelta(hours=2)
+    assert expiring_user_service.login(login_request).key != session.key
+
+
+def test_sweeper_deletes_expired_sessions_in_batches(
+        repository, expiring_user_service, frozen_clock, a_user, login_request):
+    for _ in range(3):
+        expiring_user_service.login(login_request)
+        frozen_clock.current += timedelta(hours=2)
+    sweeper = SessionSweeper(repository, frozen_clock, timedelta(hours=1), batch_size=2, pause=0)
+    assert sweeper.sweep() == 3
+    assert repository.find_session_by_user_id(a_user.id) is None